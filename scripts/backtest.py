@@ -0,0 +1,93 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME
+from src.data.locations import DEFAULT_LOCATION, get_location
+from src.data.store import ColumnarStore
+from src.model import xgboost
+from src.model.backtest import EXPANDING, SLIDING, run_backtest
+from src.model.evaluation import aggregate_fold_metrics
+from src.model.training import RESOLUTIONS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of AQI prediction model")
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="daily")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="Location id from src/data/locations.json")
+    parser.add_argument("--data", help="Columnar store with merged features (default: the one written by train_model.py)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-size", type=int, help="Rows (days/hours) in test period of every fold (default: 30%% of data split between folds)")
+    parser.add_argument("--mode", choices=[EXPANDING, SLIDING], default=EXPANDING)
+    parser.add_argument("--train-size", type=int, help="Training rows of sliding folds")
+    parser.add_argument("--backend", choices=xgboost.BACKENDS, default="per_target")
+    parser.add_argument("--params", help="JSON file with window sizes and XGBoost hyperparameters (e.g. best.json of search_hyperparameters.py)")
+    parser.add_argument("--workers", type=int, help="Folds evaluated in parallel (all cores by default)")
+    parser.add_argument("--n-jobs", type=int, help="Total thread budget shared by workers (all cores by default)")
+    parser.add_argument("--output", help="Write fold results and summary as JSON to this file")
+    args = parser.parse_args()
+
+    data_path = args.data or get_location(args.location).merged_features_dir(PROJECT_ROOT, args.resolution)
+    if not os.path.exists(os.path.join(data_path, "schema.json")):
+        parser.error(f"No merged features in {data_path} - run scripts/train_model.py first")
+    if args.mode == SLIDING and not args.train_size:
+        parser.error("--mode sliding requires --train-size")
+
+    resolution = RESOLUTIONS[args.resolution]
+    model_params = {}
+    if args.params:
+        with open(args.params) as f:
+            model_params = json.load(f)
+        resolution = {**resolution, **{key: model_params.pop(key) for key in resolution if key in model_params}}
+
+    merged_df = ColumnarStore(data_path).read()
+
+    started_at = time.perf_counter()
+    fold_results = run_backtest(
+        merged_df,
+        resolution["historical_window_size"],
+        resolution["prediction_window_size"],
+        resolution["num_of_predictions"],
+        num_folds=args.folds,
+        test_size=args.test_size,
+        mode=args.mode,
+        train_size=args.train_size,
+        freq=resolution["freq"],
+        backend=args.backend,
+        model_params=model_params,
+        workers=args.workers,
+        n_jobs=args.n_jobs,
+    )
+    LOGGER.info(f"Backtest finished in {time.perf_counter() - started_at:.1f}s")
+
+    for result in fold_results:
+        willmott = ", ".join(
+            f"{iaqi}={values[-1]:.3f}" for iaqi, values in result["metrics"]["Willmott"].items()
+        )
+        LOGGER.info(
+            f"Fold {result['fold']}: train from {result['train_from']}, test {result['test_from']} - {result['test_to']}, "
+            f"fit {result['fit_seconds']:.1f}s, last day Willmott {willmott}"
+        )
+
+    summary_df = aggregate_fold_metrics([result["metrics"] for result in fold_results])
+    LOGGER.info(f"Metrics over folds:\n{summary_df.loc[['Willmott', 'RMSE']].to_string(float_format='%.3f')}")
+
+    if args.output:
+        summary = {
+            f"{metric}/{iaqi}/{statistic}": values
+            for (metric, iaqi, statistic), values in summary_df.to_dict(orient="index").items()
+        }
+        with open(args.output, "w") as f:
+            json.dump({"folds": fold_results, "summary": summary}, f, indent=2)
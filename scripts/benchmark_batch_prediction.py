@@ -0,0 +1,132 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME, IAQI_FEATURES, DAILY
+from src.data.calendar import calendar_columns
+from src.data.locations import Location, get_location
+from src.data.store import ColumnarStore
+from src.model import xgboost
+from src.model.training import prepare_datasets
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+STATION_ID = "benchmark"
+
+
+def _save_model(merged_df, model_dir, n_estimators):
+    feature_scaler, _, flat = prepare_datasets(merged_df, 3, 3)
+    model = xgboost.create_regressor(n_estimators=n_estimators)
+    model.fit(flat[0], flat[3])
+
+    joblib.dump(model, os.path.join(model_dir, "aqi_prediction_model.pkl"))
+    joblib.dump(feature_scaler, os.path.join(model_dir, "feature_scaler.bin"))
+    with open(os.path.join(model_dir, "model_config.json"), "w") as f:
+        json.dump(
+            {
+                "location": STATION_ID,
+                "historical_window_size": 3,
+                "prediction_window_size": 3,
+                "num_of_predictions": 1,
+                "columns": list(merged_df.columns),
+            },
+            f,
+        )
+
+
+def _create_predictor(merged_df, model_dir):
+    os.environ["MODEL_FILES_PATH"] = model_dir
+    # Repeated origins would be served from forecast cache - only computation is measured
+    os.environ["PREDICTOR_FORECAST_CACHE_SIZE"] = "0"
+    sys.path.append(os.path.dirname(__file__))
+    import predictor
+
+    known_columns = set(IAQI_FEATURES) | set(calendar_columns(DAILY))
+    weather_columns = [column for column in merged_df.columns if column not in known_columns]
+    iaqi_rows = merged_df[IAQI_FEATURES].reset_index(names="event_timestamp")
+
+    # Local stand-ins for feature store and meteostat - data are read once, by the first request
+    def load_station(station_id):
+        return predictor.StationPredictor(
+            model_dir,
+            Location(station_id, station_id, None, (0, 0, 0)),
+            read_hourly_data=lambda since: iaqi_rows if since is None else iaqi_rows[iaqi_rows["event_timestamp"] >= since],
+            fetch_weather=lambda start_date, end_date: merged_df.loc[start_date:end_date, weather_columns].copy(),
+        )
+
+    return predictor.Predictor(load_station=load_station), predictor.MAX_ORIGIN_AGE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of batch vs single forecast requests")
+    parser.add_argument("--data", default=get_location().merged_features_dir(PROJECT_ROOT, "daily"), help="Columnar store with merged features")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, "schema.json")):
+        parser.error(f"No merged features in {args.data} - run scripts/train_model.py first")
+
+    merged_df = ColumnarStore(args.data).read()
+    rng = np.random.default_rng(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aqi_batch_") as model_dir:
+        _save_model(merged_df, model_dir, args.n_estimators)
+        router, max_origin_age = _create_predictor(merged_df, model_dir)
+        # Warm-up - loads data, so that only forecasting is measured
+        router.predict({"station": STATION_ID})
+
+        origins = merged_df.index[-max_origin_age:]
+        for batch_size in args.batch_sizes:
+            instances = [
+                {"station": STATION_ID, "origin": str(origin)} for origin in rng.choice(origins, size=batch_size)
+            ]
+
+            # Same forecasts requested one by one
+            started_at = time.perf_counter()
+            single_results = [router.predict([instance]) for instance in instances]
+            single_seconds = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            batch_result = router.predict({"instances": instances})
+            batch_seconds = time.perf_counter() - started_at
+
+            for column in IAQI_FEATURES:
+                single_values = np.concatenate([result[column] for result in single_results])
+                if not np.allclose(single_values, batch_result[column]):
+                    raise AssertionError(f"Batch forecasts of '{column}' differ from single ones")
+
+            results.append(
+                {
+                    "batch_size": batch_size,
+                    "single_forecasts_per_second": round(batch_size / single_seconds, 1),
+                    "batch_forecasts_per_second": round(batch_size / batch_seconds, 1),
+                }
+            )
+
+    for result in results:
+        LOGGER.info(
+            f"batch of {result['batch_size']:>4}: {result['single_forecasts_per_second']:>8.1f} forecasts/s one by one, "
+            f"{result['batch_forecasts_per_second']:>8.1f} forecasts/s batched"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,134 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME
+from src.data.locations import get_location
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+FORMATS = ("pickle", "trees")
+
+
+def _rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def _measure(model_format, model_dir, num_requests, results):
+    # Fresh process - import and load costs are the same as at serving start-up
+    rss_before_mb = _rss_mb()
+    started_at = time.perf_counter()
+    if model_format == "pickle":
+        import joblib
+
+        model = joblib.load(os.path.join(model_dir, "model.pkl"))
+    else:
+        from src.model.trees import TreeEnsemble
+
+        model = TreeEnsemble.load(os.path.join(model_dir, "model.trees"))
+    load_seconds = time.perf_counter() - started_at
+
+    X_check = np.load(os.path.join(model_dir, "X_check.npy"))
+    predictions = np.asarray(model.predict(X_check), dtype=np.float32)
+    np.save(os.path.join(model_dir, f"predictions_{model_format}.npy"), predictions)
+
+    latencies = []
+    for request in range(num_requests):
+        row = X_check[request % len(X_check)][np.newaxis]
+        request_started_at = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - request_started_at)
+
+    results.put(
+        {
+            "format": model_format,
+            "load_seconds": round(load_seconds, 4),
+            "rss_mb": round(_rss_mb(), 1),
+            "rss_increase_mb": round(_rss_mb() - rss_before_mb, 1),
+            "single_row_ms": {f"p{q}": round(float(np.percentile(latencies, q)) * 1000, 3) for q in (50, 95)},
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pickled model vs tree ensemble file - load time, memory, latency")
+    parser.add_argument("--data", default=get_location().merged_features_dir(PROJECT_ROOT, "daily"), help="Columnar store with merged features")
+    parser.add_argument("--backend", default="per_target")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, "schema.json")):
+        parser.error(f"No merged features in {args.data} - run scripts/train_model.py first")
+
+    import joblib
+
+    from src.data.store import ColumnarStore
+    from src.model import xgboost
+    from src.model.training import prepare_datasets
+    from src.model.trees import export_model
+
+    merged_df = ColumnarStore(args.data).read()
+    _, _, (X_flat_train, _, X_flat_test, y_flat_train, _, _) = prepare_datasets(merged_df, 3, 3)
+    LOGGER.info(f"Training {args.backend} model with {args.n_estimators} estimators...")
+    model = xgboost.create_regressor(args.backend, n_estimators=args.n_estimators)
+    model.fit(X_flat_train, y_flat_train)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aqi_artifact_") as model_dir:
+        # Missing values take default branches - checked as well
+        X_check = np.array(X_flat_test, dtype=np.float32)
+        X_check[::7, ::5] = np.nan
+        np.save(os.path.join(model_dir, "X_check.npy"), X_check)
+        joblib.dump(model, os.path.join(model_dir, "model.pkl"))
+        export_model(model, os.path.join(model_dir, "model.trees"), X_check)
+
+        context = multiprocessing.get_context("spawn")
+        for model_format in FORMATS:
+            queue = context.Queue()
+            process = context.Process(target=_measure, args=(model_format, model_dir, args.requests, queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Benchmark of {model_format} failed with exit code {process.exitcode}")
+            result = queue.get()
+            result["size_mb"] = round(os.path.getsize(os.path.join(model_dir, f"model.{'pkl' if model_format == 'pickle' else 'trees'}")) / 2**20, 2)
+            results.append(result)
+
+        bit_identical = np.array_equal(
+            np.load(os.path.join(model_dir, "predictions_pickle.npy")),
+            np.load(os.path.join(model_dir, "predictions_trees.npy")),
+        )
+
+    for result in results:
+        LOGGER.info(
+            f"{result['format']:>6}: {result['size_mb']:.1f} MB file, load {result['load_seconds']:.3f}s, "
+            f"RSS {result['rss_mb']:.0f} MB (+{result['rss_increase_mb']:.0f} MB), single row {result['single_row_ms']} ms"
+        )
+    LOGGER.info(f"Predictions bit-for-bit identical: {bit_identical}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "bit_identical": bool(bit_identical)}, f, indent=2)
+    if not bit_identical:
+        sys.exit(1)
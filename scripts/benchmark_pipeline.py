@@ -0,0 +1,309 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME, FEATURE_DTYPE, FEATURE_DTYPES
+from src.data import aqi, meteo
+from src.data.calendar import add_calendar_features
+from src.data.features import FeatureScaler, split_to_windows, flatten_windows
+from src.data.store import ColumnarStore
+from src.data.synthetic import synthetic_iaqi, synthetic_weather, synthetic_weather_source
+from src.hopsworks.local import LocalFeatureGroup
+from src.model import xgboost
+from src.model.evaluation import evaluate_iaqi_predictions
+from src.model.inference import recursive_forecasting, recursive_forecast_arrays
+from src.model.training import RESOLUTIONS, merge_features, split_data, prepare_datasets, evaluate_model
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "data", "benchmarks", "baseline.json")
+# Synthetic data end here - results don't depend on the day the benchmark runs
+END_DATE = pd.Timestamp("2025-01-01")
+STATION = (0.0, 0.0, 0.0)
+# Shortest timed sample - faster functions are run repeatedly within one sample
+MIN_SAMPLE_SECONDS = 0.05
+
+
+def synthetic_feature_group(years, seed):
+    """Hourly readings of one station as a local stand-in for the feature store."""
+    start = END_DATE - pd.DateOffset(years=years)
+    periods = int((END_DATE - start) / pd.Timedelta(hours=1))
+    return LocalFeatureGroup(
+        "iaqi", primary_key=["event_timestamp"], event_time="event_timestamp",
+        dataframe=synthetic_iaqi(start, periods, seed=seed),
+    )
+
+
+def synthetic_features(years, freq, seed, dtype=FEATURE_DTYPE):
+    """Aggregated readings and merged features of one synthetic station - no scaler or model."""
+    with tempfile.TemporaryDirectory(prefix="aqi_benchmark_") as cache_dir:
+        aqi_df = aqi.read_feature_group(synthetic_feature_group(years, seed), cache_dir, freq=freq)
+    merged_df = merge_features(
+        aqi_df, lambda start_date, end_date: synthetic_weather(start_date, end_date, freq, seed), freq, dtype
+    )
+    return aqi_df, merged_df
+
+
+def train_pipeline(feature_group, work_dir, resolution, n_estimators, seed, dtype=FEATURE_DTYPE):
+    """Everything train_model.py does up to the model registry - feature store and meteostat are local stand-ins."""
+    freq = resolution["freq"]
+    historical_window_size = resolution["historical_window_size"]
+    prediction_window_size = resolution["prediction_window_size"]
+    num_of_predictions = resolution["num_of_predictions"]
+
+    aqi_df = aqi.read_feature_group(feature_group, os.path.join(work_dir, "cache"), freq=freq)
+    weather_cache = meteo.WeatherCache(os.path.join(work_dir, "weather"), source=synthetic_weather_source(seed, freq))
+    merged_df = merge_features(aqi_df, partial(weather_cache.fetch, STATION), freq, dtype)
+    ColumnarStore(os.path.join(work_dir, "merged")).write(merged_df, dtype=dtype)
+
+    feature_scaler, (_, _, test_df), flat = prepare_datasets(merged_df, historical_window_size, prediction_window_size)
+    model = xgboost.create_regressor(n_estimators=n_estimators)
+    model.fit(flat[0], flat[3])
+    return evaluate_model(model, test_df, feature_scaler, historical_window_size, prediction_window_size, num_of_predictions, freq=freq)
+
+
+class Inputs:
+    """Intermediate results of one synthetic station - inputs of the micro-benchmarks, prepared once."""
+
+    def __init__(self, years, resolution, n_estimators, seed, dtype=FEATURE_DTYPE):
+        self.resolution = resolution
+        self.freq = freq = resolution["freq"]
+        self.windows = (resolution["historical_window_size"], resolution["prediction_window_size"])
+        self.num_of_predictions = resolution["num_of_predictions"]
+
+        self.aqi_df, self.merged_df = synthetic_features(years, freq, seed, dtype)
+        self.cleaned_df = aqi.clean_missing_values(aqi.clean_missing_dates(self.aqi_df, freq=freq))
+        self.train_df, self.val_df, self.test_df = split_data(self.merged_df)
+
+        self.feature_scaler = FeatureScaler()
+        self.feature_scaler.fit(self.train_df)
+        self.scaled = [self.feature_scaler.transform(df.copy()) for df in (self.train_df, self.val_df, self.test_df)]
+
+        _, _, flat = prepare_datasets(self.merged_df, *self.windows)
+        self.model = xgboost.create_regressor(n_estimators=n_estimators)
+        self.model.fit(flat[0], flat[3])
+
+        _, self.forecasts, _ = recursive_forecast_arrays(self.model, self.scaled[2], *self.windows, self.num_of_predictions, freq=freq)
+        self.actual, self.predictions = recursive_forecasting(self.model, self.scaled[2], *self.windows, self.num_of_predictions, freq=freq)
+        self.actual = [self.feature_scaler.inverse_transform(value) for value in self.actual]
+        self.predictions = [self.feature_scaler.inverse_transform(prediction) for prediction in self.predictions]
+
+
+# Micro-benchmarks - `setup(inputs)` returns arguments of `run`, only `run` is measured
+MICRO_BENCHMARKS = {
+    "clean_missing_dates": (
+        lambda inputs: (inputs.aqi_df, inputs.freq),
+        lambda aqi_df, freq: aqi.clean_missing_dates(aqi_df, freq=freq),
+    ),
+    "add_calendar_features": (
+        lambda inputs: (inputs.cleaned_df.copy(), inputs.freq),
+        add_calendar_features,
+    ),
+    "feature_scaler_fit": (
+        lambda inputs: (inputs.train_df,),
+        lambda train_df: FeatureScaler().fit(train_df),
+    ),
+    "feature_scaler_transform": (
+        lambda inputs: (inputs.feature_scaler, inputs.train_df.copy()),
+        lambda feature_scaler, train_df: feature_scaler.transform(train_df),
+    ),
+    "feature_scaler_inverse_transform": (
+        lambda inputs: (inputs.feature_scaler, inputs.scaled[0].copy()),
+        lambda feature_scaler, train_df: feature_scaler.inverse_transform(train_df),
+    ),
+    "feature_scaler_inverse_transform_forecasts": (
+        lambda inputs: (inputs.feature_scaler, inputs.forecasts.copy(), inputs.merged_df.columns),
+        lambda feature_scaler, forecasts, columns: feature_scaler.inverse_transform_array(forecasts, columns, out=forecasts),
+    ),
+    "split_to_windows": (
+        lambda inputs: (inputs.scaled, inputs.windows, inputs.merged_df.columns),
+        lambda scaled, windows, columns: flatten_windows(*split_to_windows(*scaled, *windows, target_columns=columns)),
+    ),
+    "recursive_forecasting": (
+        lambda inputs: (inputs.model, inputs.scaled[2], inputs.windows, inputs.num_of_predictions, inputs.freq),
+        lambda model, test_df, windows, num_of_predictions, freq: recursive_forecasting(model, test_df, *windows, num_of_predictions, freq=freq),
+    ),
+    "evaluate_iaqi_predictions": (
+        lambda inputs: (inputs.actual, inputs.predictions, inputs.windows[1], inputs.num_of_predictions),
+        lambda actual, predictions, prediction_window_size, num_of_predictions: evaluate_iaqi_predictions(
+            actual, predictions, prediction_window_size, num_of_predictions
+        ),
+    ),
+    "evaluate_model": (
+        lambda inputs: (inputs.model, inputs.scaled[2], inputs.feature_scaler, inputs.windows, inputs.num_of_predictions, inputs.freq),
+        lambda model, test_df, feature_scaler, windows, num_of_predictions, freq: evaluate_model(
+            model, test_df, feature_scaler, *windows, num_of_predictions, freq=freq
+        ),
+    ),
+}
+END_TO_END = "train_pipeline"
+
+
+def measure(setup, run, repeat):
+    """Median and fastest wall time of `repeat` runs, then peak traced memory of one more run.
+
+    Fast functions are run several times per sample (at least MIN_SAMPLE_SECONDS) so that timer
+    noise doesn't look like a regression. Memory is measured separately - tracing slows allocations
+    down. It covers Python and NumPy allocations, not memory allocated inside XGBoost.
+    """
+    number = 1
+    while True:
+        sample_seconds = _time_runs(setup, run, number)
+        if sample_seconds >= MIN_SAMPLE_SECONDS or number >= 1000:
+            break
+        number *= 10
+    seconds = [sample_seconds / number] + [_time_runs(setup, run, number) / number for _ in range(repeat - 1)]
+
+    args = setup()
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(statistics.median(seconds), 6),
+        "min_seconds": round(min(seconds), 6),
+        "runs_per_sample": number,
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def _time_runs(setup, run, number):
+    # Arguments are prepared up front - setup is not measured
+    all_args = [setup() for _ in range(number)]
+    started_at = time.perf_counter()
+    for args in all_args:
+        run(*args)
+    return time.perf_counter() - started_at
+
+
+def end_to_end_benchmark(args, resolution):
+    feature_groups = [synthetic_feature_group(args.years, args.seed + station) for station in range(args.stations)]
+    work_dirs = []
+
+    def setup():
+        # Every run starts with empty local caches - same as first training of a location
+        work_dirs.append(tempfile.TemporaryDirectory(prefix="aqi_benchmark_"))
+        return (work_dirs[-1].name,)
+
+    def run(work_dir):
+        for station, feature_group in enumerate(feature_groups):
+            train_pipeline(feature_group, os.path.join(work_dir, str(station)), resolution, args.n_estimators, args.seed + station, args.dtype)
+
+    try:
+        return measure(setup, run, args.repeat)
+    finally:
+        for work_dir in work_dirs:
+            work_dir.cleanup()
+
+
+def environment():
+    import numpy
+    import sklearn
+    import xgboost as xgb
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "xgboost": xgb.__version__,
+    }
+
+
+def find_regressions(results, baseline, tolerance, memory_tolerance):
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            continue
+        for key, allowed in (("seconds", tolerance), ("peak_mb", memory_tolerance)):
+            limit = baseline_result[key] * (1 + allowed)
+            if result[key] > limit:
+                regressions.append(f"{name} {key}: {result[key]} vs baseline {baseline_result[key]} (limit {limit:.5g})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro- and end-to-end benchmarks of the training pipeline on synthetic data")
+    parser.add_argument("--years", type=int, default=3, help="Years of synthetic data per station")
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="daily")
+    parser.add_argument("--stations", type=int, default=1, help="Stations trained in the end-to-end benchmark")
+    parser.add_argument("--n-estimators", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of every benchmark (median is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dtype", choices=FEATURE_DTYPES, default=FEATURE_DTYPE, help="Dtype of merged features")
+    parser.add_argument("--only", nargs="+", choices=list(MICRO_BENCHMARKS) + [END_TO_END], help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Results to compare with - regressions exit with 1")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against baseline (0.2 is 20%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="Allowed increase of peak memory against baseline")
+    args = parser.parse_args()
+
+    resolution = RESOLUTIONS[args.resolution]
+    names = args.only or list(MICRO_BENCHMARKS) + [END_TO_END]
+    config = {key: getattr(args, key) for key in ["years", "resolution", "stations", "n_estimators", "seed", "dtype"]}
+    results = {"config": config, "environment": environment(), "benchmarks": {}}
+
+    micro_names = [name for name in names if name in MICRO_BENCHMARKS]
+    if micro_names:
+        LOGGER.info(f"Preparing {args.years} years of synthetic {args.resolution} data...")
+        inputs = Inputs(args.years, resolution, args.n_estimators, args.seed, args.dtype)
+        LOGGER.info(f"Merged features: {inputs.merged_df.shape[0]} rows x {inputs.merged_df.shape[1]} columns")
+    for name in micro_names:
+        setup, run = MICRO_BENCHMARKS[name]
+        results["benchmarks"][name] = measure(lambda: setup(inputs), run, args.repeat)
+        LOGGER.info(f"{name}: {results['benchmarks'][name]}")
+    if END_TO_END in names:
+        LOGGER.info(f"Running end-to-end training of {args.stations} station(s)...")
+        results["benchmarks"][END_TO_END] = end_to_end_benchmark(args, resolution)
+        LOGGER.info(f"{END_TO_END}: {results['benchmarks'][END_TO_END]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        LOGGER.info(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            LOGGER.warning(f"Baseline was recorded with {baseline['config']}, not {config} - not compared")
+        else:
+            if baseline["environment"] != results["environment"]:
+                LOGGER.warning(f"Baseline was recorded in a different environment: {baseline['environment']}")
+            regressions = find_regressions(results, baseline, args.tolerance, args.memory_tolerance)
+            for regression in regressions:
+                LOGGER.error(f"Regression - {regression}")
+            if regressions:
+                sys.exit(1)
+            LOGGER.info(f"No regressions against {args.baseline}")
+    else:
+        LOGGER.info(f"No baseline at {args.baseline} - run with --save-baseline to create it")
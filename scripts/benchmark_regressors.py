@@ -0,0 +1,110 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME
+from src.data.locations import get_location
+from src.model import xgboost
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+DEFAULT_DATA = get_location().merged_features_dir(PROJECT_ROOT, "daily")
+
+
+def _run_backend(backend, args, results):
+    # Runs in its own process - peak RSS then belongs to this backend only
+    from src.data.store import ColumnarStore
+    from src.model.evaluation import get_day_n_metrics
+    from src.model.training import prepare_datasets, evaluate_model
+
+    merged_df = ColumnarStore(args.data).read()
+    feature_scaler, (_, _, test_df), flat = prepare_datasets(
+        merged_df, args.historical_window_size, args.prediction_window_size
+    )
+    X_flat_train, _, _, y_flat_train, _, _ = flat
+
+    model = xgboost.create_regressor(backend, n_jobs=args.n_jobs)
+    fit_started_at = time.perf_counter()
+    model.fit(X_flat_train, y_flat_train)
+    fit_seconds = time.perf_counter() - fit_started_at
+
+    prediction_metrics = evaluate_model(
+        model,
+        test_df,
+        feature_scaler,
+        args.historical_window_size,
+        args.prediction_window_size,
+        args.num_of_predictions,
+    )
+    last_day_metrics = get_day_n_metrics(prediction_metrics, args.prediction_window_size * args.num_of_predictions)
+
+    # Linux reports KB; joblib workers of "parallel" backend are accounted as children
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    results.put(
+        {
+            "backend": backend,
+            "fit_seconds": round(fit_seconds, 3),
+            "peak_rss_mb": round(peak_kb / 1024, 1),
+            "samples": int(X_flat_train.shape[0]),
+            "inputs": int(X_flat_train.shape[1]),
+            "outputs": int(y_flat_train.shape[1]),
+            "willmott": last_day_metrics["Willmott"],
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare regressor backends - wall time, peak memory and Willmott")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="Columnar store with merged features (written by train_model.py)")
+    parser.add_argument("--backends", nargs="+", choices=xgboost.BACKENDS, default=list(xgboost.BACKENDS))
+    parser.add_argument("--n-jobs", type=int, help="Thread budget (all cores by default)")
+    parser.add_argument("--historical-window-size", type=int, default=3)
+    parser.add_argument("--prediction-window-size", type=int, default=3)
+    parser.add_argument("--num-of-predictions", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, "schema.json")):
+        parser.error(f"No merged features in {args.data} - run scripts/train_model.py first")
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        LOGGER.info(f"Benchmarking {backend} backend...")
+        queue = context.Queue()
+        process = context.Process(target=_run_backend, args=(backend, args, queue))
+        process.start()
+        # Result is small - safe to join before reading the queue
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"Benchmark of {backend} backend failed with exit code {process.exitcode}")
+        results.append(queue.get())
+
+    baseline = results[0]
+    for result in results:
+        willmott = ", ".join(f"{key}={value:.3f}" for key, value in result["willmott"].items())
+        LOGGER.info(
+            f"{result['backend']:>17}: fit {result['fit_seconds']:7.2f}s "
+            f"({baseline['fit_seconds'] / result['fit_seconds']:.1f}x), "
+            f"peak {result['peak_rss_mb']:7.1f} MB, Willmott {willmott}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
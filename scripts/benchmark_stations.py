@@ -0,0 +1,180 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME, IAQI_FEATURES
+from src.data.locations import get_location
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Days of feature store rows a station reads on its first request
+RECENT_DAYS = 60
+
+
+def _rss_mb():
+    # Current (not peak) resident memory - Linux only, peak is used elsewhere
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _create_station_models(data_path, models_dir, num_stations, n_estimators):
+    """One model trained on real features, saved once per station - every station unpickles its own copy."""
+    from src.data.store import ColumnarStore
+    from src.model import xgboost
+    from src.model.training import prepare_datasets
+
+    merged_df = ColumnarStore(data_path).read()
+    feature_scaler, _, flat = prepare_datasets(merged_df, 3, 3)
+    model = xgboost.create_regressor(n_estimators=n_estimators)
+    model.fit(flat[0], flat[3])
+
+    station_ids = [f"station_{index:03d}" for index in range(num_stations)]
+    for station_id in station_ids:
+        station_dir = os.path.join(models_dir, station_id)
+        os.makedirs(station_dir, exist_ok=True)
+        joblib.dump(model, os.path.join(station_dir, "aqi_prediction_model.pkl"))
+        joblib.dump(feature_scaler, os.path.join(station_dir, "feature_scaler.bin"))
+        model_config = {
+            "location": station_id,
+            "historical_window_size": 3,
+            "prediction_window_size": 3,
+            "num_of_predictions": 1,
+            "columns": list(merged_df.columns),
+        }
+        with open(os.path.join(station_dir, "model_config.json"), "w") as f:
+            json.dump(model_config, f)
+    return station_ids
+
+
+def _run_capacity(data_path, models_dir, station_ids, capacity, num_requests, seed, results):
+    # Fresh process per capacity - freed models don't always return memory to the OS
+    os.environ["MODEL_FILES_PATH"] = os.path.join(models_dir, station_ids[0])
+    sys.path.append(os.path.dirname(__file__))
+    import predictor
+    from src.common import DAILY
+    from src.data.calendar import calendar_columns
+    from src.data.locations import Location
+    from src.data.store import ColumnarStore
+
+    merged_df = ColumnarStore(data_path).read()
+    recent_df = merged_df.iloc[-RECENT_DAYS:]
+    known_columns = set(IAQI_FEATURES) | set(calendar_columns(DAILY))
+    weather_columns = [column for column in merged_df.columns if column not in known_columns]
+    iaqi_rows = recent_df[IAQI_FEATURES].reset_index(names="event_timestamp")
+
+    # Local stand-ins for feature store and meteostat - only model handling is measured
+    def read_hourly_data(since):
+        return iaqi_rows if since is None else iaqi_rows[iaqi_rows["event_timestamp"] >= since]
+
+    def fetch_weather(start_date, end_date):
+        return merged_df.loc[start_date:end_date, weather_columns].copy()
+
+    def load_station(station_id):
+        location = Location(station_id, station_id, None, (0, 0, 0))
+        return predictor.StationPredictor(
+            os.path.join(models_dir, station_id),
+            location,
+            read_hourly_data=read_hourly_data,
+            fetch_weather=fetch_weather,
+        )
+
+    rss_before_mb = _rss_mb()
+    router = predictor.Predictor(load_station=load_station, max_stations=capacity)
+
+    rng = np.random.default_rng(seed)
+    cold_seconds = []
+    warm_seconds = []
+    for station_id in rng.choice(station_ids, size=num_requests):
+        is_cold = station_id not in router.stations
+        started_at = time.perf_counter()
+        router.predict({"station": station_id})
+        (cold_seconds if is_cold else warm_seconds).append(time.perf_counter() - started_at)
+
+    def percentiles(seconds):
+        if not seconds:
+            return None
+        return {f"p{q}": round(float(np.percentile(seconds, q)) * 1000, 2) for q in (50, 95)}
+
+    rss_after_mb = _rss_mb()
+    results.put(
+        {
+            "capacity": capacity,
+            "stations": len(station_ids),
+            "requests": num_requests,
+            "loads": len(cold_seconds),
+            "hit_rate": round(len(warm_seconds) / num_requests, 3),
+            "cold_ms": percentiles(cold_seconds),
+            "warm_ms": percentiles(warm_seconds),
+            "rss_mb": round(rss_after_mb, 1),
+            "mb_per_loaded_station": round((rss_after_mb - rss_before_mb) / len(router.stations), 2),
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and latency of multi-station Predictor")
+    parser.add_argument("--data", default=get_location().merged_features_dir(PROJECT_ROOT, "daily"), help="Columnar store with merged features")
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--capacities", type=int, nargs="+", default=[8, 50], help="Models kept in memory (PREDICTOR_MAX_STATIONS)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, "schema.json")):
+        parser.error(f"No merged features in {args.data} - run scripts/train_model.py first")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aqi_stations_") as models_dir:
+        LOGGER.info(f"Saving models of {args.stations} stations...")
+        station_ids = _create_station_models(args.data, models_dir, args.stations, args.n_estimators)
+
+        context = multiprocessing.get_context("spawn")
+        for capacity in args.capacities:
+            LOGGER.info(f"Benchmarking {args.requests} requests with {capacity} models in memory...")
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_capacity,
+                args=(args.data, models_dir, station_ids, capacity, args.requests, args.seed, queue),
+            )
+            process.start()
+            # Result is small - safe to join before reading the queue
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Benchmark with capacity {capacity} failed with exit code {process.exitcode}")
+            results.append(queue.get())
+
+    for result in results:
+        LOGGER.info(
+            f"capacity {result['capacity']:>3}: hit rate {result['hit_rate']:.2f}, cold {result['cold_ms']} ms, "
+            f"warm {result['warm_ms']} ms, RSS {result['rss_mb']:.0f} MB "
+            f"({result['mb_per_loaded_station']:.1f} MB per loaded station)"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
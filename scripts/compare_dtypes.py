@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME, IAQI_FEATURES, FEATURE_DTYPES
+from src.data.locations import get_location
+from src.model.training import RESOLUTIONS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+REFERENCE_DTYPE = "float64"
+
+
+def _load_merged(args):
+    if args.synthetic_years:
+        # Imported here - benchmark module sets up its own synthetic pipeline
+        sys.path.append(os.path.dirname(__file__))
+        from benchmark_pipeline import synthetic_features
+
+        _, merged_df = synthetic_features(args.synthetic_years, RESOLUTIONS[args.resolution]["freq"], args.seed, REFERENCE_DTYPE)
+        return merged_df
+
+    from src.data.store import ColumnarStore
+
+    return ColumnarStore(args.data).read().astype(REFERENCE_DTYPE)
+
+
+def _train(dtype, args, merged_path, spans_path, results):
+    # Fresh process per dtype - peak RSS of one doesn't hide the other
+    from src import instrumentation
+    from src.instrumentation import span
+    from src.model import xgboost
+    from src.model.training import prepare_datasets, evaluate_model
+
+    instrumentation.configure(spans_path)
+    resolution = RESOLUTIONS[args.resolution]
+    historical_window_size = resolution["historical_window_size"]
+    prediction_window_size = resolution["prediction_window_size"]
+
+    with span(dtype):
+        with span("load") as stage:
+            merged_df = pd.read_pickle(merged_path).astype(dtype)
+            stage.set(merged=merged_df)
+        with span("prepare") as stage:
+            feature_scaler, scaled, flat = prepare_datasets(merged_df, historical_window_size, prediction_window_size)
+            stage.set(X_train=flat[0], y_train=flat[3], scaled_bytes=sum(int(df.memory_usage().sum()) for df in scaled))
+        with span("fit"):
+            model = xgboost.create_regressor(args.backend, n_estimators=args.n_estimators, n_jobs=args.n_jobs)
+            model.fit(flat[0], flat[3])
+        with span("evaluate"):
+            metrics = evaluate_model(
+                model, scaled[2], feature_scaler, historical_window_size, prediction_window_size,
+                resolution["num_of_predictions"], freq=resolution["freq"],
+            )
+    results.put(metrics)
+
+
+def metric_deltas(metrics, reference_metrics):
+    """(metric, iaqi) rows of reference value, value and their difference - largest over forecasted days and on the last day."""
+    rows = []
+    for metric_name, iaqi_values in reference_metrics.items():
+        for iaqi in IAQI_FEATURES:
+            reference = pd.Series(iaqi_values[iaqi], dtype=float)
+            values = pd.Series(metrics[metric_name][iaqi], dtype=float)
+            deltas = values - reference
+            rows.append(
+                {
+                    "metric": metric_name,
+                    "iaqi": iaqi,
+                    REFERENCE_DTYPE: reference.iloc[-1],
+                    "value": values.iloc[-1],
+                    "last_day_delta": deltas.iloc[-1],
+                    "max_abs_delta": deltas.abs().max(),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and metrics of training with float32 vs float64 features")
+    parser.add_argument("--data", default=get_location().merged_features_dir(PROJECT_ROOT, "daily"), help="Columnar store with merged features")
+    parser.add_argument("--synthetic-years", type=int, help="Use this many years of synthetic data instead of --data")
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="daily", help="Window sizes (and synthetic data) of this resolution")
+    parser.add_argument("--backend", default="per_target")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--n-jobs", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write report as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.synthetic_years and not os.path.exists(os.path.join(args.data, "schema.json")):
+        parser.error(f"No merged features in {args.data} - run scripts/train_model.py first or use --synthetic-years")
+
+    merged_df = _load_merged(args)
+    LOGGER.info(f"Comparing dtypes on {merged_df.shape[0]} rows x {merged_df.shape[1]} columns...")
+
+    report = {"rows": merged_df.shape[0], "columns": merged_df.shape[1], "dtypes": {}}
+    metrics = {}
+    with tempfile.TemporaryDirectory(prefix="aqi_dtypes_") as work_dir:
+        merged_path = os.path.join(work_dir, "merged.pkl")
+        merged_df.to_pickle(merged_path)
+        del merged_df
+
+        context = multiprocessing.get_context("spawn")
+        for dtype in FEATURE_DTYPES:
+            spans_path = os.path.join(work_dir, f"{dtype}.jsonl")
+            queue = context.Queue()
+            process = context.Process(target=_train, args=(dtype, args, merged_path, spans_path, queue))
+            process.start()
+            metrics[dtype] = queue.get()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Training with {dtype} failed with exit code {process.exitcode}")
+
+            with open(spans_path) as spans_file:
+                spans = {record.pop("span"): record for record in map(json.loads, spans_file)}
+            report["dtypes"][dtype] = {
+                "peak_rss_mb": spans[dtype]["peak_rss_mb"],
+                "merged_bytes": spans[f"{dtype}/load"]["merged_bytes"],
+                "scaled_bytes": spans[f"{dtype}/prepare"]["scaled_bytes"],
+                "X_train_bytes": spans[f"{dtype}/prepare"]["X_train_bytes"],
+                "y_train_bytes": spans[f"{dtype}/prepare"]["y_train_bytes"],
+                "stage_seconds": {name.split("/")[-1]: record["wall_seconds"] for name, record in spans.items() if "/" in name},
+                "stage_peak_rss_growth_mb": {name.split("/")[-1]: record["peak_rss_growth_mb"] for name, record in spans.items() if "/" in name},
+            }
+
+    memory_df = pd.DataFrame(
+        {dtype: {key: value for key, value in values.items() if not isinstance(value, dict)} for dtype, values in report["dtypes"].items()}
+    )
+    LOGGER.info(f"Memory:\n{memory_df.to_string()}")
+    LOGGER.info(f"Stage seconds:\n{pd.DataFrame({dtype: values['stage_seconds'] for dtype, values in report['dtypes'].items()}).to_string()}")
+
+    for dtype in FEATURE_DTYPES:
+        if dtype == REFERENCE_DTYPE:
+            continue
+        deltas_df = metric_deltas(metrics[dtype], metrics[REFERENCE_DTYPE])
+        report[f"{dtype}_metric_deltas"] = deltas_df.to_dict(orient="records")
+        last_day_df = deltas_df.pivot(index="metric", columns="iaqi", values="last_day_delta")[IAQI_FEATURES]
+        LOGGER.info(f"Metric deltas of {dtype} - {REFERENCE_DTYPE} on the last forecasted day:\n{last_day_df.to_string(float_format='%.4f')}")
+        LOGGER.info(f"Largest absolute metric delta over all days: {deltas_df['max_abs_delta'].max():.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=float)
@@ -1,9 +1,5 @@
-import requests
-import json
+import argparse
 import os
-import hopsworks
-from hsfs.feature import Feature
-from datetime import datetime
 import pandas as pd
 import sys
 from pathlib import Path
@@ -16,77 +12,64 @@ logging.basicConfig(
 PROJECT_ROOT = str(Path(__file__).parent.parent)
 sys.path.append(PROJECT_ROOT)
 
+from src import instrumentation
 from src.common import LOGGER_NAME
+from src.instrumentation import span
+from src.data import aqi
+from src.data.locations import get_location, get_locations
+from src.data.waqi import fetch_feeds
+from src.hopsworks.ingest import FLUSH_AGE, FLUSH_ROWS, INSERT_ROWS, IngestionBuffer
+from src.hopsworks.local import LocalFeatureStore
+from src.hopsworks.sync import invalidate_local_copy, local_copy_path
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def fetch_current_iaqi():
+FEATURES = [
+    {"name": "event_timestamp", "type": "timestamp", "description": "Timestamp of the event"},
+    {"name": "co", "type": "float", "description": "Individual AQI for Carbon Monoxide (CO)."},
+    {"name": "dew", "type": "float", "description": "Dew Point temperature."},
+    {"name": "h", "type": "float", "description": "Relative Humidity."},
+    {"name": "no2", "type": "float", "description": "Individual AQI for Nitrogen Dioxide (NO2)."},
+    {"name": "p", "type": "float", "description": "Atmospheric Pressure."},
+    {"name": "pm10", "type": "float", "description": "Individual AQI for Particulate Matter (PM10)."},
+    {"name": "pm25", "type": "float", "description": "Individual AQI for Particulate Matter (PM2.5)."},
+    {"name": "so2", "type": "float", "description": "Individual AQI for Sulfur Dioxide (SO2)."},
+    {"name": "t", "type": "float", "description": "Temperature."},
+    {"name": "w", "type": "float", "description": "Wind Speed."},
+]
+FEATURE_NAMES = [feature["name"] for feature in FEATURES]
+
+
+def fetch_current_iaqi(locations):
+    """Current readings of all locations in one concurrent fetch - location id -> one-row frame or error message."""
     aqi_token = os.environ["AQI_TOKEN"]
-    res = requests.get(
-        f"https://api.waqi.info/feed/slovakia/poprad/zeleznicna/?token={aqi_token}"
-    )
-    response = json.loads(res.text)
-
-    if response["status"] == "error":
-        return f"Request error: {response["message"]}"
-
-    date_time = datetime.fromisoformat(response["data"]["time"]["iso"])
-    iaqi_data = {name: data["v"] for name, data in response["data"]["iaqi"].items()}
-
-    current_iaqi_df = pd.DataFrame([iaqi_data], dtype="float32")
-    current_iaqi_df.insert(0, "event_timestamp", date_time)
-
-    return current_iaqi_df
-
-
-def save_to_feature_store(current_iaqi_df):
-    hopsworks_aqi_token = os.environ["HOPSWORKS_AQI_TOKEN"]
-    project = hopsworks.login(api_key_value=hopsworks_aqi_token)
-    feature_store = project.get_feature_store()
-
-    features = [
-        Feature(
-            name="event_timestamp",
-            type="timestamp",
-            description="Timestamp of the event",
-        ),
-        Feature(
-            name="co",
-            type="float",
-            description="Individual AQI for Carbon Monoxide (CO).",
-        ),
-        Feature(name="dew", type="float", description="Dew Point temperature."),
-        Feature(name="h", type="float", description="Relative Humidity."),
-        Feature(
-            name="no2",
-            type="float",
-            description="Individual AQI for Nitrogen Dioxide (NO2).",
-        ),
-        Feature(name="p", type="float", description="Atmospheric Pressure."),
-        Feature(
-            name="pm10",
-            type="float",
-            description="Individual AQI for Particulate Matter (PM10).",
-        ),
-        Feature(
-            name="pm25",
-            type="float",
-            description="Individual AQI for Particulate Matter (PM2.5).",
-        ),
-        Feature(
-            name="so2",
-            type="float",
-            description="Individual AQI for Sulfur Dioxide (SO2).",
-        ),
-        Feature(name="t", type="float", description="Temperature."),
-        Feature(name="w", type="float", description="Wind Speed."),
-    ]
+    columns = FEATURE_NAMES[1:]
+    readings, errors = fetch_feeds([location.waqi_feed for location in locations], aqi_token, columns)
+
+    readings = readings.set_index("feed")
+    results = {}
+    for location in locations:
+        if location.waqi_feed in readings.index:
+            results[location.id] = readings.loc[[location.waqi_feed]].reset_index(drop=True)
+        else:
+            results[location.id] = errors.get(location.waqi_feed, "No reading")
+    return results
+
+
+def get_feature_group(feature_store, location):
+    if isinstance(feature_store, LocalFeatureStore):
+        # Local stand-in takes schema from inserted rows
+        features = None
+    else:
+        from hsfs.feature import Feature
+
+        features = [Feature(**feature) for feature in FEATURES]
 
     iaqi_fg = feature_store.get_or_create_feature_group(
-        name="iaqi",
+        name=location.feature_group,
         version=1,  # TODO: update when schema changes
-        description="Individual AQI and weather hourly data",
+        description=f"Individual AQI and weather hourly data - {location.name}",
         primary_key=["event_timestamp"],
         event_time="event_timestamp",
         online_enabled=False,  # Data used for training don't have to have low latency
@@ -96,29 +79,144 @@ def save_to_feature_store(current_iaqi_df):
     LOGGER.info(
         f"Feature Group '{iaqi_fg.name}' (version {iaqi_fg.version}) retrieved or created successfully."
     )
+    return iaqi_fg
+
+
+def schema_columns(iaqi_df):
+    # Feeds sometimes publish extra readings (e.g. wind gust) - one unknown column would fail the whole batch
+    unknown_columns = [column for column in iaqi_df.columns if column not in FEATURE_NAMES]
+    if unknown_columns:
+        LOGGER.debug(f"Dropping columns missing in feature group schema: {unknown_columns}")
+    return iaqi_df.drop(columns=unknown_columns)
+
+
+def read_backfill(path):
+    backfill_df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, skipinitialspace=True)
+    if "event_timestamp" not in backfill_df.columns:
+        raise ValueError(f"'{path}' has no event_timestamp column")
+    return schema_columns(backfill_df)
+
+
+class FeatureStoreConnection:
+    """Feature store opened on first flush - runs that only log readings don't log in at all."""
+
+    def __init__(self, local_store=None):
+        self.local_store = local_store
+        self._feature_store = None
+
+    def feature_group(self, location):
+        if self._feature_store is None:
+            if self.local_store:
+                self._feature_store = LocalFeatureStore(self.local_store)
+            else:
+                import hopsworks
+
+                hopsworks_aqi_token = os.environ["HOPSWORKS_AQI_TOKEN"]
+                project = hopsworks.login(api_key_value=hopsworks_aqi_token)
+                self._feature_store = project.get_feature_store()
+        return get_feature_group(self._feature_store, location)
+
+
+def ingestion_buffer(location, args):
+    return IngestionBuffer(
+        location.ingest_log(PROJECT_ROOT),
+        flush_rows=args.flush_rows,
+        flush_age=pd.Timedelta(hours=args.flush_age_hours),
+    )
+
+
+def backfill(location, path, connection, args):
+    buffer = ingestion_buffer(location, args)
+    with span("log", location=location.id) as stage:
+        logged_rows = buffer.append(read_backfill(path), skip_flushed=False)
+        stage.set(rows=logged_rows)
+    LOGGER.info(f"Logged {logged_rows} rows from '{path}', inserting in batches of {args.insert_rows}...")
+    with span("flush", location=location.id) as stage:
+        inserted_rows = buffer.flush(connection.feature_group(location), insert_rows=args.insert_rows)
+        stage.set(rows=inserted_rows)
+    LOGGER.info(f"Backfilled {inserted_rows} rows to '{location.feature_group}'")
+    # Backfilled rows are older than the watermark of the local training copy - next sync reads everything
+    invalidate_local_copy(local_copy_path(aqi.current_data_cache_dir(PROJECT_ROOT), location.feature_group))
+
+
+def ingest_current(location, result, connection, args):
+    """Log current reading of the location and flush its log when policy says so, returns False on failure."""
+    buffer = ingestion_buffer(location, args)
+
+    fetched = isinstance(result, pd.DataFrame)
+    if fetched:
+        LOGGER.debug(f"Current IAQI values of {location.name}:\n{result}")
+        with span("log", location=location.id) as stage:
+            logged_rows = buffer.append(result)
+            stage.set(rows=logged_rows)
+        LOGGER.info(
+            "Logged new reading." if logged_rows else "Reading was already ingested - feed has no newer one."
+        )
+    else:
+        # Readings logged by previous runs can still be flushed
+        LOGGER.error(f"Failed to fetch current IAQI values of {location.name}: {result}")
+
+    if not (args.flush or buffer.should_flush()):
+        LOGGER.info(f"{len(buffer.pending())} readings waiting for flush")
+        return fetched
 
     try:
-        iaqi_fg.insert(current_iaqi_df)
-        return "Successfully updated feature store"
+        with span("flush", location=location.id) as stage:
+            inserted_rows = buffer.flush(connection.feature_group(location))
+            stage.set(rows=inserted_rows)
+        LOGGER.info(f"Successfully inserted {inserted_rows} readings to feature store")
     except Exception as e:
+        # Readings stay in the log - next run retries them
         LOGGER.error(f"Failed to update feature group: {e}")
-        return "Failed to update feature group: insertion error"
+        return False
+    return fetched
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch current IAQI values to feature store")
+    parser.add_argument(
+        "--location",
+        nargs="+",
+        help="Location ids from src/data/locations.json (all locations by default)",
+    )
+    parser.add_argument("--flush", action="store_true", help="Insert logged readings regardless of flush policy")
+    parser.add_argument("--flush-rows", type=int, default=FLUSH_ROWS, help="Flush once this many readings are logged")
+    parser.add_argument(
+        "--flush-age-hours",
+        type=float,
+        default=FLUSH_AGE / pd.Timedelta(hours=1),
+        help="Flush once the oldest logged reading is this old",
+    )
+    parser.add_argument("--backfill", help="CSV or Parquet file with event_timestamp and IAQI columns to insert")
+    parser.add_argument("--insert-rows", type=int, default=INSERT_ROWS, help="Rows of a single backfill insert")
+    parser.add_argument("--local-store", help="Directory of local stand-in feature store (instead of Hopsworks)")
+    parser.add_argument("--spans", help=f"Append timing and memory of every stage as JSON lines to this file (or ${instrumentation.SPANS_PATH_ENV})")
+    parser.add_argument("--prometheus-textfile", help=f"Write stage metrics for Prometheus textfile collector (or ${instrumentation.PROMETHEUS_TEXTFILE_ENV})")
+    args = parser.parse_args()
+    instrumentation.configure(args.spans, args.prometheus_textfile)
+
     # TODO: comment out for production
     # LOGGER.setLevel(logging.DEBUG)
 
-    LOGGER.info("Fetching current IAQI values...")
-    result = fetch_current_iaqi()
-    if not isinstance(result, pd.DataFrame):
-        LOGGER.error(f"Failed to fetch current IAQI values: {result}")
+    locations = [get_location(location_id) for location_id in args.location] if args.location else list(get_locations().values())
+    connection = FeatureStoreConnection(args.local_store)
+
+    if args.backfill:
+        if len(locations) != 1:
+            parser.error("--backfill loads data of a single location, pick it with --location")
+        with span("backfill"):
+            backfill(locations[0], args.backfill, connection, args)
+        sys.exit(0)
+
+    with span("fetch_data", locations=len(locations)):
+        LOGGER.info(f"Fetching current IAQI values of {len(locations)} locations...")
+        with span("fetch_feeds", locations=len(locations)):
+            results = fetch_current_iaqi(locations)
+        failed_locations = [
+            location.id for location in locations if not ingest_current(location, results[location.id], connection, args)
+        ]
+
+    # One failing station shouldn't stop the others, but the job still has to report it
+    if failed_locations:
+        LOGGER.error(f"Failed locations: {failed_locations}")
         sys.exit(1)
-
-    LOGGER.info("Successfully fetched current IAQI values.")
-    LOGGER.debug(f"Current IAQI values:\n{result}")
-    current_iaqi_df = result
-
-    LOGGER.info("Saving current IAQI values to feature store...")
-    result = save_to_feature_store(current_iaqi_df)
-    LOGGER.info(result)
@@ -1,109 +1,515 @@
+import time
+
+# Start-up is measured from here - with scale-to-zero deployment every cold start pays for it
+STARTUP_STARTED_AT = time.perf_counter()
+
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
 import joblib
-import hopsworks
 import numpy as np
 import pandas as pd
-import os
-import sys
 
-print(f"Python executable: {sys.executable}")
-print(f"Python path: {sys.path}")
-print(f"Available packages:")
-import pkg_resources
+# Cold start (imports + artifact loading) above this budget is reported as a warning
+STARTUP_BUDGET_SECONDS = float(os.environ.get("PREDICTOR_STARTUP_BUDGET_SECONDS", "5"))
 
-installed_packages = [d.project_name for d in pkg_resources.working_set]
-print(installed_packages)
+# Environment details are printed only on demand - scanning installed packages is slow
+if os.environ.get("PREDICTOR_DEBUG_ENVIRONMENT"):
+    from importlib.metadata import distributions
+
+    print(f"Python executable: {sys.executable}")
+    print(f"Python path: {sys.path}")
+    print(f"Available packages: {[d.metadata['Name'] for d in distributions()]}")
 
 # Add sources to the path
 MODEL_FILES_PATH = os.environ["MODEL_FILES_PATH"]
 sys.path.append(MODEL_FILES_PATH)
 
-from src.data import aqi, meteo
-from src.data.calendar import add_calendar_features
-from src.data.features import _flatten_windows
+# hopsworks and meteostat are imported on first use (first request)
+from src.data import meteo
+from src.common import DAILY, HOURLY, IAQI_FEATURES
+from src.data.calendar import calendar_columns, calendar_features
+from src.data.feature_state import FeatureState
+from src.data.locations import DEFAULT_LOCATION, get_location
+from src.data.features import Windows
+from src.model.forecast_cache import ForecastCache
+from src.model.inference import forecast_windows
+from src.model.trees import TreeEnsemble
+from src.hopsworks.sync import read_since
+# Stage spans are exported when AQI_SPANS_PATH or AQI_PROMETHEUS_TEXTFILE is set
+from src.instrumentation import span
 
+IMPORTS_FINISHED_AT = time.perf_counter()
 
-class Predictor:
-    def __init__(self):
-        model_dir = os.environ["MODEL_FILES_PATH"]
-        self.model = joblib.load(os.path.join(model_dir, "aqi_prediction_model.pkl"))
-        self.feature_scaler = joblib.load(os.path.join(model_dir, "feature_scaler.bin"))
-
-    def predict(self, _):
-        # Once model is trained, these are fixed and we have to remember them
-        # TODO: remember and reuse
-        historical_window_size = 3
-        prediction_window_size = 3
-        num_of_predictions = 1
-
-        # Prepare historical data
-        # TODO: this is same as in train_model script - reuse
-        # TODO: store processed features in feature store (together with historical)
+MODEL_FILE = "aqi_prediction_model.pkl"
+# Same model as flat tree arrays - memory-mapped, no unpickling (see src/model/trees.py)
+MODEL_TREES_FILE = "aqi_prediction_model.trees"
+# "pickle" serves the pickled model even when tree ensemble file exists (models saved before it always do)
+MODEL_FORMAT = os.environ.get("PREDICTOR_MODEL_FORMAT", "trees")
+FEATURE_SCALER_FILE = "feature_scaler.bin"
+MODEL_CONFIG_FILE = "model_config.json"
+# Models of other stations than the deployed one are downloaded here
+MODELS_CACHE_DIR = os.environ.get(
+    "PREDICTOR_MODELS_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "aqi_prediction", "models"),
+)
+# Station models kept in memory at once - least recently used are dropped
+MAX_STATIONS = int(os.environ.get("PREDICTOR_MAX_STATIONS", "8"))
+# Batch requests can start forecasts this many periods (days or hours) before the latest data
+MAX_ORIGIN_AGE = int(os.environ.get("PREDICTOR_MAX_ORIGIN_AGE", "30"))
+# Forecasts of a single batch request - bounds memory of one request
+MAX_BATCH_SIZE = int(os.environ.get("PREDICTOR_MAX_BATCH_SIZE", "1000"))
+# Feature store and weather are checked for new data at most this often - requests in between use data already read
+REFRESH_INTERVAL_SECONDS = float(os.environ.get("PREDICTOR_REFRESH_INTERVAL_SECONDS", "60"))
+# Forecast results - reused until model or data change (or TTL passes)
+FORECAST_CACHE_SIZE = int(os.environ.get("PREDICTOR_FORECAST_CACHE_SIZE", "256"))
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get("PREDICTOR_FORECAST_CACHE_TTL_SECONDS", "3600"))
+# Weather days survive restarts of the serving container (as long as its disk does)
+WEATHER_CACHE_DIR = os.environ.get(
+    "PREDICTOR_WEATHER_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "aqi_prediction", "weather"),
+)
+
+
+def _load_model_config(model_dir):
+    config_path = os.path.join(model_dir, MODEL_CONFIG_FILE)
+    # Models saved before config was introduced
+    if not os.path.exists(config_path):
+        return {}
 
-        # aqi_df = aqi._load_current_data()
-        project = hopsworks.login()
-        feature_store = project.get_feature_store()
-        iaqi_fg = feature_store.get_feature_group(name="iaqi", version=1)
-
-        iaqi_fg_df = iaqi_fg.select(
-            ["event_timestamp", "pm25", "pm10", "no2", "so2", "co"]
-        ).read()
-        # Remove TimeZone info and reset to 0 hours so that it can be compared to historical data
-        iaqi_fg_df["event_timestamp"] = (
-            pd.to_datetime(iaqi_fg_df["event_timestamp"])
-            .dt.tz_localize(None)
-            .dt.normalize()
+    with open(config_path) as config_file:
+        model_config = json.load(config_file)
+
+    # Cheap check before unpickling - catches truncated or mismatched uploads
+    for file_name, expected_size in model_config.get("artifacts", {}).items():
+        actual_size = os.path.getsize(os.path.join(model_dir, file_name))
+        if actual_size != expected_size:
+            raise ValueError(
+                f"Artifact '{file_name}' has {actual_size} bytes, expected {expected_size}."
+            )
+
+    return model_config
+
+
+def _load_model(model_dir, model_config):
+    """Model and its version - fingerprint of tree arrays or content hash of the pickled model."""
+    # Only a tree ensemble the config lists was verified against the pickled model when saved
+    trees_path = os.path.join(model_dir, MODEL_TREES_FILE)
+    if MODEL_FORMAT == "trees" and MODEL_TREES_FILE in model_config.get("artifacts", {}):
+        model = TreeEnsemble.load(trees_path)
+        return model, model.fingerprint
+
+    with open(os.path.join(model_dir, MODEL_FILE), "rb") as model_file:
+        model_bytes = model_file.read()
+    return joblib.load(io.BytesIO(model_bytes)), hashlib.sha1(model_bytes).hexdigest()[:12]
+
+
+def _validate_model(model, feature_scaler, model_config):
+    columns = model_config.get("columns")
+    if not columns:
+        return
+
+    historical_window_size = model_config["historical_window_size"]
+    prediction_window_size = model_config["prediction_window_size"]
+    expected_inputs = historical_window_size * len(columns)
+    expected_outputs = prediction_window_size * len(columns)
+    if getattr(model, "n_features_in_", expected_inputs) != expected_inputs:
+        raise ValueError(
+            f"Model expects {model.n_features_in_} inputs, config implies {expected_inputs}."
+        )
+    if len(getattr(model, "estimators_", [None] * expected_outputs)) != expected_outputs:
+        raise ValueError(
+            f"Model has {len(model.estimators_)} outputs, config implies {expected_outputs}."
+        )
+    if getattr(model, "n_targets", expected_outputs) != expected_outputs:
+        raise ValueError(
+            f"Model has {model.n_targets} outputs, config implies {expected_outputs}."
         )
 
-        iaqi_fg_df = iaqi_fg_df.groupby(
-            iaqi_fg_df["event_timestamp"], as_index=True
-        ).mean()
-        iaqi_fg_df = iaqi_fg_df.sort_index()
-        aqi_df = iaqi_fg_df
+    unknown_features = set(feature_scaler.numerical_features) - set(columns)
+    if unknown_features:
+        raise ValueError(f"Scaler uses features missing in model: {unknown_features}")
 
-        aqi_df = aqi.clean_missing_dates(aqi_df)
-        aqi_df = aqi.clean_missing_values(aqi_df)
-        aqi_df = add_calendar_features(aqi_df)
-        aqi_df.index = aqi_df.index.astype("datetime64[ns]")
 
-        weather_df = meteo.fetch_daily_data(aqi_df)
-        weather_df = meteo.clean_missing_values(weather_df)
-        weather_df.index = weather_df.index.astype("datetime64[ns]")
+class StationPredictor:
+    """Model of a single location with its latest feature window."""
 
-        merged_df = pd.merge_asof(aqi_df, weather_df, left_index=True, right_index=True)
-        merged_df = merged_df.astype(float)
+    # Once model is trained, these are fixed - defaults for models saved without config
+    historical_window_size = 3
+    prediction_window_size = 3
+    num_of_predictions = 1
 
-        X = merged_df[-historical_window_size:]
-        X = self.feature_scaler.transform(X)
+    def __init__(self, model_dir, location, model_config=None, read_hourly_data=None, fetch_weather=None):
+        self.location = location
+        if model_config is None:
+            model_config = _load_model_config(model_dir)
+        self.historical_window_size = model_config.get(
+            "historical_window_size", self.historical_window_size
+        )
+        self.prediction_window_size = model_config.get(
+            "prediction_window_size", self.prediction_window_size
+        )
+        self.num_of_predictions = model_config.get(
+            "num_of_predictions", self.num_of_predictions
+        )
+        self.freq = model_config.get("freq", DAILY)
 
-        for day in range(num_of_predictions):
-            # Input expects multiple windows
-            X_flat = _flatten_windows([X])
+        # Model version identifies the model - cached forecasts of another version are never reused
+        self.model, self.model_version = _load_model(model_dir, model_config)
+        self.feature_scaler = joblib.load(os.path.join(model_dir, FEATURE_SCALER_FILE))
+        _validate_model(self.model, self.feature_scaler, model_config)
 
-            y_pred = self.model.predict(X_flat)
+        self.iaqi_fg = None
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        # Preprocessed and scaled latest window - refreshed with new data only
+        # TODO: store processed features in feature store (together with historical)
+        self.feature_state = FeatureState(
+            self.feature_scaler,
+            self.historical_window_size,
+            read_hourly_data or self._read_hourly_data,
+            fetch_weather
+            or partial(
+                meteo.fetch_hourly_range if self.freq == HOURLY else meteo.fetch_daily_range,
+                cache_dir=WEATHER_CACHE_DIR,
+                station=location.weather_station,
+            ),
+            self.freq,
+            history_size=self.historical_window_size + MAX_ORIGIN_AGE,
+            # Models saved before dtype policy were trained on float64
+            dtype=model_config.get("dtype", "float64"),
+        )
 
-            # Split y_pred into 3 arrays, one for each prediction day
-            y_pred_split = np.split(y_pred.flatten(), prediction_window_size)
+    def _read_hourly_data(self, since):
+        # Keep the feature group for next requests
+        if self.iaqi_fg is None:
+            feature_store = _hopsworks_project().get_feature_store()
+            self.iaqi_fg = feature_store.get_feature_group(name=self.location.feature_group, version=1)
 
-            # Create DataFrame for predictions, each row is a prediction day
-            predictions_df = pd.DataFrame(y_pred_split, columns=merged_df.columns)
+        return read_since(
+            self.iaqi_fg, ["event_timestamp", "pm25", "pm10", "no2", "so2", "co"], since
+        )
 
-            # Set the index to continue from the last date in merged_df
-            last_date = X.index[-1]
-            future_dates = pd.date_range(
-                start=last_date + pd.Timedelta(days=1),
-                periods=prediction_window_size,
-                freq="D",
-            )
-            predictions_df.index = future_dates
+    def refresh(self):
+        """Read new data unless it was checked in last REFRESH_INTERVAL_SECONDS."""
+        # Concurrent requests wait for one refresh and use its data
+        with self._refresh_lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < REFRESH_INTERVAL_SECONDS:
+                return
+            with span("refresh", station=self.location.id):
+                self.feature_state.refresh()
+            self._refreshed_at = time.monotonic()
 
-            # Add predictions to the end so that we can use them as input (don't forget to remove the same number of items as we added - model expects certain size)
-            X = pd.concat([X[prediction_window_size:], predictions_df], axis=0)
+    def state_key(self):
+        """Forecasts change only with model or data - latest IAQI reading and latest weather day."""
+        return (
+            self.model_version,
+            self.feature_state.aqi_watermark,
+            self.feature_state.weather_watermark,
+        )
 
-        X = self.feature_scaler.inverse_transform(X)
+    def predict(self):
+        """Forecast from the latest data as JSON of IAQI values indexed by forecasted dates."""
+        self.refresh()
+        future_dates, forecast_df = self._forecast(self.feature_state.window.index[-1:])
 
+        X = forecast_df.set_axis(pd.DatetimeIndex(future_dates[0]))
         # Definition of Air Quality Index is maximum value of Individual Air Quality Indexes
-        iaqi_features = ["pm25", "pm10", "no2", "so2", "co"]
-        X["aqi"] = X[iaqi_features].max(axis=1)
+        X["aqi"] = X[IAQI_FEATURES].max(axis=1)
 
-        result = X[-num_of_predictions * prediction_window_size :][iaqi_features]
+        result = X[IAQI_FEATURES]
         return result.to_json()
+
+    def predict_batch(self, instances):
+        """
+        Forecasts of many instances in one pass - frame with origin, date, IAQI values and AQI, horizon rows per instance.
+
+        Instance can set "origin" (last date of input window, latest data by default) and "weather"
+        (raw weather values of forecasted periods by column, e.g. {"tavg": [21.5, 23.0]}) - unset periods are predicted.
+        Weather feeds recursive steps, so it changes forecasts after the first prediction window only.
+        """
+        self.refresh()
+        history = self.feature_state.history
+        horizon = self.prediction_window_size * self.num_of_predictions
+
+        origins = pd.DatetimeIndex(
+            [pd.Timestamp(instance.get("origin") or history.index[-1]) for instance in instances]
+        ).floor(self.freq)
+        weather_df = self._weather_overrides(instances, horizon, history.columns)
+        future_dates, forecast_df = self._forecast(origins, weather_df)
+
+        forecast_df = forecast_df[IAQI_FEATURES]
+        forecast_df.insert(0, "date", future_dates.ravel())
+        forecast_df.insert(0, "origin", origins.repeat(horizon))
+        forecast_df["aqi"] = forecast_df[IAQI_FEATURES].max(axis=1)
+        return forecast_df
+
+    def _weather_overrides(self, instances, horizon, columns):
+        # Raw values of forecasted periods, one row per period of every instance - NaN where not given
+        weather_columns = sorted({column for instance in instances for column in instance.get("weather", {})})
+        if not weather_columns:
+            return None
+        # IAQI values are what is forecasted and calendar is always known - only weather can be set
+        settable_columns = set(columns) - set(IAQI_FEATURES) - set(calendar_columns(self.freq))
+        unknown_columns = sorted(set(weather_columns) - settable_columns)
+        if unknown_columns:
+            raise ValueError(f"Weather can't set {unknown_columns}, settable columns are {sorted(settable_columns)}")
+
+        weather_values = np.full((len(instances), horizon, len(weather_columns)), np.nan)
+        for position, instance in enumerate(instances):
+            for column, values in instance.get("weather", {}).items():
+                if len(values) > horizon:
+                    raise ValueError(f"Weather '{column}' has {len(values)} values, forecast has {horizon} periods")
+                weather_values[position, : len(values), weather_columns.index(column)] = values
+        return pd.DataFrame(weather_values.reshape(-1, len(weather_columns)), columns=weather_columns)
+
+    def _forecast(self, origins, weather_df=None):
+        """Forecast from all origins in one recursive loop - returns (origins x horizon) dates and unscaled rows."""
+        history = self.feature_state.history
+        historical_window_size = self.historical_window_size
+        horizon = self.prediction_window_size * self.num_of_predictions
+
+        positions = history.index.get_indexer(origins)
+        out_of_history = positions < historical_window_size - 1
+        if out_of_history.any():
+            raise ValueError(
+                f"Origins {[str(origin) for origin in origins[out_of_history]]} are not within "
+                f"{history.index[historical_window_size - 1]} - {history.index[-1]}"
+            )
+        # Window of every origin ends at the origin
+        input_windows = Windows.from_frame(history, historical_window_size).values[
+            positions - historical_window_size + 1
+        ]
+
+        # Dates continue from the origin
+        forecast_periods = pd.to_timedelta(np.arange(1, horizon + 1), unit=self.freq).values
+        future_dates = origins.values[:, np.newaxis] + forecast_periods
+
+        # Calendar of forecasted days is known - no need to use predicted values (same for weather given by request)
+        known_columns = calendar_columns(self.freq)
+        known_df = calendar_features(pd.DatetimeIndex(future_dates.ravel()), self.freq)[known_columns].reset_index(drop=True)
+        if weather_df is not None:
+            known_df = pd.concat([known_df, weather_df], axis=1)
+        known_values = self.feature_scaler.transform_array(known_df.to_numpy(dtype=np.float64), known_df.columns)
+        future_features = (
+            history.columns.get_indexer(known_df.columns),
+            known_values.reshape(len(origins), horizon, len(known_df.columns)),
+        )
+
+        with span("forecast", station=self.location.id, origins=len(origins)):
+            forecast = forecast_windows(
+                self.model,
+                input_windows,
+                self.prediction_window_size,
+                self.num_of_predictions,
+                future_features=future_features,
+            )
+
+        # Forecasts of all origins are unscaled in one pass
+        forecast = self.feature_scaler.inverse_transform_array(forecast, history.columns, out=forecast)
+        return future_dates, pd.DataFrame(forecast.reshape(-1, len(history.columns)), columns=history.columns)
+
+
+class Predictor:
+    """
+    Serves all locations from one deployment.
+
+    Model of the deployed location is loaded at start-up, models of other locations are downloaded
+    from model registry on their first request. Only MAX_STATIONS of them are kept in memory -
+    least recently used are dropped (their files stay on disk, so loading them again is cheaper).
+    """
+
+    def __init__(self, load_station=None, max_stations=MAX_STATIONS):
+        load_started_at = time.perf_counter()
+
+        model_config = _load_model_config(MODEL_FILES_PATH)
+        self.default_station = model_config.get("location", DEFAULT_LOCATION)
+        self.load_station = load_station or self._load_station
+        self.max_stations = max_stations
+        # Station id -> StationPredictor, ordered from least to most recently used
+        self.stations = OrderedDict()
+        self._stations_lock = threading.Lock()
+        # Station id -> Future of its model being loaded
+        self._loading_stations = {}
+        self.forecast_cache = ForecastCache(FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL_SECONDS)
+        if load_station is None:
+            self.stations[self.default_station] = StationPredictor(
+                MODEL_FILES_PATH, get_location(self.default_station), model_config
+            )
+        else:
+            self.stations[self.default_station] = load_station(self.default_station)
+
+        loaded_at = time.perf_counter()
+        self.startup_timings = {
+            "import": IMPORTS_FINISHED_AT - STARTUP_STARTED_AT,
+            "load": loaded_at - load_started_at,
+        }
+        startup_seconds = loaded_at - STARTUP_STARTED_AT
+        if startup_seconds > STARTUP_BUDGET_SECONDS:
+            print(
+                f"Warning: start-up took {startup_seconds:.2f}s, budget is {STARTUP_BUDGET_SECONDS:.2f}s"
+            )
+
+    def _load_station(self, station_id):
+        location = get_location(station_id)
+        if station_id == self.default_station:
+            return StationPredictor(MODEL_FILES_PATH, location)
+        return StationPredictor(_download_station_model(location), location)
+
+    def station(self, station_id):
+        # Concurrent first requests of a station load its model once - requests of other stations don't wait for it
+        with self._stations_lock:
+            if station_id in self.stations:
+                self.stations.move_to_end(station_id)
+                return self.stations[station_id]
+
+            future = self._loading_stations.get(station_id)
+            is_owner = future is None
+            if is_owner:
+                future = self._loading_stations[station_id] = Future()
+
+        if not is_owner:
+            # Raises the exception of the load too
+            return future.result()
+
+        try:
+            with span("load_station", station=station_id):
+                station = self.load_station(station_id)
+        except BaseException as e:
+            with self._stations_lock:
+                del self._loading_stations[station_id]
+            future.set_exception(e)
+            raise
+
+        with self._stations_lock:
+            self.stations[station_id] = station
+            while len(self.stations) > self.max_stations:
+                evicted_id, _ = self.stations.popitem(last=False)
+                print(f"Evicted model of station '{evicted_id}'")
+            del self._loading_stations[station_id]
+        future.set_result(station)
+        return station
+
+    def _cached_forecast(self, station_id, request_key, compute):
+        station = self.station(station_id)
+        station.refresh()
+        return self.forecast_cache.get_or_compute((station_id, *station.state_key(), request_key), partial(compute, station))
+
+    def predict(self, inputs):
+        if "first_predict" in self.startup_timings:
+            return self._predict(inputs)
+
+        first_predict_started_at = time.perf_counter()
+        result = self._predict(inputs)
+        self.startup_timings["first_predict"] = (
+            time.perf_counter() - first_predict_started_at
+        )
+        print(
+            "Start-up breakdown: "
+            + ", ".join(
+                f"{stage} {seconds:.3f}s" for stage, seconds in self.startup_timings.items()
+            )
+        )
+        return result
+
+    def _predict(self, inputs):
+        instances = _batch_instances(inputs)
+        if instances is not None:
+            with span("predict_batch", instances=len(instances)):
+                return self._predict_batch(instances)
+
+        station_id = _station_id(inputs) or self.default_station
+        with span("predict", station=station_id):
+            return self._cached_forecast(station_id, "latest", StationPredictor.predict)
+
+    def _predict_batch(self, instances):
+        if len(instances) > MAX_BATCH_SIZE:
+            raise ValueError(f"Batch of {len(instances)} forecasts, at most {MAX_BATCH_SIZE} are allowed")
+        started_at = time.perf_counter()
+
+        # Every station model forecasts all of its instances at once
+        station_positions = {}
+        for position, instance in enumerate(instances):
+            station_positions.setdefault(instance.get("station") or self.default_station, []).append(position)
+
+        forecast_dfs = []
+        for station_id, positions in station_positions.items():
+            station_instances = [instances[position] for position in positions]
+            # Cached frame is shared - columns are added to a copy
+            forecast_df = self._cached_forecast(
+                station_id,
+                json.dumps(station_instances, sort_keys=True),
+                partial(StationPredictor.predict_batch, instances=station_instances),
+            ).copy()
+            forecast_df.insert(0, "station", station_id)
+            forecast_df.insert(0, "instance", np.repeat(positions, len(forecast_df) // len(positions)))
+            forecast_dfs.append(forecast_df)
+        result_df = pd.concat(forecast_dfs, ignore_index=True).sort_values("instance", kind="stable")
+
+        seconds = time.perf_counter() - started_at
+        print(f"Batch of {len(instances)} forecasts in {seconds:.3f}s ({len(instances) / seconds:.0f} forecasts/s)")
+        return _columnar(result_df)
+
+
+def _batch_instances(inputs):
+    """Instances of a batch request - list of dicts, also inside "instances" (None for single forecast requests)."""
+    if isinstance(inputs, dict):
+        inputs = inputs.get("instances")
+    if isinstance(inputs, (list, tuple)) and inputs and all(isinstance(instance, dict) for instance in inputs):
+        return list(inputs)
+    return None
+
+
+def _station_id(inputs):
+    """Station of a single forecast request - {"station": id} or ["id"] (also inside "instances")."""
+    if isinstance(inputs, dict):
+        if "station" in inputs:
+            return inputs["station"]
+        inputs = inputs.get("instances")
+    if isinstance(inputs, (list, tuple)) and inputs and isinstance(inputs[0], str):
+        return inputs[0]
+    return None
+
+
+def _columnar(result_df):
+    # One list per column instead of one object per row - keys are not repeated for every forecasted period
+    response = {column: result_df[column].tolist() for column in result_df.columns}
+    for column in ("origin", "date"):
+        response[column] = result_df[column].dt.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+    return response
+
+
+_project = None
+
+
+def _hopsworks_project():
+    # Login once - shared by all stations
+    global _project
+    if _project is None:
+        import hopsworks
+
+        _project = hopsworks.login()
+    return _project
+
+
+def _download_station_model(location):
+    from src.hopsworks.client import best_model
+
+    model_registry = _hopsworks_project().get_model_registry()
+    model = best_model(model_registry.get_models(location.model_name))
+    if model is None:
+        raise ValueError(f"No trained model for station '{location.id}'")
+
+    model_dir = os.path.join(MODELS_CACHE_DIR, location.model_name, str(model.version))
+    # Evicted station loaded again - files are already on disk
+    if not os.path.exists(os.path.join(model_dir, MODEL_CONFIG_FILE)):
+        os.makedirs(model_dir, exist_ok=True)
+        model.download(local_path=model_dir, overwrite=True)
+    return model_dir
@@ -0,0 +1,300 @@
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME, DAILY, HOURLY
+from src.data.features import FeatureScaler, dataset_windows
+from src.data.locations import DEFAULT_LOCATION, get_location
+from src.data.store import ColumnarStore, write_shared_frame, read_shared_frame
+from src.model import xgboost
+from src.model.evaluation import get_day_n_metrics
+from src.model.training import split_data, evaluate_model
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Window sizes are in units of the resolution, forecast horizon stays fixed so scores are comparable
+SEARCH_SPACES = {
+    "daily": {
+        "freq": DAILY,
+        "horizon": 3,
+        "space": {
+            "historical_window_size": [1, 2, 3, 5, 7],
+            "prediction_window_size": [1, 3],
+            "max_depth": [3, 4, 6, 8],
+            "learning_rate": [0.03, 0.1, 0.3],
+            "subsample": [0.6, 0.8, 1.0],
+            "colsample_bytree": [0.6, 0.8, 1.0],
+            "min_child_weight": [1, 5],
+        },
+    },
+    "hourly": {
+        "freq": HOURLY,
+        "horizon": 24,
+        "space": {
+            "historical_window_size": [12, 24, 48],
+            "prediction_window_size": [6, 12],
+            "max_depth": [4, 6, 8],
+            "learning_rate": [0.05, 0.1, 0.3],
+            "subsample": [0.6, 0.8, 1.0],
+            "colsample_bytree": [0.6, 0.8, 1.0],
+            "min_child_weight": [1, 5],
+        },
+    },
+}
+
+SETTINGS_FILE = "search.json"
+FEATURES_DIR = "features"
+SCALER_FILE = "feature_scaler.bin"
+RESULTS_FILE = "results.jsonl"
+BEST_FILE = "best.json"
+
+# Set once per worker process by _init_worker
+_WORKER = {}
+
+
+def _sample_candidates(space, horizon, trials, seed):
+    # Same seed gives same candidates - needed for resuming
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    # Recursive forecasting has to end exactly at the horizon
+    grid = [params for params in grid if horizon % params["prediction_window_size"] == 0]
+    return random.Random(seed).sample(grid, min(trials, len(grid)))
+
+
+def _candidate_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def _rung_estimators(max_estimators, eta, rungs):
+    return [max(1, round(max_estimators / eta ** (rungs - 1 - rung))) for rung in range(rungs)]
+
+
+def _prepare_search_dir(search_dir, data_path, settings, restart):
+    settings_path = os.path.join(search_dir, SETTINGS_FILE)
+    if os.path.exists(settings_path) and not restart:
+        previous_settings = {key: value for key, value in _load_settings(search_dir).items() if key in settings}
+        if previous_settings != settings:
+            raise ValueError(
+                f"Search in '{search_dir}' was started with different settings - use --restart or another --name"
+            )
+        LOGGER.info(f"Resuming search in {search_dir}...")
+        return
+
+    shutil.rmtree(search_dir, ignore_errors=True)
+    os.makedirs(search_dir)
+
+    # Scaled train and validation rows are written once - workers map the same file instead of copying arrays
+    merged_df = ColumnarStore(data_path).read()
+    train_df, val_df, _ = split_data(merged_df)
+    feature_scaler = FeatureScaler()
+    feature_scaler.fit(train_df)
+    features_df = feature_scaler.transform(pd.concat([train_df, val_df]))
+
+    write_shared_frame(features_df, os.path.join(search_dir, FEATURES_DIR))
+    joblib.dump(feature_scaler, os.path.join(search_dir, SCALER_FILE))
+
+    settings = {
+        **settings,
+        "columns": list(merged_df.columns),
+        "num_train": len(train_df),
+    }
+    with open(settings_path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+
+def _load_settings(search_dir):
+    with open(os.path.join(search_dir, SETTINGS_FILE)) as f:
+        return json.load(f)
+
+
+def _load_results(search_dir):
+    results = {}
+    results_path = os.path.join(search_dir, RESULTS_FILE)
+    if not os.path.exists(results_path):
+        return results
+    with open(results_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line can be incomplete if search was killed while writing
+                continue
+            results[(result["rung"], result["key"])] = result
+    return results
+
+
+def _init_worker(search_dir, threads):
+    settings = _load_settings(search_dir)
+    features_df = read_shared_frame(os.path.join(search_dir, FEATURES_DIR))
+    num_train = settings["num_train"]
+
+    _WORKER["settings"] = settings
+    _WORKER["threads"] = threads
+    _WORKER["train_df"] = features_df.iloc[:num_train]
+    _WORKER["val_df"] = features_df.iloc[num_train:]
+    _WORKER["feature_scaler"] = joblib.load(os.path.join(search_dir, SCALER_FILE))
+
+
+def _evaluate_candidate(params, n_estimators):
+    settings = _WORKER["settings"]
+    horizon = settings["horizon"]
+    model_params = dict(params)
+    historical_window_size = model_params.pop("historical_window_size")
+    prediction_window_size = model_params.pop("prediction_window_size")
+
+    X_flat_train, y_flat_train = dataset_windows(
+        _WORKER["train_df"], historical_window_size, prediction_window_size, settings["columns"]
+    )
+    model = xgboost.create_regressor(
+        settings["backend"], n_jobs=_WORKER["threads"], n_estimators=n_estimators, **model_params
+    )
+    fit_started_at = time.perf_counter()
+    model.fit(X_flat_train, y_flat_train)
+    fit_seconds = time.perf_counter() - fit_started_at
+
+    prediction_metrics = evaluate_model(
+        model,
+        _WORKER["val_df"],
+        _WORKER["feature_scaler"],
+        historical_window_size,
+        prediction_window_size,
+        horizon // prediction_window_size,
+        freq=settings["freq"],
+    )
+    willmott = get_day_n_metrics(prediction_metrics, horizon)["Willmott"]
+    scores = [value for value in willmott.values() if value is not None and not math.isnan(value)]
+
+    return {
+        "willmott": willmott,
+        # Single number for ranking - mean over pollutants
+        "score": float(np.mean(scores)) if scores else None,
+        "fit_seconds": round(fit_seconds, 3),
+    }
+
+
+def _rank(results):
+    return sorted(results, key=lambda result: -math.inf if result["score"] is None else result["score"], reverse=True)
+
+
+def run_search(search_dir, candidates, estimators, eta, workers, threads):
+    """
+    Successive halving - all candidates get a small number of trees, only the best 1/eta continue to the next rung.
+    Every finished evaluation is appended to results file, so interrupted search continues where it stopped.
+    """
+    results = _load_results(search_dir)
+    survivors = candidates
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(search_dir, threads)
+    ) as executor, open(os.path.join(search_dir, RESULTS_FILE), "a") as results_file:
+        for rung, n_estimators in enumerate(estimators):
+            pending = [params for params in survivors if (rung, _candidate_key(params)) not in results]
+            LOGGER.info(
+                f"Rung {rung}: {len(survivors)} candidates with {n_estimators} trees, "
+                f"{len(survivors) - len(pending)} already evaluated"
+            )
+
+            futures = {executor.submit(_evaluate_candidate, params, n_estimators): params for params in pending}
+            for future in as_completed(futures):
+                params = futures[future]
+                result = {
+                    "rung": rung,
+                    "key": _candidate_key(params),
+                    "n_estimators": n_estimators,
+                    "params": params,
+                    **future.result(),
+                }
+                results[(rung, result["key"])] = result
+                results_file.write(json.dumps(result) + "\n")
+                results_file.flush()
+                LOGGER.debug(f"Score {result['score']} for {result['key']}")
+
+            ranked = _rank([results[(rung, _candidate_key(params))] for params in survivors])
+            if rung < len(estimators) - 1:
+                ranked = ranked[: max(1, math.ceil(len(ranked) / eta))]
+            survivors = [result["params"] for result in ranked]
+
+    return ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search model hyperparameters and window sizes")
+    parser.add_argument("--resolution", choices=SEARCH_SPACES.keys(), default="daily")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="Location id from src/data/locations.json")
+    parser.add_argument("--data", help="Columnar store with merged features (default: the one written by train_model.py)")
+    parser.add_argument("--name", default="default", help="Search name - results are kept in data/cache/<location>/search/<resolution>_<name>")
+    parser.add_argument("--trials", type=int, default=40, help="Number of sampled candidates")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-estimators", type=int, default=300, help="Trees for candidates that reach the last rung")
+    parser.add_argument("--eta", type=int, default=3, help="Only best 1/eta candidates continue to the next rung")
+    parser.add_argument("--rungs", type=int, default=3, help="Number of halving rounds")
+    parser.add_argument("--backend", choices=xgboost.BACKENDS, default="per_target")
+    parser.add_argument("--workers", type=int, help="Parallel evaluations (all cores by default)")
+    parser.add_argument("--n-jobs", type=int, help="Total thread budget shared by workers (all cores by default)")
+    parser.add_argument("--restart", action="store_true", help="Discard previous results of this search")
+    args = parser.parse_args()
+
+    if args.rungs < 1 or args.eta < 2:
+        parser.error("Search needs at least one rung and eta of at least 2")
+
+    resolution = SEARCH_SPACES[args.resolution]
+    data_path = args.data or get_location(args.location).merged_features_dir(PROJECT_ROOT, args.resolution)
+    if not os.path.exists(os.path.join(data_path, "schema.json")):
+        parser.error(f"No merged features in {data_path} - run scripts/train_model.py first")
+
+    search_dir = os.path.join(get_location(args.location).cache_dir(PROJECT_ROOT), "search", f"{args.resolution}_{args.name}")
+    n_jobs = args.n_jobs or os.cpu_count() or 1
+    workers = min(args.workers or n_jobs, n_jobs)
+
+    # Everything that changes results - resuming with different values would mix incomparable scores
+    settings = {
+        "data": os.path.abspath(data_path),
+        "data_schema": ColumnarStore(data_path).read_schema(),
+        "freq": resolution["freq"],
+        "horizon": resolution["horizon"],
+        "space": resolution["space"],
+        "trials": args.trials,
+        "seed": args.seed,
+        "max_estimators": args.max_estimators,
+        "eta": args.eta,
+        "rungs": args.rungs,
+        "backend": args.backend,
+    }
+    _prepare_search_dir(search_dir, data_path, settings, args.restart)
+
+    candidates = _sample_candidates(resolution["space"], resolution["horizon"], args.trials, args.seed)
+    estimators = _rung_estimators(args.max_estimators, args.eta, args.rungs)
+    ranked = run_search(search_dir, candidates, estimators, args.eta, workers, max(1, n_jobs // workers))
+
+    for result in ranked[:5]:
+        LOGGER.info(f"Score {result['score']:.4f}: {result['key']}")
+
+    best = {
+        **ranked[0]["params"],
+        "num_of_predictions": resolution["horizon"] // ranked[0]["params"]["prediction_window_size"],
+        "n_estimators": ranked[0]["n_estimators"],
+    }
+    with open(os.path.join(search_dir, BEST_FILE), "w") as f:
+        json.dump(best, f, indent=2)
+    LOGGER.info(f"Best parameters saved to {os.path.join(search_dir, BEST_FILE)} - train with: scripts/train_model.py --params <file>")
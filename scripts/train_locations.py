@@ -0,0 +1,83 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+sys.path.append(PROJECT_ROOT)
+
+from src.common import LOGGER_NAME
+from src.data.locations import get_location, get_locations
+from src.model import xgboost
+from src.model.training import RESOLUTIONS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+)
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+TRAIN_MODEL_SCRIPT = os.path.join(PROJECT_ROOT, "scripts", "train_model.py")
+
+
+def train_location(location, threads, train_args):
+    """Run train_model.py for one location in its own process, output goes to the location's log file."""
+    log_path = os.path.join(location.cache_dir(PROJECT_ROOT), "train_model.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    # Native libraries (BLAS, OpenMP) would otherwise start a thread per core in every process
+    env = {**os.environ, "OMP_NUM_THREADS": str(threads), "OPENBLAS_NUM_THREADS": str(threads)}
+    command = [sys.executable, TRAIN_MODEL_SCRIPT, "--location", location.id, "--n-jobs", str(threads), *train_args]
+
+    started_at = time.perf_counter()
+    with open(log_path, "w") as log_file:
+        return_code = subprocess.run(command, stdout=log_file, stderr=subprocess.STDOUT, env=env).returncode
+    return return_code, time.perf_counter() - started_at, log_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train models of many locations in parallel")
+    parser.add_argument("--location", nargs="+", help="Location ids from src/data/locations.json (all locations by default)")
+    parser.add_argument("--cpu-budget", type=int, help="Cores used by all trainings together (all cores by default)")
+    parser.add_argument("--threads-per-location", type=int, default=2, help="Cores of a single training")
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="daily")
+    parser.add_argument("--backend", choices=xgboost.BACKENDS, default="per_target")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--full-resync", action="store_true")
+    args = parser.parse_args()
+
+    locations = [get_location(location_id) for location_id in args.location] if args.location else list(get_locations().values())
+    cpu_budget = args.cpu_budget or os.cpu_count() or 1
+    threads = max(1, min(args.threads_per_location, cpu_budget))
+    # Parallel trainings times their threads never exceeds the budget
+    parallel_trainings = max(1, cpu_budget // threads)
+
+    train_args = ["--resolution", args.resolution, "--backend", args.backend]
+    if args.incremental:
+        train_args.append("--incremental")
+    if args.full_resync:
+        train_args.append("--full-resync")
+
+    LOGGER.info(
+        f"Training {len(locations)} locations, {parallel_trainings} at a time with {threads} threads each..."
+    )
+    failed_locations = []
+    with ThreadPoolExecutor(max_workers=parallel_trainings) as executor:
+        futures = {
+            location.id: executor.submit(train_location, location, threads, train_args) for location in locations
+        }
+        for location_id, future in futures.items():
+            return_code, seconds, log_path = future.result()
+            if return_code == 0:
+                LOGGER.info(f"{location_id}: trained in {seconds:.0f}s")
+            else:
+                LOGGER.error(f"{location_id}: failed with exit code {return_code} after {seconds:.0f}s, see {log_path}")
+                failed_locations.append(location_id)
+
+    if failed_locations:
+        LOGGER.error(f"Failed locations: {failed_locations}")
+        sys.exit(1)
@@ -1,21 +1,25 @@
-import pandas as pd
-
+import argparse
+import json
 import logging
+import os
 import sys
+from functools import partial
 from pathlib import Path
 
 PROJECT_ROOT = str(Path(__file__).parent.parent)
 sys.path.append(PROJECT_ROOT)
 
 from src.data import aqi, meteo
-from src.data.calendar import add_calendar_features
-from src.data.features import FeatureScaler, split_to_windows, flatten_windows
-from src.model.training import split_data
-from src.model.evaluation import evaluate_iaqi_predictions, create_metrics_dataframe, get_day_n_metrics
-from src.model.inference import recursive_forecasting
+from src.data.locations import DEFAULT_LOCATION, get_location
+from src.data.features import dataset_windows
+from src.data.store import ColumnarStore
+from src.model.training import RESOLUTIONS, merge_features, prepare_datasets, evaluate_model
+from src.model.evaluation import create_metrics_dataframe, get_day_n_metrics
 from src.hopsworks.client import HopsworksClient
-from src.model import xgboost
-from src.common import LOGGER_NAME
+from src.model import incremental, xgboost
+from src.common import LOGGER_NAME, HOURLY, FEATURE_DTYPE, FEATURE_DTYPES
+from src import instrumentation
+from src.instrumentation import span
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
@@ -23,96 +27,95 @@ logging.basicConfig(
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
-if __name__ == "__main__":
-    # How many (lagged) days to use as input during training
-    historical_window_size = 3
-    # How many days to teach the model to predict
-    prediction_window_size = 3
+def train(args, location, resolution, model_params):
+    freq = resolution["freq"]
+    # How many (lagged) days/hours to use as input during training
+    historical_window_size = args.historical_window_size or resolution["historical_window_size"]
+    # How many days/hours to teach the model to predict
+    prediction_window_size = args.prediction_window_size or resolution["prediction_window_size"]
     # How many predictions to do as part of recursive forecasting
-    num_of_predictions = 1
-
-    # TODO: comment out for production
-    LOGGER.setLevel(logging.DEBUG)
+    num_of_predictions = args.num_of_predictions or resolution["num_of_predictions"]
 
+    LOGGER.info(f"Training model for {location.name}...")
     LOGGER.info("Loading AQI data...")
-    aqi_df = aqi.load_data(PROJECT_ROOT)
+    with span("load_aqi") as stage:
+        aqi_df = aqi.load_data(PROJECT_ROOT, full_resync=args.full_resync, freq=freq, location=location)
+        stage.set(aqi=aqi_df)
     LOGGER.debug(aqi_df.head())
 
-    LOGGER.info("Cleaning missing dates...")
-    aqi_df = aqi.clean_missing_dates(aqi_df)
-
-    LOGGER.info("Cleaning missing values...")
-    aqi_df = aqi.clean_missing_values(aqi_df)
-
-    LOGGER.info("Adding calendar features...")
-    aqi_df = add_calendar_features(aqi_df)
-    LOGGER.debug(aqi_df.head())
-
-    # TODO: Fetch daily for now (because of historical AQI data)
-    # but once we have hourly AQI data, download hourly meteo as well
-    LOGGER.info("Fetching meteo features...")
-    weather_df = meteo.fetch_daily_data(aqi_df)
-    weather_df = meteo.clean_missing_values(weather_df)
-    LOGGER.debug(weather_df.head())
-
-    LOGGER.info("Merging AQI and METEO data...")
-    merged_df = pd.merge_asof(aqi_df, weather_df, left_index=True, right_index=True)
-    # Keep same format - ML models work best with Float values
-    merged_df = merged_df.astype(float)
-    LOGGER.debug(merged_df.head())
-
-    target_columns = merged_df.columns
-
-    train_df, val_df, test_df = split_data(merged_df)
-
-    LOGGER.info("Scaling features...")
-    feature_scaler = FeatureScaler()
-    feature_scaler.fit(train_df)
-
-    train_df = feature_scaler.transform(train_df)
-    val_df = feature_scaler.transform(val_df)
-    test_df = feature_scaler.transform(test_df)
-    LOGGER.debug(train_df.head())
-
-    LOGGER.info("Creating lagged feature windows...")
-    (
-        X_window_train,
-        X_window_val,
-        X_window_test,
-        y_window_train,
-        y_window_val,
-        y_window_test,
-    ) = split_to_windows(
-        train_df, val_df, test_df, historical_window_size, prediction_window_size, target_columns=target_columns
-    )
-    LOGGER.debug(f"Last X window:\n{X_window_test[-1]}")
-    LOGGER.debug(f"Last y window:\n{y_window_test[-1]}")
-
-    LOGGER.info("Creating flat window features for model...")
-    X_flat_train, X_flat_val, X_flat_test, y_flat_train, y_flat_val, y_flat_test = (
-        flatten_windows(
-            X_window_train,
-            X_window_val,
-            X_window_test,
-            y_window_train,
-            y_window_val,
-            y_window_test,
-        )
+    weather_cache_dir = os.path.join(PROJECT_ROOT, "data", "cache", "weather")
+    fetch_weather = partial(
+        meteo.fetch_hourly_range if freq == HOURLY else meteo.fetch_daily_range,
+        cache_dir=weather_cache_dir,
+        station=location.weather_station,
     )
-    LOGGER.debug(f"Last X sample:\n{X_flat_test[-1]}")
-    LOGGER.debug(f"Last y sample:\n{y_flat_test[-1]}")
-
-    LOGGER.info(f"Fitting model...")
-    model = xgboost.create_regressor()
-    model.fit(X_flat_train, y_flat_train)
+    merged_df = merge_features(aqi_df, fetch_weather, freq, args.dtype)
 
-    LOGGER.info(f"Evaluating model...")
-    actual, predictions = recursive_forecasting(model, test_df, historical_window_size, prediction_window_size, num_of_predictions)
+    # Kept locally so that experiments can reload features without feature store and meteostat
+    LOGGER.info("Saving merged features to columnar store...")
+    with span("save_features"):
+        ColumnarStore(location.merged_features_dir(PROJECT_ROOT, args.resolution)).write(merged_df, dtype=args.dtype)
 
-    predictions = [feature_scaler.inverse_transform(prediction) for prediction in predictions]
-    actual = [feature_scaler.inverse_transform(value) for value in actual]
+    target_columns = merged_df.columns
+    model_config = {
+        "location": location.id,
+        "historical_window_size": historical_window_size,
+        "prediction_window_size": prediction_window_size,
+        "num_of_predictions": num_of_predictions,
+        "freq": freq,
+        "backend": args.backend,
+        "model_params": model_params,
+        "columns": list(target_columns),
+        # Serving builds features with the same dtype
+        "dtype": args.dtype,
+    }
+
+    model = None
+    if args.incremental:
+        LOGGER.info("Loading previous model...")
+        previous_version = HopsworksClient().get_latest_model_version(location.model_name)
+        try:
+            if previous_version is None:
+                raise incremental.FullRetrainRequired("no previous model")
+            with span("load_previous_model"):
+                previous_model, model, feature_scaler, previous_config = HopsworksClient().load_model_artifacts(previous_version, location.model_name)
+            with span("incremental_update"):
+                update = incremental.update_model(model, feature_scaler, previous_config, previous_model.training_metrics, merged_df, model_config)
+        except incremental.FullRetrainRequired as e:
+            LOGGER.info(f"Falling back to full training - {e}")
+            model = None
+        else:
+            if update is None:
+                LOGGER.info(f"No new data since version {previous_version} was trained - nothing to do")
+                return
+            model, test_df, prediction_metrics, model_config = update
+            LOGGER.info(f"Updated model version {previous_version} ({model_config['incremental_updates']} incremental updates)")
+
+    if model is None:
+        LOGGER.info("Scaling features and creating flat lagged feature windows...")
+        with span("prepare") as stage:
+            feature_scaler, (train_df, val_df, test_df), flat = prepare_datasets(
+                merged_df, historical_window_size, prediction_window_size
+            )
+            X_flat_train, X_flat_val, X_flat_test, y_flat_train, y_flat_val, y_flat_test = flat
+            stage.set(X_train=X_flat_train, y_train=y_flat_train)
+        LOGGER.debug(train_df.head())
+        LOGGER.debug(f"Last X sample:\n{X_flat_test[-1]}")
+        LOGGER.debug(f"Last y sample:\n{y_flat_test[-1]}")
+
+        LOGGER.info(f"Fitting model...")
+        with span("fit", outputs=y_flat_train.shape[1]):
+            model = xgboost.create_regressor(args.backend, n_jobs=args.n_jobs, **model_params)
+            model.fit(X_flat_train, y_flat_train)
+
+        LOGGER.info(f"Evaluating model...")
+        with span("evaluate", test=test_df):
+            prediction_metrics = evaluate_model(model, test_df, feature_scaler, historical_window_size, prediction_window_size, num_of_predictions, freq=freq)
+
+        # Incremental training continues from here
+        model_config["trained_until"] = str(train_df.index[-1])
+        model_config["incremental_updates"] = 0
 
-    prediction_metrics = evaluate_iaqi_predictions(y_true=actual, y_pred=predictions, prediction_window_size=prediction_window_size, num_of_predictions=num_of_predictions)
     prediction_metrics_df = create_metrics_dataframe(prediction_metrics)
     LOGGER.debug(prediction_metrics_df.to_string(float_format="%.2f"))
 
@@ -121,5 +124,68 @@ if __name__ == "__main__":
     last_day_metrics = get_day_n_metrics(prediction_metrics, prediction_window_size * num_of_predictions)
     # Using single metric for model comparison - The Willmott index - it gives credit for correlation but heavily penalizes systematic errors that would make the forecasts unreliable for air quality management.
     metrics = last_day_metrics["Willmott"]
-    hopsworks_model = HopsworksClient().save_model(PROJECT_ROOT, model, metrics, X_flat_test[0], y_flat_test[0], feature_scaler)
-    LOGGER.debug(f"Hopsworks Model:\n{hopsworks_model.description}")
\ No newline at end of file
+    # Examples of model input and output for model schema
+    X_flat_test, y_flat_test = dataset_windows(test_df, historical_window_size, prediction_window_size, target_columns)
+    with span("save_model"):
+        hopsworks_model = HopsworksClient().save_model(PROJECT_ROOT, model, metrics, X_flat_test[0], y_flat_test[0], feature_scaler, model_config, location.model_name, X_check=X_flat_test)
+    LOGGER.debug(f"Hopsworks Model:\n{hopsworks_model.description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train AQI prediction model")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="Location id from src/data/locations.json")
+    parser.add_argument("--n-jobs", type=int, help="Thread budget for training (all cores by default)")
+    parser.add_argument(
+        "--full-resync",
+        action="store_true",
+        help="Ignore local copy of feature store data and read everything again",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Continue training of the latest registered model with new data (falls back to full training when needed)",
+    )
+    parser.add_argument(
+        "--resolution",
+        choices=RESOLUTIONS.keys(),
+        default="daily",
+        help="Train on daily or hourly data",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=xgboost.BACKENDS,
+        default="per_target",
+        help="How the regressor learns multiple outputs (see src/model/xgboost.py)",
+    )
+    parser.add_argument(
+        "--params",
+        help="JSON file with window sizes and XGBoost hyperparameters (e.g. best.json of search_hyperparameters.py)",
+    )
+    parser.add_argument("--historical-window-size", type=int, help="Input size in days/hours")
+    parser.add_argument("--prediction-window-size", type=int, help="Output size in days/hours")
+    parser.add_argument("--num-of-predictions", type=int, help="Recursive forecasting steps")
+    parser.add_argument(
+        "--dtype",
+        choices=FEATURE_DTYPES,
+        default=FEATURE_DTYPE,
+        help="Dtype of features from merging on - float64 doubles memory (see scripts/compare_dtypes.py)",
+    )
+    parser.add_argument("--spans", help=f"Append timing and memory of every stage as JSON lines to this file (or ${instrumentation.SPANS_PATH_ENV})")
+    parser.add_argument("--prometheus-textfile", help=f"Write stage metrics for Prometheus textfile collector (or ${instrumentation.PROMETHEUS_TEXTFILE_ENV})")
+    args = parser.parse_args()
+    instrumentation.configure(args.spans, args.prometheus_textfile)
+
+    location = get_location(args.location)
+    resolution = RESOLUTIONS[args.resolution]
+    model_params = {}
+    if args.params:
+        with open(args.params) as f:
+            model_params = json.load(f)
+        resolution = {**resolution, **{key: model_params.pop(key) for key in resolution if key in model_params}}
+
+    # TODO: comment out for production
+    LOGGER.setLevel(logging.DEBUG)
+
+    # Every stage is a span of this one - see src/instrumentation.py
+    with span("train_model", location=location.id, resolution=args.resolution, backend=args.backend):
+        train(args, location, resolution, model_params)
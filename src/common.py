@@ -1,2 +1,13 @@
+import os
+
 LOGGER_NAME = "air_quality_prediction"
 IAQI_FEATURES = ["pm25", "pm10", "no2", "so2", "co"]
+
+# Supported data resolutions (pandas frequencies) - window sizes are in these units
+DAILY = "D"
+HOURLY = "h"
+
+# Dtype of feature values from merged features on (scaled frames, windows, model inputs) - float32 halves
+# their memory and XGBoost works in float32 anyway, float64 is opt-in (--dtype or AQI_FEATURE_DTYPE)
+FEATURE_DTYPES = ("float32", "float64")
+FEATURE_DTYPE = os.environ.get("AQI_FEATURE_DTYPE", "float32")
@@ -1,52 +1,163 @@
 import pandas as pd
+import numpy as np
 import os
 import logging
-import datetime
 
-from src.common import LOGGER_NAME
-from src.hopsworks.client import HopsworksClient
+from src.common import LOGGER_NAME, IAQI_FEATURES, DAILY
+from src.data.locations import get_location
+from src.data.store import ColumnarStore
+from src.hopsworks.sync import FeatureGroupSync, local_copy_path, read_since
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
-def load_data(project_root):
+GAP_FILL_STRATEGIES = ("ffill", "interpolate", "seasonal")
+
+def current_data_cache_dir(project_root):
+    # Local copies of feature groups (see hopsworks.sync)
+    return os.path.join(project_root, "data", "cache")
+
+def load_data(project_root, full_resync=False, freq=DAILY, location=None):
+    location = location or get_location()
+    current_aqi_df = _load_current_data(
+        cache_dir=current_data_cache_dir(project_root),
+        full_resync=full_resync,
+        freq=freq,
+        feature_group=location.feature_group,
+    )
+    # Historical data are daily - hourly mode uses feature store data only (as do locations without history)
+    if freq != DAILY or location.history_file is None:
+        return current_aqi_df
+
     # TODO: stop using historical data once we have enough of hourly data
     # historical data is rounded but without rounding we might get better predictions (especially for CO)
-    hist_aqi_df = _load_historical_data(project_root)
-    current_aqi_df = _load_current_data()
+    hist_aqi_df = _load_historical_data(project_root, location=location)
     aqi_df = pd.concat([hist_aqi_df, current_aqi_df], axis=0)
     return aqi_df
 
-def _load_historical_data(project_root):
-    aqi_history_path = os.path.join(project_root, "data", "air_quality_history.csv")
+def _load_historical_data(project_root, start=None, end=None, location=None):
+    location = location or get_location()
+    aqi_history_path = os.path.join(project_root, "data", location.history_file)
+    history_store = ColumnarStore(os.path.join(location.cache_dir(project_root), "history"))
+
+    # CSV is parsed only once (and again when it changes) - afterwards the typed store is memory-mapped
+    csv_stat = os.stat(aqi_history_path)
+    source = {"size": csv_stat.st_size, "mtime": csv_stat.st_mtime}
+    if not history_store.exists() or history_store.read_schema()["source"] != source:
+        LOGGER.info("Converting historical AQI data to columnar store...")
+        history_store.write(_parse_historical_csv(aqi_history_path), source=source)
+
+    return history_store.read(start, end)
+
+def _parse_historical_csv(aqi_history_path):
     aqi_df = pd.read_csv(aqi_history_path, skipinitialspace=True)
+    if list(aqi_df.columns) != ["date"] + IAQI_FEATURES:
+        raise ValueError(f"Unexpected columns in '{aqi_history_path}': {list(aqi_df.columns)}")
+
     aqi_df["date"] = pd.to_datetime(aqi_df["date"])
     aqi_df = aqi_df.set_index("date")
     aqi_df = aqi_df.sort_index()
-    return aqi_df
+    return aqi_df.astype(float)
+
+def _load_current_data(cache_dir=None, full_resync=False, freq=DAILY, feature_group="iaqi"):
+    # Imported here so that modules using only cleaning functions (e.g. serving) don't pay for hopsworks
+    from src.hopsworks.client import HopsworksClient
 
-def _load_current_data():
     hopsworks_client = HopsworksClient()
-    iaqi_fg_df = hopsworks_client.load_hourly_data()
+    return hopsworks_client.load_hourly_data(cache_dir, full_resync, freq, feature_group)
+
+def read_feature_group(iaqi_fg, cache_dir=None, full_resync=False, freq=DAILY):
+    """IAQI readings of the feature group as periods of `freq` - synced to a local copy in cache_dir (if given)."""
+    features = ["event_timestamp"] + IAQI_FEATURES
+    if cache_dir is None:
+        iaqi_fg_df = read_since(iaqi_fg, features)
+    else:
+        # Only rows newer than the local copy are read from the feature store
+        iaqi_sync = FeatureGroupSync(iaqi_fg, features, local_copy_path(cache_dir, iaqi_fg.name))
+        iaqi_fg_df = iaqi_sync.sync(full_resync=full_resync)
+    return aggregate_readings(iaqi_fg_df, freq)
+
+def aggregate_readings(iaqi_fg_df: pd.DataFrame, freq=DAILY):
+    """Hourly readings -> mean of every period (daily, since historical data are daily), for hourly mode it merges duplicate readings."""
+    # Remove TimeZone info and reset to start of day (or hour) so that it can be compared to historical data
+    periods = pd.to_datetime(iaqi_fg_df["event_timestamp"]).dt.tz_localize(None).dt.floor(freq)
+    return iaqi_fg_df[IAQI_FEATURES].groupby(periods.rename("event_timestamp")).mean().sort_index()
 
-    # Hourly -> Daily (since we are still using historical data that are daily)
-    iaqi_fg_df = iaqi_fg_df.groupby(iaqi_fg_df["event_timestamp"], as_index=True).mean()
-    iaqi_fg_df = iaqi_fg_df.sort_index()
+def clean_missing_dates(aqi_df: pd.DataFrame, freq=DAILY, strategy="ffill", limit=None):
+    """Insert missing timestamps (daily or hourly `freq`) and fill them in one vectorized pass.
 
-    return iaqi_fg_df
+    Strategies:
+    - "ffill" - copy whole previous row (default, values missing in that row stay missing)
+    - "interpolate" - time interpolation between neighbouring rows
+    - "seasonal" - mean of the same day of year (and hour) in other years
+    `limit` is the longest gap (in periods) that is filled - rows of longer gaps stay missing.
+    """
+    if strategy not in GAP_FILL_STRATEGIES:
+        raise ValueError(f"Unknown gap fill strategy '{strategy}', use one of {GAP_FILL_STRATEGIES}")
 
-def clean_missing_dates(aqi_df: pd.DataFrame):
-    full_range = pd.date_range(start=aqi_df.index.min(), end=aqi_df.index.max(), freq="D")
+    full_range = pd.date_range(start=aqi_df.index.min(), end=aqi_df.index.max(), freq=freq)
     missing_dates = full_range.difference(aqi_df.index)
-    LOGGER.debug(f"Missing dates: {missing_dates}")
+    LOGGER.debug(f"Missing dates: {gap_statistics(aqi_df.index, full_range)}")
 
-    for missing_date in missing_dates:
-        aqi_df.loc[missing_date] = aqi_df.loc[missing_date - datetime.timedelta(days=1)]
-    aqi_df = aqi_df.sort_index()
+    if missing_dates.empty:
+        return aqi_df.sort_index()
+
+    if strategy == "ffill":
+        aqi_df = _forward_fill_dates(aqi_df, full_range, missing_dates, limit)
+    else:
+        aqi_df = _reindex_and_fill(aqi_df, full_range, missing_dates, strategy, limit)
 
     LOGGER.debug(f"Missing dates after cleanup: {full_range.difference(aqi_df.index)}")
 
     return aqi_df
 
+def gap_statistics(index: pd.DatetimeIndex, full_range: pd.DatetimeIndex):
+    is_missing = ~full_range.isin(index)
+    # Gap boundaries are where missing flag changes
+    boundaries = np.flatnonzero(np.diff(np.concatenate([[0], is_missing.astype(np.int8), [0]])))
+    gap_lengths = boundaries[1::2] - boundaries[::2]
+    return {
+        "expected": len(full_range),
+        "missing": int(is_missing.sum()),
+        "gaps": len(gap_lengths),
+        "longest_gap": int(gap_lengths.max()) if len(gap_lengths) else 0,
+    }
+
+def _forward_fill_dates(aqi_df, full_range, missing_dates, limit):
+    # Each missing date gets the last present row before it (whole chain of missing dates gets the same row)
+    present_df = aqi_df[~aqi_df.index.duplicated(keep="last")].sort_index()
+    source_positions = present_df.index.searchsorted(missing_dates, side="right") - 1
+    missing_df = present_df.iloc[source_positions]
+
+    if limit is not None:
+        gap_offsets = full_range.get_indexer(missing_dates) - full_range.get_indexer(missing_df.index)
+        missing_df = missing_df.astype(float)
+        missing_df[gap_offsets > limit] = np.nan
+
+    missing_df.index = missing_dates.rename(aqi_df.index.name)
+    return pd.concat([aqi_df, missing_df], axis=0).sort_index()
+
+def _reindex_and_fill(aqi_df, full_range, missing_dates, strategy, limit):
+    aqi_df = aqi_df.sort_index().reindex(full_range.rename(aqi_df.index.name)).astype(float)
+    is_missing = full_range.isin(missing_dates)
+
+    if strategy == "interpolate":
+        filled_df = aqi_df.interpolate(method="time", limit=limit, limit_area="inside")
+    else:
+        # Same day of year (and same hour for hourly data) from other years
+        season_keys = [aqi_df.index.dayofyear]
+        if full_range[1] - full_range[0] < pd.Timedelta(days=1):
+            season_keys.append(aqi_df.index.hour)
+        filled_df = aqi_df.groupby(season_keys).transform("mean")
+
+        if limit is not None:
+            # Length of the gap each row belongs to
+            gap_ids = np.cumsum(~is_missing)
+            gap_lengths = np.bincount(gap_ids, weights=is_missing)[gap_ids]
+            filled_df[gap_lengths > limit] = np.nan
+
+    aqi_df[is_missing] = filled_df[is_missing]
+    return aqi_df
+
 def clean_missing_values(aqi_df: pd.DataFrame):
     LOGGER.debug(f"Missing values:\n{aqi_df.isna().sum()}")
     # For IAQI values it is OK to use average
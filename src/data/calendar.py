@@ -1,19 +1,96 @@
+import numpy as np
 import pandas as pd
 import holidays
 
-def add_calendar_features(aqi_df: pd.DataFrame):
-    svk_holidays = holidays.Slovakia()
+from src.common import DAILY, HOURLY
 
-    datetime_pd = aqi_df.index
+CALENDAR_FEATURES = [
+    "year",
+    "month",
+    "day_of_month",
+    "day_of_week",
+    "day_of_year",
+    "week_of_year",
+    "is_leap_year",
+    "is_working_day",
+    "is_feb29",
+]
 
-    aqi_df["year"] = datetime_pd.year
-    aqi_df["month"] = datetime_pd.month
-    aqi_df["day_of_month"] = datetime_pd.day
-    aqi_df["day_of_week"] = datetime_pd.dayofweek
-    aqi_df["day_of_year"] = datetime_pd.dayofyear
-    aqi_df["week_of_year"] = datetime_pd.isocalendar().week
-    aqi_df["is_leap_year"] = datetime_pd.is_leap_year.astype(int)
-    aqi_df["is_working_day"] = [int(svk_holidays.is_working_day(x)) for x in datetime_pd]
-    aqi_df["is_feb29"] = ((aqi_df["month"] == 2) & (aqi_df["day_of_month"] == 29)).astype(int)
+# Years covered after the last requested date - forecast horizons can look up future days
+FUTURE_YEARS = 1
 
-    return aqi_df
\ No newline at end of file
+_calendar_table = None
+
+
+def calendar_columns(freq=DAILY):
+    # Hourly data get hour of day on top of the features of the day
+    return CALENDAR_FEATURES + ["hour"] if freq == HOURLY else CALENDAR_FEATURES
+
+
+def add_calendar_features(aqi_df: pd.DataFrame, freq=DAILY):
+    features_df = calendar_features(aqi_df.index, freq)
+
+    for feature in calendar_columns(freq):
+        aqi_df[feature] = features_df[feature].array
+
+    return aqi_df
+
+
+def calendar_features(dates, freq=DAILY) -> pd.DataFrame:
+    """Calendar features for any dates, past or future, looked up from the cached table."""
+    dates = pd.DatetimeIndex(dates)
+    days = dates.normalize().astype("datetime64[ns]")
+    table = calendar_table(days.min().year, days.max().year)
+    features_df = table.reindex(days)
+    features_df.index = dates
+    if freq == HOURLY:
+        features_df["hour"] = dates.hour
+    return features_df
+
+
+def calendar_table(start_year, end_year) -> pd.DataFrame:
+    """Daily calendar features covering at least start_year..end_year (+ FUTURE_YEARS).
+
+    Table is built once and rebuilt only when requested years are outside of it.
+    """
+    global _calendar_table
+
+    if (
+        _calendar_table is None
+        or _calendar_table.index[0].year > start_year
+        or _calendar_table.index[-1].year < end_year
+    ):
+        if _calendar_table is not None:
+            start_year = min(start_year, _calendar_table.index[0].year)
+            end_year = max(end_year, _calendar_table.index[-1].year)
+        _calendar_table = _build_calendar_table(start_year, end_year + FUTURE_YEARS)
+
+    return _calendar_table
+
+
+def _build_calendar_table(start_year, end_year):
+    svk_holidays = holidays.Slovakia(years=range(start_year, end_year + 1))
+
+    datetime_pd = pd.date_range(
+        f"{start_year}-01-01", f"{end_year}-12-31", freq="D"
+    ).astype("datetime64[ns]")
+
+    table = pd.DataFrame(index=datetime_pd)
+    table["year"] = datetime_pd.year
+    table["month"] = datetime_pd.month
+    table["day_of_month"] = datetime_pd.day
+    table["day_of_week"] = datetime_pd.dayofweek
+    table["day_of_year"] = datetime_pd.dayofyear
+    table["week_of_year"] = datetime_pd.isocalendar().week
+    table["is_leap_year"] = datetime_pd.is_leap_year.astype(int)
+
+    # Same rules as holidays' is_working_day, as one vectorized lookup over all holiday dates
+    holiday_dates = pd.DatetimeIndex(list(svk_holidays.keys()))
+    weekend_workdays = pd.DatetimeIndex(list(getattr(svk_holidays, "weekend_workdays", [])))
+    is_weekend = np.isin(datetime_pd.dayofweek, list(svk_holidays.weekend))
+    table["is_working_day"] = np.where(
+        is_weekend, datetime_pd.isin(weekend_workdays), ~datetime_pd.isin(holiday_dates)
+    ).astype(int)
+    table["is_feb29"] = ((table["month"] == 2) & (table["day_of_month"] == 29)).astype(int)
+
+    return table
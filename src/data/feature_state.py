@@ -0,0 +1,140 @@
+import pandas as pd
+import logging
+
+from src.common import LOGGER_NAME, IAQI_FEATURES, DAILY
+from src.data import aqi, meteo
+from src.data.calendar import add_calendar_features
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# State older than the kept rows - gaps at the start of history are filled from it and medians are taken over it
+FILL_MARGIN = pd.Timedelta(days=30)
+
+
+class FeatureState:
+    """Warm, preprocessed and scaled rolling window of the latest features.
+
+    History is kept as daily sums and counts of the hourly IAQI readings plus raw daily
+    weather, so `refresh` only has to read hourly rows newer than `aqi_watermark` and
+    weather days from `weather_watermark` on. State is trimmed to `history_size` periods
+    plus FILL_MARGIN, so cleaning and scaling run on a small tail and only when something
+    new arrived - not over everything read since start-up.
+    """
+
+    def __init__(self, feature_scaler, window_size, read_hourly_data, fetch_weather, freq=DAILY, history_size=None, dtype="float64"):
+        # read_hourly_data(since) returns hourly rows with event_timestamp >= since (all rows for None)
+        # fetch_weather(start_date, end_date) returns raw daily weather for the given days
+        self.feature_scaler = feature_scaler
+        self.window_size = window_size
+        # Scaled rows kept - more than the window lets forecasts start from past dates too
+        self.history_size = max(history_size or window_size, window_size)
+        self._read_hourly_data = read_hourly_data
+        self._fetch_weather = fetch_weather
+        self.freq = freq
+        # Same dtype as training data of the model
+        self.dtype = dtype
+
+        self.aqi_watermark = None
+        self.weather_watermark = None
+        self.history = None
+        self.window = None
+
+        self._daily_sums = pd.DataFrame(columns=IAQI_FEATURES, dtype=float)
+        self._daily_counts = pd.DataFrame(columns=IAQI_FEATURES, dtype=float)
+        self._weather_df = None
+
+    def refresh(self):
+        """Pull data that arrived since the last refresh. Returns True if the window changed."""
+        has_new_aqi = self._refresh_aqi()
+        if has_new_aqi:
+            # Before weather is fetched - it is needed only for the kept periods
+            self._trim()
+        has_new_weather = self._refresh_weather()
+
+        if has_new_aqi or has_new_weather or self.window is None:
+            self.history = self._build_history()
+            self.window = self.history[-self.window_size :]
+            return True
+        return False
+
+    def _refresh_aqi(self):
+        iaqi_fg_df = self._read_hourly_data(self.aqi_watermark)
+        if self.aqi_watermark is not None:
+            # Readers may return rows at the watermark again - those are already counted
+            iaqi_fg_df = iaqi_fg_df[iaqi_fg_df["event_timestamp"] > self.aqi_watermark]
+        if iaqi_fg_df.empty:
+            return False
+
+        self.aqi_watermark = iaqi_fg_df["event_timestamp"].max()
+        LOGGER.debug(f"Read {len(iaqi_fg_df)} new hourly rows, watermark {self.aqi_watermark}")
+
+        # Remove TimeZone info and reset to start of day (or hour) so that it can be compared to historical data
+        periods = (
+            pd.to_datetime(iaqi_fg_df["event_timestamp"])
+            .dt.tz_localize(None)
+            .dt.floor(self.freq)
+            .astype("datetime64[ns]")
+        )
+        # Hourly -> Daily as running sums and counts, so that a partially read day can be completed later
+        new_rows = iaqi_fg_df[IAQI_FEATURES].groupby(periods)
+        self._daily_sums = self._daily_sums.add(new_rows.sum(), fill_value=0)
+        self._daily_counts = self._daily_counts.add(new_rows.count(), fill_value=0)
+        return True
+
+    def _refresh_weather(self):
+        if self._daily_sums.empty:
+            return False
+
+        last_day = self._daily_sums.index.max()
+        if self.weather_watermark is not None and self.weather_watermark >= last_day:
+            return False
+
+        # Last known day is fetched again - it might have been incomplete
+        start_date = (
+            self._daily_sums.index.min()
+            if self.weather_watermark is None
+            else self.weather_watermark
+        )
+        new_weather_df = self._fetch_weather(start_date, last_day)
+        if new_weather_df.empty:
+            return False
+        new_weather_df.index = new_weather_df.index.astype("datetime64[ns]")
+
+        if self._weather_df is None:
+            self._weather_df = new_weather_df
+        else:
+            self._weather_df = pd.concat(
+                [self._weather_df[self._weather_df.index < new_weather_df.index.min()], new_weather_df]
+            )
+        self.weather_watermark = self._weather_df.index.max()
+        return True
+
+    def _trim(self):
+        # First read returns the whole feature group - only its tail is needed
+        if self._daily_sums.empty:
+            return
+        step = pd.Timedelta(1, unit=self.freq)
+        cutoff = self._daily_sums.index.max() - step * (self.history_size - 1) - FILL_MARGIN
+        self._daily_sums = self._daily_sums[self._daily_sums.index >= cutoff]
+        self._daily_counts = self._daily_counts[self._daily_counts.index >= cutoff]
+        if self._weather_df is not None:
+            # Latest weather before the cutoff is kept - merge_asof matches periods to weather at or before them
+            first_kept = max(self._weather_df.index.searchsorted(cutoff, side="right") - 1, 0)
+            self._weather_df = self._weather_df.iloc[first_kept:]
+
+    def _build_history(self):
+        aqi_df = self._daily_sums / self._daily_counts.where(self._daily_counts > 0)
+        aqi_df.index.name = "event_timestamp"
+
+        aqi_df = aqi.clean_missing_dates(aqi_df, freq=self.freq)
+        aqi_df = aqi.clean_missing_values(aqi_df)
+        # Only the kept rows are needed - calendar features are computed just for them
+        aqi_df = add_calendar_features(aqi_df[-self.history_size :].copy(), self.freq)
+        aqi_df.index = aqi_df.index.astype("datetime64[ns]")
+
+        weather_df = meteo.clean_missing_values(self._weather_df.copy())
+
+        merged_df = pd.merge_asof(aqi_df, weather_df, left_index=True, right_index=True)
+        merged_df = merged_df.astype(self.dtype)
+
+        return self.feature_scaler.transform(merged_df)
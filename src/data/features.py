@@ -1,37 +1,200 @@
+import pandas as pd
 from pandas import DataFrame
 import numpy as np
-from sklearn.preprocessing import StandardScaler
+from numpy.lib.stride_tricks import as_strided
+
+
+# Flags stay 0/1 - they are not scaled
+UNSCALED_FEATURES = ["is_leap_year", "is_feb29", "is_working_day"]
 
 
 class FeatureScaler:
+    """
+    Standardizes numerical features - (value - mean) / scale, statistics of training data.
+
+    Mean and scale are vectors over numerical_features. For any column order they are expanded
+    to full rows (unscaled columns get mean 0 and scale 1), so arrays of rows, windows or
+    (origins x horizon x columns) forecasts are scaled in one broadcast - in place with out=values.
+    Frame methods return new frames, the given frame is not modified.
+    """
 
     def __init__(self):
-        self.scaler = StandardScaler()
+        self.numerical_features = []
+        # Columns of training data - default column order of arrays
+        self.columns = None
+        self.mean_ = None
+        self.scale_ = None
+        self._statistics = {}
 
     def fit(self, train_df: DataFrame):
         self.numerical_features = [
             col
             for col in train_df.columns
-            if col not in ["is_leap_year", "is_feb29", "is_working_day"]
+            if col not in UNSCALED_FEATURES
         ]
+        self.columns = list(train_df.columns)
 
         # TODO: use one-hot encoding on features like year, day_of_week, etc.
 
         # Important: Fit the scaler only on the training data
         # and then transform both training and testing data to prevent data leakage.
-        self.scaler = self.scaler.fit(train_df[self.numerical_features])
+        values = train_df[self.numerical_features].to_numpy(dtype=np.float64)
+        # Same as StandardScaler - missing values are ignored, constant features keep their scale
+        self.mean_ = np.nanmean(values, axis=0)
+        self.scale_ = np.nanstd(values, axis=0)
+        self.scale_[self.scale_ < 10 * np.finfo(np.float64).eps] = 1.0
+        self._statistics = {}
+        return self
+
+    def statistics(self, columns=None):
+        """Mean and scale vectors for rows with these columns (training columns by default)."""
+        columns = tuple(self._columns(columns))
+        statistics = self._statistics.get(columns)
+        if statistics is None:
+            positions = pd.Index(self.numerical_features).get_indexer(columns)
+            is_numerical = positions >= 0
+            mean = np.zeros(len(columns))
+            scale = np.ones(len(columns))
+            mean[is_numerical] = self.mean_[positions[is_numerical]]
+            scale[is_numerical] = self.scale_[positions[is_numerical]]
+            statistics = self._statistics[columns] = (mean, scale)
+        return statistics
+
+    def transform_array(self, values, columns=None, out=None):
+        """Scale array with columns on the last axis - into out (e.g. values itself) or a new array."""
+        mean, scale = self.statistics(columns)
+        out = _output_array(values, out)
+        if out.dtype == np.float64:
+            np.subtract(values, mean, out=out)
+            np.divide(out, scale, out=out)
+        else:
+            # Computed in float64 - float32 results are rounded once, not after every step
+            np.divide(np.subtract(values, mean, dtype=np.float64), scale, out=out, casting="same_kind")
+        return out
+
+    def inverse_transform_array(self, values, columns=None, out=None):
+        """Values in original units of scaled array with columns on the last axis."""
+        mean, scale = self.statistics(columns)
+        out = _output_array(values, out)
+        if out.dtype == np.float64:
+            np.multiply(values, scale, out=out)
+            np.add(out, mean, out=out)
+        else:
+            np.add(np.multiply(values, scale, dtype=np.float64), mean, out=out, casting="same_kind")
+        return out
 
     def transform(self, dataframe: DataFrame):
-        dataframe.loc[:, self.numerical_features] = self.scaler.transform(
-            dataframe[self.numerical_features]
-        )
-        return dataframe
+        return self._transform_frame(dataframe, self.transform_array)
+
+    def transform_columns(self, dataframe: DataFrame):
+        # Scales only columns that are present (e.g. features known for future dates) - same as transform
+        return self.transform(dataframe)
 
     def inverse_transform(self, dataframe: DataFrame):
-        dataframe.loc[:, self.numerical_features] = self.scaler.inverse_transform(
-            dataframe[self.numerical_features]
+        return self._transform_frame(dataframe, self.inverse_transform_array)
+
+    def _transform_frame(self, dataframe, transform_array):
+        values = dataframe.to_numpy()
+        if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float64)
+        # Values are a copy unless the frame is a single float block - don't write into the frame
+        return DataFrame(transform_array(values, dataframe.columns), index=dataframe.index, columns=dataframe.columns)
+
+    def _columns(self, columns):
+        if columns is not None:
+            return list(columns)
+        if self.columns is None:
+            raise ValueError("Columns of values have to be given - scaler doesn't know its training columns")
+        return self.columns
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_statistics"] = {}
+        return state
+
+    def __setstate__(self, state):
+        # Scalers pickled before statistics were kept as vectors hold a fitted StandardScaler
+        scaler = state.pop("scaler", None)
+        self.__init__()
+        self.__dict__.update(state)
+        if scaler is not None and self.mean_ is None:
+            self.mean_ = np.asarray(scaler.mean_, dtype=np.float64)
+            self.scale_ = np.asarray(scaler.scale_, dtype=np.float64)
+
+
+def _output_array(values, out):
+    if out is not None:
+        return out
+    dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+    return np.empty(values.shape, dtype=dtype)
+
+
+class Windows:
+    """Sliding windows over one contiguous (rows x columns) buffer.
+
+    `values` is a read-only (windows x window_size x columns) view - no data is copied.
+    Index and columns of the source frame are kept on the side, so a single window
+    can still be turned into a DataFrame when needed (e.g. for logging).
+    """
+
+    def __init__(
+        self, buffer, index, columns, window_size, num_windows=None, offset=0
+    ):
+        if num_windows is None:
+            num_windows = max(buffer.shape[0] - offset - window_size + 1, 0)
+
+        self.buffer = buffer
+        self.index = index
+        self.columns = columns
+        self.window_size = window_size
+        self.offset = offset
+
+        row_stride, column_stride = buffer.strides
+        self.values = as_strided(
+            buffer[offset:],
+            shape=(num_windows, window_size, buffer.shape[1]),
+            strides=(row_stride, row_stride, column_stride),
+            writeable=False,
+        )
+
+    @classmethod
+    def from_frame(cls, dataframe: DataFrame, window_size, num_windows=None, offset=0):
+        buffer = np.ascontiguousarray(dataframe.to_numpy())
+        return cls(
+            buffer,
+            dataframe.index,
+            dataframe.columns,
+            window_size,
+            num_windows,
+            offset,
+        )
+
+    @property
+    def start_index(self):
+        return self.index[self.offset : self.offset + len(self)]
+
+    @property
+    def end_index(self):
+        first_end = self.offset + self.window_size - 1
+        return self.index[first_end : first_end + len(self)]
+
+    def flatten(self):
+        return _flatten_windows(self)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getitem__(self, window_index) -> DataFrame:
+        start = self.offset + range(len(self))[window_index]
+        return DataFrame(
+            self.values[window_index],
+            index=self.index[start : start + self.window_size],
+            columns=self.columns,
         )
-        return dataframe
+
+    def __iter__(self):
+        for window_index in range(len(self)):
+            yield self[window_index]
 
 
 def split_to_windows(
@@ -62,28 +225,41 @@ def split_to_windows(
     )
 
 
+def dataset_windows(
+    dataframe, historical_window_size, prediction_window_size, target_columns
+):
+    """Flat X and y windows of one dataset - views of its values whenever possible."""
+    X_windows, y_windows = _split_to_windows(
+        dataframe, historical_window_size, prediction_window_size, target_columns
+    )
+    return X_windows.flatten(), y_windows.flatten()
+
+
 def _split_to_windows(
     X, historical_window_size, prediction_window_size, target_columns
 ):
-    original_input_size = X.shape[0]
+    num_windows = max(
+        X.shape[0] - historical_window_size - prediction_window_size + 1, 0
+    )
 
-    X_new = []
-    y_new = []
-    for i in range(
-        original_input_size - historical_window_size - prediction_window_size + 1
-    ):
-        X_window = X[i : i + historical_window_size]
-        X_new.append(X_window)
+    X_windows = Windows.from_frame(X, historical_window_size, num_windows)
 
-        y_window = X[
-            i
-            + historical_window_size : i
-            + historical_window_size
-            + prediction_window_size
-        ][target_columns]
-        y_new.append(y_window)
+    # Targets usually are all columns (recursive forecasting) - then both views share one buffer
+    target_columns = pd.Index(target_columns)
+    if target_columns.equals(X.columns):
+        y_buffer = X_windows.buffer
+    else:
+        y_buffer = np.ascontiguousarray(X[target_columns].to_numpy())
+    y_windows = Windows(
+        y_buffer,
+        X.index,
+        target_columns,
+        prediction_window_size,
+        num_windows,
+        offset=historical_window_size,
+    )
 
-    return X_new, y_new
+    return X_windows, y_windows
 
 
 def flatten_windows(
@@ -109,4 +285,6 @@ def flatten_windows(
 
 def _flatten_windows(windows):
     # Regressors require 2D features - more columns instead of more dimensions
-    return np.array([window.values.flatten() for window in windows])
+    values = windows.values if isinstance(windows, Windows) else np.asarray(windows)
+    # Rows of a window are adjacent in the buffer, so this is a view and not a copy
+    return values.reshape(len(values), -1)
@@ -0,0 +1,63 @@
+import json
+import os
+
+# Location used when none is given - the station the project started with
+DEFAULT_LOCATION = "poprad"
+LOCATIONS_FILE = os.path.join(os.path.dirname(__file__), "locations.json")
+
+_locations = None
+
+
+class Location:
+    """
+    Monitoring station and everything the pipeline needs to know about it.
+
+    New stations only need id, name, WAQI feed and coordinates of the nearest meteo station (latitude, longitude, altitude).
+    Feature group and model are named after the id, historical CSV (in data folder) is optional.
+    """
+
+    def __init__(self, id, name, waqi_feed, weather_station, history_file=None, feature_group=None, model_name=None):
+        self.id = id
+        self.name = name
+        self.waqi_feed = waqi_feed
+        self.weather_station = tuple(weather_station)
+        self.history_file = history_file
+        self.feature_group = feature_group or f"iaqi_{id}"
+        self.model_name = model_name or f"aqi_prediction_model_{id}"
+
+    def cache_dir(self, project_root):
+        return os.path.join(project_root, "data", "cache", self.id)
+
+    def merged_features_dir(self, project_root, resolution):
+        # Written by train_model.py, read by experiments (search, backtest, benchmarks)
+        return os.path.join(self.cache_dir(project_root), f"merged_{resolution}")
+
+    def ingest_log(self, project_root):
+        # Readings waiting for insert to the feature group - outside cache, it must not be cleared with it
+        return os.path.join(project_root, "data", "ingest", f"{self.id}.jsonl")
+
+    def __repr__(self):
+        return f"Location({self.id!r}, {self.name!r})"
+
+
+def load_locations(path=LOCATIONS_FILE):
+    with open(path, encoding="utf-8") as locations_file:
+        return {
+            location_id: Location(location_id, **properties)
+            for location_id, properties in json.load(locations_file).items()
+        }
+
+
+def get_locations():
+    global _locations
+    if _locations is None:
+        _locations = load_locations()
+    return _locations
+
+
+def get_location(location_id=None):
+    locations = get_locations()
+    location_id = location_id or DEFAULT_LOCATION
+    if location_id not in locations:
+        raise ValueError(f"Unknown location '{location_id}', expected one of {list(locations)}")
+    return locations[location_id]
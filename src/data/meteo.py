@@ -1,19 +1,68 @@
+import os
+import json
+import datetime
 import pandas as pd
-from meteostat import Point, Daily
 import logging
 
 from src.common import LOGGER_NAME
+from src.data.locations import get_location
+from src.data.store import ColumnarStore
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
+# Recent days can still be updated by meteostat - refetch them once cached copy gets older than TTL
+REFRESH_DAYS = 7
+REFRESH_TTL = datetime.timedelta(hours=6)
 
-def fetch_daily_data(aqi_df: pd.DataFrame):
-    # Coordinates of Poprad-Tatry Airport (LZTT) meteo station.
-    location = Point(49.07, 20.24, 718)
 
+# Meteo station is (latitude, longitude, altitude) - nearest station of the default location when not given
+def fetch_daily_data(aqi_df: pd.DataFrame, cache_dir=None, station=None):
     datetime_pd = aqi_df.index
-    start_date = datetime_pd.min()
-    end_date = datetime_pd.max()
+    return fetch_daily_range(datetime_pd.min(), datetime_pd.max(), cache_dir, station)
+
+
+def fetch_daily_range(start_date, end_date, cache_dir=None, station=None):
+    station = station or get_location().weather_station
+    if cache_dir is not None:
+        return WeatherCache(cache_dir).fetch(station, start_date, end_date)
+    return meteostat_source(station, start_date, end_date)
+
+
+def fetch_hourly_data(aqi_df: pd.DataFrame, cache_dir=None, station=None):
+    datetime_pd = aqi_df.index
+    return fetch_hourly_range(datetime_pd.min(), datetime_pd.max(), cache_dir, station)
+
+
+def fetch_hourly_range(start_date, end_date, cache_dir=None, station=None):
+    station = station or get_location().weather_station
+    if cache_dir is not None:
+        return WeatherCache(os.path.join(cache_dir, "hourly"), source=meteostat_hourly_source).fetch(
+            station, start_date, end_date
+        )
+    return meteostat_hourly_source(station, start_date, end_date)
+
+
+def meteostat_hourly_source(station, start_date, end_date):
+    from meteostat import Point, Hourly
+
+    location = Point(*station)
+
+    # All hours of the end date
+    end_date = pd.Timestamp(end_date).normalize() + pd.Timedelta(hours=23)
+    hourly_weather = Hourly(location, start_date, end_date)
+    weather_df = hourly_weather.fetch()
+
+    # Not available for selected meteo station (wdir, tsun) or categorical (weather condition code)
+    weather_df.drop(["wdir", "tsun", "coco"], axis=1, inplace=True)
+
+    return weather_df
+
+
+def meteostat_source(station, start_date, end_date):
+    # Imported on first fetch - meteostat is slow to import and not needed for cleaning
+    from meteostat import Point, Daily
+
+    location = Point(*station)
 
     daily_weather = Daily(location, start_date, end_date)
     weather_df = daily_weather.fetch()
@@ -24,6 +73,104 @@ def fetch_daily_data(aqi_df: pd.DataFrame):
     return weather_df
 
 
+class WeatherCache:
+    """On-disk cache of daily weather rows, keyed by station point and date.
+
+    Cached days form one contiguous range per station. Only days outside of it are fetched,
+    plus the last REFRESH_DAYS once they are older than REFRESH_TTL.
+    `source(station, start_date, end_date)` can be replaced, e.g. with local fixture data.
+    """
+
+    def __init__(self, cache_dir, source=meteostat_source, refresh_days=REFRESH_DAYS, refresh_ttl=REFRESH_TTL):
+        self.cache_dir = cache_dir
+        self.source = source
+        self.refresh_days = refresh_days
+        self.refresh_ttl = refresh_ttl
+
+    def fetch(self, station, start_date, end_date) -> pd.DataFrame:
+        start_date = pd.Timestamp(start_date).normalize()
+        end_date = pd.Timestamp(end_date).normalize()
+        # Includes all rows of the last day (hourly sources)
+        end_of_range = end_date + pd.Timedelta(days=1) - pd.Timedelta(1, unit="ns")
+        store = ColumnarStore(self._station_path(station))
+        coverage = self._read_coverage(station)
+
+        now = pd.Timestamp.now()
+        refresh_from = now.normalize() - pd.Timedelta(days=self.refresh_days)
+        one_day = pd.Timedelta(days=1)
+
+        missing_ranges = []
+        if coverage is None:
+            missing_ranges.append((start_date, end_date))
+        else:
+            # Ranges start/end right at the cached range so that it stays contiguous
+            if start_date < coverage["start"]:
+                missing_ranges.append((start_date, coverage["start"] - one_day))
+            if end_date > coverage["end"]:
+                missing_ranges.append((coverage["end"] + one_day, end_date))
+            is_stale = now - coverage["fetched_at"] > self.refresh_ttl
+            stale_start = max(refresh_from, start_date, coverage["start"])
+            stale_end = min(end_date, coverage["end"])
+            if is_stale and stale_start <= stale_end:
+                missing_ranges.append((stale_start, stale_end))
+
+        if not missing_ranges:
+            return store.read(start_date, end_of_range)
+
+        weather_df = store.read() if store.exists() else None
+        coverage_start = None if coverage is None else coverage["start"]
+        coverage_end = None if coverage is None else coverage["end"]
+        refreshed_recent = False
+        for range_start, range_end in missing_ranges:
+            LOGGER.debug(f"Fetching weather for {station} from {range_start.date()} to {range_end.date()}")
+            new_weather_df = self.source(station, range_start, range_end)
+            if new_weather_df.empty:
+                # Not published (yet) - days stay uncovered and are asked for again next time
+                continue
+            new_weather_df.index = new_weather_df.index.astype("datetime64[ns]")
+            # Covered only as far as rows were returned - sources can lag behind the requested range
+            first_day = new_weather_df.index.min().normalize()
+            last_day = new_weather_df.index.max().normalize()
+            coverage_start = first_day if coverage_start is None else min(coverage_start, first_day)
+            coverage_end = last_day if coverage_end is None else max(coverage_end, last_day)
+            refreshed_recent = refreshed_recent or last_day >= refresh_from
+            if weather_df is None:
+                weather_df = new_weather_df
+            else:
+                # Newly fetched rows replace cached ones
+                weather_df = pd.concat([weather_df[~weather_df.index.isin(new_weather_df.index)], new_weather_df])
+
+        if coverage_start is None:
+            # Nothing cached and nothing returned
+            return pd.DataFrame()
+        weather_df = weather_df.sort_index()
+        store.write(weather_df)
+
+        self._write_coverage(station, {
+            "start": coverage_start,
+            "end": coverage_end,
+            # Recent days not refetched keep their original fetch time
+            "fetched_at": now if coverage is None or refreshed_recent else coverage["fetched_at"],
+        })
+
+        return weather_df.loc[start_date:end_of_range]
+
+    def _station_path(self, station):
+        return os.path.join(self.cache_dir, "_".join(str(coordinate) for coordinate in station))
+
+    def _read_coverage(self, station):
+        coverage_path = os.path.join(self._station_path(station), "coverage.json")
+        if not (os.path.exists(coverage_path) and ColumnarStore(self._station_path(station)).exists()):
+            return None
+        with open(coverage_path) as coverage_file:
+            return {name: pd.Timestamp(value) for name, value in json.load(coverage_file).items()}
+
+    def _write_coverage(self, station, coverage):
+        coverage_path = os.path.join(self._station_path(station), "coverage.json")
+        with open(coverage_path, "w") as coverage_file:
+            json.dump({name: value.isoformat() for name, value in coverage.items()}, coverage_file)
+
+
 def clean_missing_values(weather_df: pd.DataFrame):
     LOGGER.debug(f"Missing values:\n{weather_df.isna().sum()}")
     # N/A here means that there was no rain or snow - so filling with 0 instead
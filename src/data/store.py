@@ -0,0 +1,147 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+from src.common import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+SCHEMA_FILE = "schema.json"
+SCHEMA_VERSION = 1
+
+
+class ColumnarStore:
+    """Typed columnar store for a date-indexed numeric frame.
+
+    Data is partitioned by year - each partition is one (rows x columns) `.npy` matrix
+    plus `.npy` of dates, described by `schema.json`. Partitions are memory-mapped on read,
+    so a date range within a single year is loaded without copying.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, SCHEMA_FILE))
+
+    def write(self, dataframe: pd.DataFrame, dtype="float64", source=None):
+        if not isinstance(dataframe.index, pd.DatetimeIndex):
+            raise ValueError("Columnar store requires DatetimeIndex.")
+        if not dataframe.index.is_monotonic_increasing:
+            dataframe = dataframe.sort_index()
+
+        os.makedirs(self.path, exist_ok=True)
+        values = dataframe.to_numpy(dtype=dtype)
+        dates = dataframe.index.values.astype("datetime64[ns]")
+
+        partitions = {}
+        for year in np.unique(dataframe.index.year):
+            rows = dataframe.index.year == year
+            np.save(self._values_path(year), np.ascontiguousarray(values[rows]))
+            np.save(self._dates_path(year), dates[rows])
+            partitions[str(year)] = int(rows.sum())
+
+        # Schema is written last - store without it is treated as missing
+        schema = {
+            "version": SCHEMA_VERSION,
+            "columns": list(dataframe.columns),
+            "index_name": dataframe.index.name,
+            "dtype": np.dtype(dtype).name,
+            "partitions": partitions,
+            "source": source,
+        }
+        with open(os.path.join(self.path, SCHEMA_FILE), "w") as schema_file:
+            json.dump(schema, schema_file, indent=2)
+
+    def read_schema(self):
+        with open(os.path.join(self.path, SCHEMA_FILE)) as schema_file:
+            schema = json.load(schema_file)
+        if schema.get("version") != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported store version in '{self.path}': {schema.get('version')}")
+        return schema
+
+    def read(self, start=None, end=None, columns=None) -> pd.DataFrame:
+        """Read rows with start <= date <= end. Only partitions of overlapping years are opened."""
+        schema = self.read_schema()
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        values_parts = []
+        dates_parts = []
+        for year, num_rows in schema["partitions"].items():
+            year = int(year)
+            if (start is not None and year < start.year) or (end is not None and year > end.year):
+                continue
+
+            # Copy-on-write mapping - callers can modify frame without touching the files
+            values = np.load(self._values_path(year), mmap_mode="c")
+            dates = np.load(self._dates_path(year), mmap_mode="r")
+            self._validate_partition(schema, year, num_rows, values, dates)
+
+            first = 0 if start is None else np.searchsorted(dates, start.to_datetime64(), side="left")
+            last = len(dates) if end is None else np.searchsorted(dates, end.to_datetime64(), side="right")
+            values_parts.append(values[first:last])
+            dates_parts.append(dates[first:last])
+
+        num_columns = len(schema["columns"])
+        if not values_parts:
+            values = np.empty((0, num_columns), dtype=schema["dtype"])
+            dates = np.empty(0, dtype="datetime64[ns]")
+        elif len(values_parts) == 1:
+            values, dates = values_parts[0], dates_parts[0]
+        else:
+            values, dates = np.concatenate(values_parts), np.concatenate(dates_parts)
+
+        dataframe = pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(dates, name=schema["index_name"]),
+            columns=schema["columns"],
+            copy=False,
+        )
+        if columns is not None:
+            dataframe = dataframe[columns]
+        return dataframe
+
+    def _validate_partition(self, schema, year, num_rows, values, dates):
+        expected_shape = (num_rows, len(schema["columns"]))
+        if values.shape != expected_shape or values.dtype != np.dtype(schema["dtype"]):
+            raise ValueError(
+                f"Partition {year} in '{self.path}' has {values.shape} {values.dtype}, "
+                f"schema says {expected_shape} {schema['dtype']}."
+            )
+        if len(dates) != num_rows:
+            raise ValueError(f"Partition {year} in '{self.path}' has {len(dates)} dates, expected {num_rows}.")
+
+    def _values_path(self, year):
+        return os.path.join(self.path, f"{year}.npy")
+
+    def _dates_path(self, year):
+        return os.path.join(self.path, f"{year}.dates.npy")
+
+
+SHARED_FRAME_FILE = "frame.json"
+
+
+def write_shared_frame(dataframe: pd.DataFrame, path, dtype=None):
+    """Write frame as one contiguous matrix (dtype of the frame by default) - worker processes map the same file instead of receiving copies."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "values.npy"), dataframe.to_numpy(dtype=dtype))
+    np.save(os.path.join(path, "dates.npy"), dataframe.index.values.astype("datetime64[ns]"))
+    with open(os.path.join(path, SHARED_FRAME_FILE), "w") as frame_file:
+        json.dump({"columns": list(dataframe.columns), "index_name": dataframe.index.name}, frame_file)
+
+
+def read_shared_frame(path) -> pd.DataFrame:
+    with open(os.path.join(path, SHARED_FRAME_FILE)) as frame_file:
+        frame = json.load(frame_file)
+    # Copy-on-write mapping - pages are shared between processes, pandas can still write to its own copy
+    values = np.load(os.path.join(path, "values.npy"), mmap_mode="c")
+    dates = np.load(os.path.join(path, "dates.npy"), mmap_mode="r")
+    return pd.DataFrame(
+        values,
+        index=pd.DatetimeIndex(dates, name=frame["index_name"]),
+        columns=frame["columns"],
+        copy=False,
+    )
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from src.common import IAQI_FEATURES, DAILY, HOURLY
+
+# Typical level and spread of every IAQI (sub-index values, not concentrations)
+IAQI_LEVELS = {"pm25": (45, 20), "pm10": (20, 9), "no2": (6, 3), "so2": (2, 1), "co": (3, 1)}
+# Meteostat daily columns kept by meteo.meteostat_source
+WEATHER_COLUMNS = ["tavg", "tmin", "tmax", "prcp", "snow", "wspd", "wpgt", "pres"]
+WEATHER_EPOCH = pd.Timestamp("2000-01-01")
+
+
+def synthetic_iaqi(start="2020-01-01", periods=24 * 365, freq=HOURLY, seed=0, missing_rows=0.02, missing_values=0.01):
+    """
+    Feature store like IAQI readings - event_timestamp (UTC) and float32 IAQI columns.
+
+    Values follow a yearly and a daily cycle (winter heating, traffic peaks) with autocorrelated noise.
+    Some rows are left out (missing dates) and some values are NaN, so cleaning has work to do.
+    """
+    rng = np.random.default_rng(seed)
+    # Nanoseconds as in feature store reads
+    timestamps = pd.date_range(start, periods=periods, freq=freq, tz="UTC").astype("datetime64[ns, UTC]")
+    day_of_year = timestamps.dayofyear.to_numpy()
+    hour = timestamps.hour.to_numpy()
+
+    yearly = np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    daily = np.cos(2 * np.pi * (hour - 8) / 24) + 0.5 * np.cos(2 * np.pi * (hour - 19) / 12)
+    # AR(1) noise - neighbouring periods are similar as in real data
+    noise = rng.standard_normal((periods, len(IAQI_FEATURES)))
+    for row in range(1, periods):
+        noise[row] += 0.8 * noise[row - 1]
+
+    iaqi_df = pd.DataFrame({"event_timestamp": timestamps})
+    for column, iaqi in enumerate(IAQI_FEATURES):
+        level, spread = IAQI_LEVELS[iaqi]
+        values = level + spread * (0.6 * yearly + 0.2 * daily + 0.3 * noise[:, column])
+        iaqi_df[iaqi] = np.clip(values, 0, None).astype(np.float32)
+
+    iaqi_df = iaqi_df[rng.random(periods) >= missing_rows].reset_index(drop=True)
+    iaqi_df[IAQI_FEATURES] = iaqi_df[IAQI_FEATURES].mask(rng.random((len(iaqi_df), len(IAQI_FEATURES))) < missing_values)
+    return iaqi_df
+
+
+def synthetic_weather(start_date, end_date, freq=DAILY, seed=0):
+    """Meteostat like weather rows (indexed by time) for every period between the dates."""
+    from scipy.special import ndtr
+
+    # Generated from a fixed date in one draw (row by row) - a period gets the same weather
+    # whatever range it is requested in
+    # All periods of the end date (hourly) - same as meteostat sources
+    end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+    index = pd.date_range(WEATHER_EPOCH, end, freq=freq, inclusive="left", name="time").astype("datetime64[ns]")
+    normal = np.random.default_rng(seed).standard_normal((len(index), 6))
+    uniform = ndtr(normal[:, 3:])
+    yearly = np.cos(2 * np.pi * (index.dayofyear.to_numpy() - 200) / 365.25)
+
+    tavg = 8 + 11 * yearly + 3 * normal[:, 0]
+    spread = 4 + 2 * uniform[:, 0]
+    wspd = np.abs(10 + 5 * normal[:, 1])
+    return pd.DataFrame(
+        {
+            "tavg": tavg,
+            "tmin": tavg - spread,
+            "tmax": tavg + spread,
+            "prcp": np.where(uniform[:, 1] < 0.35, -4 * np.log1p(-uniform[:, 2]), 0.0),
+            "snow": np.where(tavg < 0, np.floor(300 * uniform[:, 2]), 0.0),
+            "wspd": wspd,
+            "wpgt": wspd * (1.5 + uniform[:, 0]),
+            "pres": 1015 + 8 * normal[:, 2],
+        },
+        index=index,
+    )[pd.Timestamp(start_date).normalize() :]
+
+
+def synthetic_weather_source(seed=0, freq=DAILY):
+    """Weather source for meteo.WeatherCache - same station and period always gives the same rows."""
+
+    def source(station, start_date, end_date):
+        station_seed = seed + abs(hash(tuple(station))) % 1000
+        return synthetic_weather(start_date, end_date, freq, station_seed)
+
+    return source
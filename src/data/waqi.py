@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.common import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Overridable so that the fetcher can be pointed at a local mock server
+WAQI_API_URL = os.environ.get("WAQI_API_URL", "https://api.waqi.info")
+# Requests in flight at once - also size of the connection pool
+MAX_CONCURRENCY = 8
+REQUEST_TIMEOUT_SECONDS = 10
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 1.0
+# Longest wait honoured from Retry-After - one response can't stall the whole run
+MAX_RETRY_AFTER_SECONDS = 30.0
+# WAQI answers over-quota requests with HTTP 200 and an error status
+RATE_LIMIT_MESSAGES = ("over quota", "too many requests")
+
+
+class WaqiError(Exception):
+    pass
+
+
+class _RetryableError(WaqiError):
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def fetch_feeds(feeds, token, columns, api_url=None, concurrency=MAX_CONCURRENCY, timeout_seconds=REQUEST_TIMEOUT_SECONDS, attempts=MAX_ATTEMPTS):
+    """
+    Current readings of many WAQI feeds, fetched concurrently over one pooled session.
+
+    Returns (readings, errors). Readings has a row per successfully fetched feed - feed, event_timestamp
+    (UTC) and float32 `columns` (NaN when feed doesn't publish it). Errors maps failed feeds to messages.
+    """
+    return asyncio.run(
+        fetch_feeds_async(feeds, token, columns, api_url, concurrency, timeout_seconds, attempts)
+    )
+
+
+async def fetch_feeds_async(feeds, token, columns, api_url=None, concurrency=MAX_CONCURRENCY, timeout_seconds=REQUEST_TIMEOUT_SECONDS, attempts=MAX_ATTEMPTS):
+    import aiohttp
+
+    api_url = (api_url or WAQI_API_URL).rstrip("/")
+    # Values are parsed straight into their row - no frame per response
+    values = np.full((len(feeds), len(columns)), np.nan, dtype=np.float32)
+    column_positions = {column: position for position, column in enumerate(columns)}
+    event_times = [None] * len(feeds)
+    errors = {}
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def fetch_feed(row, feed):
+            try:
+                data = await _get_data(session, semaphore, f"{api_url}/feed/{feed}/", {"token": token}, attempts)
+                for name, reading in data.get("iaqi", {}).items():
+                    position = column_positions.get(name)
+                    if position is not None:
+                        values[row, position] = reading["v"]
+                # Set last - rows without event time (failed feeds) are dropped
+                event_times[row] = data["time"]["iso"]
+            except WaqiError as e:
+                errors[feed] = str(e)
+            except (KeyError, TypeError, ValueError) as e:
+                errors[feed] = f"Unexpected response: {e!r}"
+
+        await asyncio.gather(*(fetch_feed(row, feed) for row, feed in enumerate(feeds)))
+
+    fetched = np.array([event_time is not None for event_time in event_times], dtype=bool)
+    readings = pd.DataFrame(values[fetched], columns=columns)
+    readings.insert(0, "event_timestamp", pd.to_datetime([t for t in event_times if t is not None], utc=True))
+    readings.insert(0, "feed", [feed for feed, ok in zip(feeds, fetched) if ok])
+    return readings, errors
+
+
+async def _get_data(session, semaphore, url, params, attempts):
+    import aiohttp
+
+    for attempt in range(1, attempts + 1):
+        try:
+            async with semaphore:
+                return await _get_once(session, url, params)
+        except (_RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == attempts:
+                raise WaqiError(f"{url} failed after {attempts} attempts: {_describe(e)}") from e
+            delay_seconds = _retry_delay(e, attempt)
+            LOGGER.warning(f"{url} failed ({_describe(e)}), retrying in {delay_seconds:.1f}s...")
+            await asyncio.sleep(delay_seconds)
+
+
+async def _get_once(session, url, params):
+    async with session.get(url, params=params) as response:
+        if response.status == 429 or response.status >= 500:
+            raise _RetryableError(f"HTTP {response.status}", _retry_after(response.headers.get("Retry-After")))
+        if response.status != 200:
+            raise WaqiError(f"{url} returned HTTP {response.status}")
+        # Bytes are parsed directly - no decoding to text first
+        body = json.loads(await response.read())
+
+    if body.get("status") != "ok":
+        message = str(body.get("data") or body.get("message") or body)
+        if message.lower() in RATE_LIMIT_MESSAGES:
+            raise _RetryableError(message)
+        raise WaqiError(f"Request error: {message}")
+    return body["data"]
+
+
+def _retry_delay(error, attempt):
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_AFTER_SECONDS)
+    # Exponential backoff with jitter - concurrent retries don't hit the API at the same moment
+    return BACKOFF_SECONDS * 2 ** (attempt - 1) * (1 + random.random())
+
+
+def _retry_after(header):
+    # Seconds only - HTTP dates (and invalid values) fall back to backoff
+    try:
+        retry_after = float(header)
+    except (TypeError, ValueError):
+        return None
+    return retry_after if retry_after >= 0 else None
+
+
+def _describe(error):
+    # Timeouts have no message
+    return str(error) or type(error).__name__
@@ -1,5 +1,8 @@
 import os
+import json
+import logging
 import shutil
+import numpy as np
 import pandas as pd
 import joblib
 
@@ -13,9 +16,31 @@ from hsml.resources import PredictorResources, Resources
 from hsml.model import Model
 
 from src.utils import singleton
-from src.common import IAQI_FEATURES
+from src.data.aqi import read_feature_group
+from src.common import LOGGER_NAME, IAQI_FEATURES, DAILY
+from src.model.trees import export_model
+
+LOGGER = logging.getLogger(LOGGER_NAME)
 
 MODEL_NAME = "aqi_prediction_model"
+# Describes saved artifacts so that the predictor can validate them before loading
+MODEL_CONFIG_FILE = "model_config.json"
+
+
+def best_model(model_versions):
+    """Version with the highest mean of registered metrics (Willmott index of every IAQI)."""
+    best_model = None
+    best_score = -1
+
+    for model in model_versions:
+        metrics = model.training_metrics
+        if metrics:
+            score = sum(metrics.values()) / len(metrics.values())
+            if score > best_score:
+                best_score = score
+                best_model = model
+
+    return best_model
 
 
 @singleton
@@ -25,21 +50,11 @@ class HopsworksClient:
         hopsworks_aqi_token = os.environ["HOPSWORKS_AQI_TOKEN"]
         self.project = hopsworks.login(api_key_value=hopsworks_aqi_token)
 
-    def load_hourly_data(self):
+    def load_hourly_data(self, cache_dir=None, full_resync=False, freq=DAILY, feature_group="iaqi"):
         feature_store = self.project.get_feature_store()
 
-        iaqi_fg = feature_store.get_feature_group(name="iaqi", version=1)
-
-        iaqi_fg_df = iaqi_fg.select(
-            ["event_timestamp", "pm25", "pm10", "no2", "so2", "co"]
-        ).read()
-        # Remove TimeZone info and reset to 0 hours so that it can be compared to historical data
-        iaqi_fg_df["event_timestamp"] = (
-            pd.to_datetime(iaqi_fg_df["event_timestamp"])
-            .dt.tz_localize(None)
-            .dt.normalize()
-        )
-        return iaqi_fg_df
+        iaqi_fg = feature_store.get_feature_group(name=feature_group, version=1)
+        return read_feature_group(iaqi_fg, cache_dir, full_resync, freq)
 
     def save_model(
         self,
@@ -49,22 +64,49 @@ class HopsworksClient:
         input_example,
         output_example,
         feature_scaler,
+        model_config=None,
+        model_name=MODEL_NAME,
+        X_check=None,
     ) -> Model:
         # 0. Prepare temp folder for deployment
         DEPLOYMENT_FOLDER = "deployment"
-        deployment_path = os.path.join(project_root, DEPLOYMENT_FOLDER)
+        # Folder per model - locations can be trained in parallel
+        deployment_path = os.path.join(project_root, DEPLOYMENT_FOLDER, model_name)
         shutil.rmtree(deployment_path, ignore_errors=True)
         os.makedirs(deployment_path)
 
         # 1. Save Model
+        # Same file name for every location - predictor doesn't have to know which model it serves
         model_path = os.path.join(deployment_path, f"{MODEL_NAME}.pkl")
         joblib.dump(model, model_path)
+        artifact_files = [f"{MODEL_NAME}.pkl", "feature_scaler.bin"]
+
+        # 1.1 Save boosters as one tree ensemble file - predictor loads it without xgboost and scikit-learn
+        try:
+            export_model(
+                model,
+                os.path.join(deployment_path, f"{MODEL_NAME}.trees"),
+                np.asarray(input_example)[np.newaxis] if X_check is None else X_check,
+            )
+            artifact_files.append(f"{MODEL_NAME}.trees")
+        except ValueError as e:
+            # Predictor falls back to the pickled model
+            LOGGER.warning(f"Model not exported as tree ensemble: {e}")
 
         # 2. Save Scaler
         # Model path cannot contain more than one model file (i.e. .pkl, .pickle, .joblib files)
         feature_scaler_path = os.path.join(deployment_path, f"feature_scaler.bin")
         joblib.dump(feature_scaler, feature_scaler_path)
 
+        # 2.1 Save config (window sizes, columns) and artifact sizes for fast start-up validation
+        model_config = dict(model_config or {})
+        model_config["artifacts"] = {
+            file_name: os.path.getsize(os.path.join(deployment_path, file_name))
+            for file_name in artifact_files
+        }
+        with open(os.path.join(deployment_path, MODEL_CONFIG_FILE), "w") as config_file:
+            json.dump(model_config, config_file, indent=2)
+
         # 3. Save Predictor script
         source_predictor_path = os.path.join(project_root, "scripts", "predictor.py")
         # The model server explicitly looks for a predictor.py file within the root of the uploaded model artifact
@@ -96,7 +138,7 @@ class HopsworksClient:
 
         # TODO: should I use pythong instead of sklearn (what about moder server)
         aqi_model: Model = model_registry.python.create_model(
-            name=MODEL_NAME,
+            name=model_name,
             description="Air Quality Index prediction model",
             metrics=metrics,
             input_example=input_example,
@@ -143,26 +185,36 @@ class HopsworksClient:
         
         return metrics
 
-    def get_best_model_version(self):
+    def get_best_model_version(self, model_name=MODEL_NAME):
         model_registry: ModelRegistry = self.project.get_model_registry()
-        model_versions = model_registry.get_models(MODEL_NAME)
-
-        best_model = None
-        best_score = -1
-
-        for model in model_versions:
-            metrics = model.training_metrics
-            if metrics:
-                score = sum(metrics.values()) / len(metrics.values())
-                if score > best_score:
-                    best_score = score
-                    best_model = model
-        
-        return best_model.version
+        model_versions = model_registry.get_models(model_name)
+        return best_model(model_versions).version
+
+    def get_latest_model_version(self, model_name=MODEL_NAME):
+        model_registry: ModelRegistry = self.project.get_model_registry()
+        model_versions = model_registry.get_models(model_name)
+        if not model_versions:
+            return None
+        return max(model.version for model in model_versions)
+
+    def load_model_artifacts(self, version, model_name=MODEL_NAME):
+        """Model together with its scaler and config (empty for models saved without config)."""
+        model_registry: ModelRegistry = self.project.get_model_registry()
+        retrieved_model = model_registry.get_model(model_name, version)
+        download_path = retrieved_model.download()
+        model = joblib.load(os.path.join(download_path, f"{MODEL_NAME}.pkl"))
+        feature_scaler = joblib.load(os.path.join(download_path, "feature_scaler.bin"))
+
+        model_config = {}
+        config_path = os.path.join(download_path, MODEL_CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path) as config_file:
+                model_config = json.load(config_file)
+        return retrieved_model, model, feature_scaler, model_config
 
-    def load_model(self, version=1):
+    def load_model(self, version=1, model_name=MODEL_NAME):
         model_registry: ModelRegistry = self.project.get_model_registry()
-        retrieved_model = model_registry.get_model(MODEL_NAME, version)
+        retrieved_model = model_registry.get_model(model_name, version)
         download_path = retrieved_model.download()
         model_file_path = os.path.join(download_path, f"{MODEL_NAME}.pkl")
         model = joblib.load(model_file_path)
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.common import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Every insert starts a materialization job - pending readings are inserted once there are
+# FLUSH_ROWS of them or the oldest one waits FLUSH_AGE. With hourly readings that is one job
+# per 6 runs instead of one per run, and serving sees a reading at most 6 hours late
+FLUSH_ROWS = 6
+FLUSH_AGE = pd.Timedelta(hours=6)
+# Bulk loads (backfill) are split into inserts of at most this many rows
+INSERT_ROWS = 10_000
+INSERT_ATTEMPTS = 4
+RETRY_DELAY_SECONDS = 5
+
+
+class IngestionBuffer:
+    """Readings of one feature group, logged to a local write-ahead log and inserted in batches.
+
+    Every append is one JSON line, synced to disk before it returns - a reading survives a crash
+    or a failed insert and is inserted by the next flush. Log is cleared only after all its rows
+    were inserted. A flush interrupted half-way inserts some rows twice, which feature group
+    upserts on its primary key (event time), so flushing is safe to repeat.
+    """
+
+    def __init__(self, wal_path, event_time="event_timestamp", flush_rows=FLUSH_ROWS, flush_age=FLUSH_AGE):
+        self.wal_path = wal_path
+        self.state_path = f"{os.path.splitext(wal_path)[0]}.state.json"
+        self.event_time = event_time
+        self.flush_rows = flush_rows
+        self.flush_age = flush_age
+
+    @property
+    def flushed_until(self):
+        """Latest event time inserted to the feature group."""
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as state_file:
+            return pd.Timestamp(json.load(state_file)["flushed_until"])
+
+    def append(self, dataframe, skip_flushed=True):
+        """
+        Log rows to be inserted, returns the number of rows logged.
+
+        Feeds repeat their latest reading until a new one is published - with skip_flushed, rows
+        not newer than the latest inserted one are dropped. Backfills load older rows, so they don't skip.
+        """
+        dataframe = dataframe.copy()
+        dataframe[self.event_time] = pd.to_datetime(dataframe[self.event_time], utc=True)
+        flushed_until = self.flushed_until
+        if skip_flushed and flushed_until is not None:
+            dataframe = dataframe[dataframe[self.event_time] > flushed_until]
+        if dataframe.empty:
+            return 0
+
+        dataframe[self.event_time] = dataframe[self.event_time].map(pd.Timestamp.isoformat)
+        # NaN is not valid JSON - missing readings are logged as null
+        rows = dataframe.astype(object).where(dataframe.notna(), None).to_dict(orient="records")
+        entry = {"logged_at": pd.Timestamp.now(tz="UTC").isoformat(), "rows": rows}
+
+        os.makedirs(os.path.dirname(self.wal_path) or ".", exist_ok=True)
+        with open(self.wal_path, "a+b") as wal_file:
+            line = json.dumps(entry) + "\n"
+            # Line torn by a crash is ended first, otherwise this entry would be unreadable too
+            if wal_file.tell() > 0:
+                wal_file.seek(-1, os.SEEK_END)
+                if wal_file.read(1) != b"\n":
+                    line = "\n" + line
+            wal_file.write(line.encode())
+            wal_file.flush()
+            os.fsync(wal_file.fileno())
+        return len(rows)
+
+    def pending(self):
+        """Logged rows not inserted yet, deduplicated on event time (latest logged wins) and sorted."""
+        entries = self._read_entries()
+        rows = [row for entry in entries for row in entry["rows"]]
+        if not rows:
+            return pd.DataFrame()
+
+        pending_df = pd.DataFrame.from_records(rows)
+        pending_df[self.event_time] = pd.to_datetime(pending_df[self.event_time], utc=True)
+        value_columns = [column for column in pending_df.columns if column != self.event_time]
+        pending_df[value_columns] = pending_df[value_columns].astype(np.float32)
+        return (
+            pending_df[[self.event_time, *value_columns]]
+            .drop_duplicates(self.event_time, keep="last")
+            .sort_values(self.event_time)
+            .reset_index(drop=True)
+        )
+
+    def oldest_logged_at(self):
+        entries = self._read_entries()
+        return pd.Timestamp(entries[0]["logged_at"]) if entries else None
+
+    def should_flush(self, now=None):
+        oldest_logged_at = self.oldest_logged_at()
+        if oldest_logged_at is None:
+            return False
+        now = now or pd.Timestamp.now(tz="UTC")
+        return len(self.pending()) >= self.flush_rows or now - oldest_logged_at >= self.flush_age
+
+    def flush(self, feature_group, insert_rows=INSERT_ROWS):
+        """Insert all pending rows in batches of insert_rows, returns the number of rows inserted."""
+        pending_df = self.pending()
+        if pending_df.empty:
+            return 0
+
+        for batch_start in range(0, len(pending_df), insert_rows):
+            batch_df = pending_df.iloc[batch_start : batch_start + insert_rows]
+            LOGGER.info(
+                f"Inserting {len(batch_df)} rows ({batch_df[self.event_time].iloc[0]} - "
+                f"{batch_df[self.event_time].iloc[-1]}) to '{feature_group.name}'..."
+            )
+            insert_with_retry(feature_group, batch_df)
+
+        self._save_state(pending_df[self.event_time].max())
+        # Replaced, not truncated - a crash leaves either the whole log or an empty one
+        empty_path = f"{self.wal_path}.tmp"
+        open(empty_path, "w").close()
+        os.replace(empty_path, self.wal_path)
+        return len(pending_df)
+
+    def _read_entries(self):
+        if not os.path.exists(self.wal_path):
+            return []
+
+        entries = []
+        with open(self.wal_path) as wal_file:
+            for line_number, line in enumerate(wal_file, start=1):
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Only the last line can be torn (crash during append) - that append never returned
+                    LOGGER.warning(f"Skipping unreadable line {line_number} of '{self.wal_path}'")
+        return entries
+
+    def _save_state(self, flushed_until):
+        previous_flushed_until = self.flushed_until
+        # Backfill of older rows doesn't move the watermark back
+        if previous_flushed_until is not None and previous_flushed_until > flushed_until:
+            return
+
+        state_path = f"{self.state_path}.tmp"
+        with open(state_path, "w") as state_file:
+            json.dump({"flushed_until": flushed_until.isoformat()}, state_file)
+        os.replace(state_path, self.state_path)
+
+
+def insert_with_retry(feature_group, dataframe, attempts=INSERT_ATTEMPTS, retry_delay_seconds=RETRY_DELAY_SECONDS):
+    # Exponential backoff - feature store errors are mostly transient (job queue, connection)
+    for attempt in range(1, attempts + 1):
+        try:
+            return feature_group.insert(dataframe)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay_seconds = retry_delay_seconds * 2 ** (attempt - 1)
+            LOGGER.warning(f"Insert to '{feature_group.name}' failed ({e}), retrying in {delay_seconds}s...")
+            time.sleep(delay_seconds)
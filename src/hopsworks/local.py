@@ -0,0 +1,109 @@
+import os
+import pandas as pd
+
+
+class LocalFeatureGroup:
+    """Offline stand-in for a Hopsworks feature group.
+
+    Supports the subset of the API used by this project - `select(...).filter(...).read()`,
+    feature comparisons like `fg.event_timestamp > value` and `insert`.
+    Rows are kept in memory and optionally persisted to a Parquet file.
+    """
+
+    def __init__(self, name, version=1, primary_key=None, event_time=None, path=None, dataframe=None):
+        self.name = name
+        self.version = version
+        self.primary_key = primary_key or []
+        self.event_time = event_time
+        self.path = path
+
+        if dataframe is not None:
+            self._df = dataframe.reset_index(drop=True)
+        elif path and os.path.exists(path):
+            self._df = pd.read_parquet(path)
+        else:
+            self._df = pd.DataFrame()
+
+    def __getattr__(self, name):
+        # Same as hsfs - features are accessible as attributes to build filters
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return LocalFeature(name)
+
+    def select(self, features):
+        return LocalQuery(self, features)
+
+    def select_all(self):
+        return LocalQuery(self, list(self._df.columns))
+
+    def read(self):
+        return self.select_all().read()
+
+    def insert(self, dataframe: pd.DataFrame):
+        dataframe = pd.concat([self._df, dataframe], ignore_index=True)
+        # Upsert on primary key - same as offline feature store
+        if self.primary_key:
+            dataframe = dataframe.drop_duplicates(self.primary_key, keep="last")
+        self._df = dataframe.reset_index(drop=True)
+
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._df.to_parquet(self.path, index=False)
+
+
+class LocalFeature:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __gt__(self, value):
+        return lambda dataframe: dataframe[self.name] > value
+
+    def __ge__(self, value):
+        return lambda dataframe: dataframe[self.name] >= value
+
+    def __lt__(self, value):
+        return lambda dataframe: dataframe[self.name] < value
+
+    def __le__(self, value):
+        return lambda dataframe: dataframe[self.name] <= value
+
+
+class LocalQuery:
+
+    def __init__(self, feature_group, features, filters=None):
+        self.feature_group = feature_group
+        self.features = features
+        self.filters = filters or []
+
+    def filter(self, condition):
+        return LocalQuery(self.feature_group, self.features, self.filters + [condition])
+
+    def read(self):
+        dataframe = self.feature_group._df
+        if dataframe.empty:
+            return pd.DataFrame(columns=self.features)
+
+        for condition in self.filters:
+            dataframe = dataframe[condition(dataframe)]
+        return dataframe[self.features].reset_index(drop=True)
+
+
+class LocalFeatureStore:
+    """Offline stand-in for a Hopsworks feature store - feature groups are Parquet files in one directory."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_or_create_feature_group(self, name, version=1, primary_key=None, event_time=None, **kwargs):
+        # Schema (features, description, ...) is taken from inserted rows
+        return LocalFeatureGroup(
+            name,
+            version,
+            primary_key=primary_key,
+            event_time=event_time,
+            path=self._feature_group_path(name, version),
+        )
+
+    def _feature_group_path(self, name, version):
+        return os.path.join(self.path, f"{name}_v{version}.parquet")
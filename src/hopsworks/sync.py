@@ -0,0 +1,108 @@
+import os
+import json
+import logging
+import pandas as pd
+
+from src.common import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Rows can land with older event times (late materialization, corrected readings) - every sync
+# reads this far back before the watermark again
+SYNC_LOOKBACK = pd.Timedelta(days=7)
+
+
+def read_since(feature_group, features, since=None, event_time="event_timestamp"):
+    """Read rows with event time at or after `since` - filter is pushed down to the feature store."""
+    query = feature_group.select(features)
+    if since is not None:
+        query = query.filter(getattr(feature_group, event_time) >= since)
+    return query.read()
+
+
+def local_copy_path(cache_dir, feature_group, version=1):
+    return os.path.join(cache_dir, f"{feature_group}_v{version}.parquet")
+
+
+def watermark_path(local_path):
+    return f"{os.path.splitext(local_path)[0]}.watermark.json"
+
+
+def invalidate_local_copy(local_path):
+    """Next sync of the copy reads the whole feature group - e.g. after rows older than its watermark were inserted."""
+    if os.path.exists(watermark_path(local_path)):
+        os.remove(watermark_path(local_path))
+
+
+class FeatureGroupSync:
+    """Locally persisted copy of a feature group, synced incrementally by event time.
+
+    High-water mark (latest event time) is stored next to the Parquet copy. Each sync reads
+    only rows from `lookback` before the watermark on and merges them in, deduplicated on
+    event time (rows read again replace local ones). Rows older than that (backfills) are
+    synced after `invalidate_local_copy` or a full resync.
+    """
+
+    def __init__(self, feature_group, features, local_path, event_time="event_timestamp", lookback=SYNC_LOOKBACK):
+        self.feature_group = feature_group
+        self.features = features
+        self.local_path = local_path
+        self.watermark_path = watermark_path(local_path)
+        self.event_time = event_time
+        self.lookback = lookback
+
+    @property
+    def watermark(self):
+        if not os.path.exists(self.watermark_path):
+            return None
+        with open(self.watermark_path) as watermark_file:
+            return pd.Timestamp(json.load(watermark_file)["watermark"])
+
+    def sync(self, full_resync=False) -> pd.DataFrame:
+        local_df = None if full_resync else self._load_local_copy()
+        watermark = None if local_df is None else self.watermark
+
+        # Rows at the watermark are read again too - more rows might share the same event time
+        since = None if watermark is None else watermark - self.lookback
+        new_df = read_since(self.feature_group, self.features, since, self.event_time)
+        LOGGER.info(
+            f"Read {len(new_df)} rows from '{self.feature_group.name}' since {since or 'beginning'}"
+        )
+
+        if local_df is None:
+            merged_df = new_df
+        elif new_df.empty:
+            return local_df
+        else:
+            merged_df = pd.concat([local_df, new_df], ignore_index=True)
+
+        merged_df = (
+            merged_df.drop_duplicates(self.event_time, keep="last")
+            .sort_values(self.event_time)
+            .reset_index(drop=True)
+        )
+        self._save_local_copy(merged_df)
+        return merged_df
+
+    def _load_local_copy(self):
+        if not (os.path.exists(self.local_path) and os.path.exists(self.watermark_path)):
+            return None
+
+        local_df = pd.read_parquet(self.local_path)
+        if list(local_df.columns) != list(self.features):
+            LOGGER.warning(f"Schema of '{self.local_path}' changed - doing full resync")
+            return None
+        return local_df
+
+    def _save_local_copy(self, dataframe):
+        if dataframe.empty:
+            return
+
+        os.makedirs(os.path.dirname(self.local_path) or ".", exist_ok=True)
+        dataframe.to_parquet(self.local_path, index=False)
+        # Watermark is written last - if writing data fails, next sync starts over
+        with open(self.watermark_path, "w") as watermark_file:
+            json.dump(
+                {"watermark": dataframe[self.event_time].max().isoformat(), "rows": len(dataframe)},
+                watermark_file,
+            )
@@ -0,0 +1,223 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+from src.common import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Spans are appended to this JSON lines file and aggregated to this Prometheus textfile (both optional)
+SPANS_PATH_ENV = "AQI_SPANS_PATH"
+PROMETHEUS_TEXTFILE_ENV = "AQI_PROMETHEUS_TEXTFILE"
+# Long running processes (serving) rewrite the textfile at most this often
+PROMETHEUS_INTERVAL_SECONDS = 15
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One measured stage - wall time, CPU time of the process and its peak RSS, plus attributes like sizes.
+
+    Peak RSS is the high-water mark of the process, `peak_rss_growth_mb` shows how much this stage raised it.
+    CPU time includes all threads of the process (XGBoost, concurrent requests).
+    """
+
+    def __init__(self, recorder, name, attributes):
+        self.recorder = recorder
+        self.parent = _current_span.get()
+        self.name = name if self.parent is None else f"{self.parent.name}/{name}"
+        self.attributes = {}
+        self.set(**attributes)
+
+    def set(self, **attributes):
+        """Add attributes - frames and arrays are recorded by their size (rows, columns, bytes)."""
+        for key, value in attributes.items():
+            self.attributes.update(_size_attributes(key, value))
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish(exc_type)
+        return False
+
+    def start(self):
+        """Same as entering the span - for stages that don't fit in one block (e.g. whole script)."""
+        self._token = _current_span.set(self)
+        self._peak_rss_at_start = _peak_rss()
+        self._cpu_started_at = time.process_time()
+        self._started_at = time.perf_counter()
+        return self
+
+    def finish(self, exc_type=None):
+        wall_seconds = time.perf_counter() - self._started_at
+        cpu_seconds = time.process_time() - self._cpu_started_at
+        peak_rss = _peak_rss()
+        _current_span.reset(self._token)
+
+        record = {
+            "span": self.name,
+            "started_at": round(time.time() - wall_seconds, 3),
+            "wall_seconds": round(wall_seconds, 6),
+            "cpu_seconds": round(cpu_seconds, 6),
+            "peak_rss_mb": round(peak_rss / 2**20, 1),
+            "peak_rss_growth_mb": round((peak_rss - self._peak_rss_at_start) / 2**20, 1),
+            **self.attributes,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.recorder.record(record)
+
+
+class SpanRecorder:
+    """
+    Exports finished spans as JSON lines and as Prometheus metrics (textfile collector format).
+
+    Every span is one short append to the JSON lines file. Prometheus metrics are totals per span
+    name (count, errors, wall and CPU seconds) and the latest peak RSS, rewritten atomically.
+    Without any path spans are only logged at debug level.
+    """
+
+    def __init__(self, spans_path=None, prometheus_path=None, prometheus_interval=PROMETHEUS_INTERVAL_SECONDS):
+        self.spans_path = spans_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+
+        self._lock = threading.Lock()
+        self._spans_file = None
+        # Span name -> totals exported to Prometheus
+        self._totals = {}
+        self._prometheus_written_at = None
+        if prometheus_path:
+            # Totals since the last write are not lost when the process exits
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get(SPANS_PATH_ENV) or None, os.environ.get(PROMETHEUS_TEXTFILE_ENV) or None)
+
+    def span(self, name, **attributes):
+        return Span(self, name, attributes)
+
+    def record(self, record):
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(f"Span {record}")
+        with self._lock:
+            if self.spans_path:
+                if self._spans_file is None:
+                    os.makedirs(os.path.dirname(self.spans_path) or ".", exist_ok=True)
+                    self._spans_file = open(self.spans_path, "a")
+                self._spans_file.write(json.dumps(record, default=str) + "\n")
+                self._spans_file.flush()
+
+            if self.prometheus_path:
+                totals = self._totals.setdefault(record["span"], {"count": 0, "errors": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+                totals["count"] += 1
+                totals["errors"] += "error" in record
+                totals["wall_seconds"] += record["wall_seconds"]
+                totals["cpu_seconds"] += record["cpu_seconds"]
+                totals["peak_rss_mb"] = record["peak_rss_mb"]
+                now = time.monotonic()
+                if self._prometheus_written_at is None or now - self._prometheus_written_at >= self.prometheus_interval:
+                    self._write_prometheus()
+                    self._prometheus_written_at = now
+
+    def flush(self):
+        """Write Prometheus metrics of all spans so far - done at exit as well."""
+        with self._lock:
+            if self.prometheus_path and self._totals:
+                self._write_prometheus()
+            if self._spans_file is not None:
+                self._spans_file.flush()
+
+    def _write_prometheus(self):
+        metrics = [
+            ("aqi_span_count_total", "counter", "Finished spans", "count"),
+            ("aqi_span_errors_total", "counter", "Spans that raised an exception", "errors"),
+            ("aqi_span_wall_seconds_total", "counter", "Wall time spent in spans", "wall_seconds"),
+            ("aqi_span_cpu_seconds_total", "counter", "CPU time of the process spent in spans", "cpu_seconds"),
+            ("aqi_span_peak_rss_bytes", "gauge", "Peak RSS of the process at the end of the latest span", "peak_rss_mb"),
+        ]
+        lines = []
+        for metric, metric_type, description, key in metrics:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {metric_type}"]
+            for name, totals in sorted(self._totals.items()):
+                value = round(totals[key] * 2**20) if key == "peak_rss_mb" else round(totals[key], 6)
+                lines.append(f'{metric}{{span="{name}"}} {value}')
+
+        # Collector must never read a half written file
+        os.makedirs(os.path.dirname(self.prometheus_path) or ".", exist_ok=True)
+        temporary_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as prometheus_file:
+            prometheus_file.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, self.prometheus_path)
+
+
+_recorder = None
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        _recorder = SpanRecorder.from_environment()
+    return _recorder
+
+
+def configure(spans_path=None, prometheus_path=None):
+    """Replace the process wide recorder - paths not given are taken from environment."""
+    global _recorder
+    _recorder = SpanRecorder(
+        spans_path or os.environ.get(SPANS_PATH_ENV) or None,
+        prometheus_path or os.environ.get(PROMETHEUS_TEXTFILE_ENV) or None,
+    )
+    return _recorder
+
+
+def span(name, **attributes):
+    """
+    Measure the enclosed stage, e.g. `with span("fit", rows=len(X)) as stage: ...; stage.set(outputs=y)`.
+
+    Spans opened inside it (also in called functions) are named "<outer>/<inner>".
+    """
+    return get_recorder().span(name, **attributes)
+
+
+def timed(name=None):
+    """Decorator - every call of the function is one span (named after the function by default)."""
+
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def _size_attributes(key, value):
+    # Frames and arrays are described by their size, not their content
+    if hasattr(value, "memory_usage") and hasattr(value, "shape"):
+        return {f"{key}_rows": value.shape[0], f"{key}_columns": value.shape[1] if value.ndim > 1 else 1,
+                f"{key}_bytes": int(value.memory_usage(index=True).sum())}
+    if hasattr(value, "nbytes") and hasattr(value, "shape"):
+        return {f"{key}_shape": list(value.shape), f"{key}_bytes": int(value.nbytes)}
+    return {key: value}
@@ -0,0 +1,171 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+from src.common import LOGGER_NAME, DAILY
+from src.data.features import FeatureScaler, dataset_windows
+from src.data.store import write_shared_frame, read_shared_frame
+from src.model import xgboost
+from src.model.training import evaluate_model
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+EXPANDING = "expanding"
+SLIDING = "sliding"
+
+# Set once per worker process by _init_worker
+_WORKER = {}
+
+
+def rolling_origin_folds(num_rows, num_folds, test_size, mode=EXPANDING, train_size=None, min_train_size=1):
+    """
+    Row positions of rolling-origin folds as dicts with train_start, test_start and test_end.
+
+    Test periods are consecutive blocks of test_size rows at the end of data. Each fold trains on rows
+    before its test period - all of them (expanding) or last train_size rows (sliding).
+    """
+    if mode not in (EXPANDING, SLIDING):
+        raise ValueError(f"Unknown fold mode '{mode}', expected '{EXPANDING}' or '{SLIDING}'")
+    if mode == SLIDING and not train_size:
+        raise ValueError("Sliding folds require train_size")
+
+    folds = []
+    for fold in range(num_folds):
+        test_start = num_rows - (num_folds - fold) * test_size
+        train_start = 0 if mode == EXPANDING else test_start - train_size
+        if train_start < 0 or test_start - train_start < min_train_size:
+            raise ValueError(
+                f"Not enough data for {num_folds} folds of {test_size} rows - fold {fold} would train on "
+                f"{max(test_start - max(train_start, 0), 0)} rows"
+            )
+        folds.append({"fold": fold, "train_start": train_start, "test_start": test_start, "test_end": test_start + test_size})
+
+    return folds
+
+
+def _init_worker(frame_path, scaler_path, config):
+    scaled_df = read_shared_frame(frame_path)
+
+    _WORKER["config"] = config
+    _WORKER["scaled_df"] = scaled_df
+    _WORKER["feature_scaler"] = joblib.load(scaler_path)
+    # Windows of whole history are built once - fold training sets are just row ranges of these views
+    _WORKER["X_flat"], _WORKER["y_flat"] = dataset_windows(
+        scaled_df, config["historical_window_size"], config["prediction_window_size"], scaled_df.columns
+    )
+
+
+def _run_fold(fold):
+    config = _WORKER["config"]
+    scaled_df = _WORKER["scaled_df"]
+    historical_window_size = config["historical_window_size"]
+    prediction_window_size = config["prediction_window_size"]
+
+    # Window starting at row i uses rows up to i + historical + prediction size - all of them have to be before test period
+    last_window = fold["test_start"] - historical_window_size - prediction_window_size + 1
+    X_flat_train = _WORKER["X_flat"][fold["train_start"] : last_window]
+    y_flat_train = _WORKER["y_flat"][fold["train_start"] : last_window]
+
+    model = xgboost.create_regressor(config["backend"], n_jobs=config["threads"], **config["model_params"])
+    fit_started_at = time.perf_counter()
+    model.fit(X_flat_train, y_flat_train)
+    fit_seconds = time.perf_counter() - fit_started_at
+
+    # First forecast origin is the first test row - it needs preceding rows as input
+    test_df = scaled_df.iloc[fold["test_start"] - historical_window_size : fold["test_end"]]
+    metrics = evaluate_model(
+        model,
+        test_df,
+        _WORKER["feature_scaler"],
+        historical_window_size,
+        prediction_window_size,
+        config["num_of_predictions"],
+        freq=config["freq"],
+    )
+
+    return {
+        **fold,
+        "train_from": str(scaled_df.index[fold["train_start"]]),
+        "test_from": str(scaled_df.index[fold["test_start"]]),
+        "test_to": str(scaled_df.index[fold["test_end"] - 1]),
+        "fit_seconds": round(fit_seconds, 3),
+        "metrics": metrics,
+    }
+
+
+def run_backtest(
+    merged_df,
+    historical_window_size,
+    prediction_window_size,
+    num_of_predictions,
+    num_folds=5,
+    test_size=None,
+    mode=EXPANDING,
+    train_size=None,
+    freq=DAILY,
+    backend="per_target",
+    model_params=None,
+    workers=None,
+    n_jobs=None,
+):
+    """
+    Fit and evaluate a model for every rolling-origin fold, folds run in parallel worker processes.
+
+    Scaler is fitted on training rows of the first fold - they precede every test period, so no fold
+    sees its future, and all folds share one scaled copy of the data (mapped by workers, not copied).
+    Returns one result per fold with its rows, dates and metrics (see evaluate_iaqi_predictions).
+    """
+    horizon = prediction_window_size * num_of_predictions
+    # By default folds together take last 30% of data
+    test_size = test_size or max(len(merged_df) * 3 // (10 * num_folds), horizon)
+    if test_size < horizon:
+        raise ValueError(f"Test period of {test_size} rows is shorter than forecast horizon ({horizon})")
+    folds = rolling_origin_folds(
+        len(merged_df),
+        num_folds,
+        test_size,
+        mode,
+        train_size,
+        min_train_size=historical_window_size + prediction_window_size,
+    )
+
+    first_fold = folds[0]
+    feature_scaler = FeatureScaler()
+    feature_scaler.fit(merged_df.iloc[first_fold["train_start"] : first_fold["test_start"]])
+    scaled_df = feature_scaler.transform(merged_df.copy())
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    workers = min(workers or n_jobs, n_jobs, len(folds))
+    config = {
+        "historical_window_size": historical_window_size,
+        "prediction_window_size": prediction_window_size,
+        "num_of_predictions": num_of_predictions,
+        "freq": freq,
+        "backend": backend,
+        "model_params": model_params or {},
+        "threads": max(1, n_jobs // workers),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="aqi_backtest_") as backtest_dir:
+        frame_path = os.path.join(backtest_dir, "features")
+        scaler_path = os.path.join(backtest_dir, "feature_scaler.bin")
+        write_shared_frame(scaled_df, frame_path)
+        joblib.dump(feature_scaler, scaler_path)
+
+        LOGGER.info(f"Backtesting {len(folds)} {mode} folds of {test_size} rows with {workers} workers...")
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(frame_path, scaler_path, config),
+        ) as executor:
+            # Longest (latest) folds first - keeps workers busy until the end
+            results = list(executor.map(_run_fold, reversed(folds)))
+
+    return sorted(results, key=lambda result: result["fold"])
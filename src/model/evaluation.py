@@ -1,87 +1,130 @@
 import pandas as pd
 import numpy as np
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from scipy.stats import pearsonr, spearmanr
+from scipy.stats import rankdata
 import logging
+import warnings
 
 from src.common import LOGGER_NAME, IAQI_FEATURES
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
+# All metrics reduce along `axis` - axis=0 scores every (day, iaqi) pair of stacked
+# (origins x days x iaqi) arrays at once, default scores a single pair of 1D arrays.
+
+
 # Index of Agreement (Willmott) - combines correlation and bias
-def index_of_agreement(y_true, y_pred):
-    mean_obs = np.mean(y_true)
-    numerator = np.sum((y_pred - y_true) ** 2)
-    denominator = np.sum((np.abs(y_pred - mean_obs) + np.abs(y_true - mean_obs)) ** 2)
+def index_of_agreement(y_true, y_pred, axis=None):
+    mean_obs = np.mean(y_true, axis=axis, keepdims=True)
+    numerator = np.sum((y_pred - y_true) ** 2, axis=axis)
+    denominator = np.sum(
+        (np.abs(y_pred - mean_obs) + np.abs(y_true - mean_obs)) ** 2, axis=axis
+    )
     return 1 - (numerator / denominator)
 
 
-def pearson_value(y_true, y_pred):
-    return pearsonr(y_true, y_pred)[0]
+def pearson_value(y_true, y_pred, axis=None):
+    true_centered = y_true - np.mean(y_true, axis=axis, keepdims=True)
+    pred_centered = y_pred - np.mean(y_pred, axis=axis, keepdims=True)
+    correlation = np.sum(true_centered * pred_centered, axis=axis) / np.sqrt(
+        np.sum(true_centered**2, axis=axis) * np.sum(pred_centered**2, axis=axis)
+    )
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def spearman_value(y_true, y_pred, axis=None):
+    # Spearman is Pearson over ranks (ties get average rank)
+    axis_or_flat = 0 if axis is None else axis
+    return pearson_value(
+        rankdata(y_true, axis=axis_or_flat),
+        rankdata(y_pred, axis=axis_or_flat),
+        axis=axis,
+    )
 
 
-def spearman_value(y_true, y_pred):
-    return spearmanr(y_true, y_pred)[0]
+def r2_score(y_true, y_pred, axis=None):
+    residual_sum = np.sum((y_true - y_pred) ** 2, axis=axis)
+    total_sum = np.sum(
+        (y_true - np.mean(y_true, axis=axis, keepdims=True)) ** 2, axis=axis
+    )
+    score = 1 - residual_sum / total_sum
+    # Same as scikit-learn - constant targets score 1 for perfect predictions, otherwise 0
+    return np.where(
+        total_sum == 0, np.where(residual_sum == 0, 1.0, 0.0), score
+    )[()]
 
 
 # Mean Bias Error
-def mean_bias_error(y_true, y_pred):
-    return np.mean(np.array(y_true) - np.array(y_pred))
+def mean_bias_error(y_true, y_pred, axis=None):
+    return np.mean(np.array(y_true) - np.array(y_pred), axis=axis)
 
 
-# Mean Absolute Bias Error
-def mean_abs_bias_error(y_true, y_pred):
-    return np.mean(np.abs(np.array(y_true) - np.array(y_pred)))
+# Mean Absolute Bias Error (same as Mean Absolute Error)
+def mean_abs_bias_error(y_true, y_pred, axis=None):
+    return np.mean(np.abs(np.array(y_true) - np.array(y_pred)), axis=axis)
 
 
 # Normalized Mean Bias Error
-def norm_mean_bias_error(y_true, y_pred):
-    return mean_bias_error(y_true, y_pred) / np.mean(np.array(y_true)) * 100
+def norm_mean_bias_error(y_true, y_pred, axis=None):
+    return (
+        mean_bias_error(y_true, y_pred, axis=axis)
+        / np.mean(np.array(y_true), axis=axis)
+        * 100
+    )
 
 
 # Mean Absolute Percentage Error (be careful with near-zero values)
-def mape(y_true, y_pred, epsilon=1e-8):
-    return np.mean(np.abs((y_true - y_pred) / (y_true + epsilon))) * 100
+def mape(y_true, y_pred, epsilon=1e-8, axis=None):
+    return np.mean(np.abs((y_true - y_pred) / (y_true + epsilon)), axis=axis) * 100
 
 
 # Symmetric Mean Absolute Percentage Error (better for values near zero)
-def smape(y_true, y_pred):
+def smape(y_true, y_pred, axis=None):
     return 100 * np.mean(
-        np.abs(y_pred - y_true) / ((np.abs(y_true) + np.abs(y_pred)) / 2)
+        np.abs(y_pred - y_true) / ((np.abs(y_true) + np.abs(y_pred)) / 2), axis=axis
     )
 
 
 # RMSE
-def rmse(y_true, y_pred):
-    return np.sqrt(mean_squared_error(y_true, y_pred))
+def rmse(y_true, y_pred, axis=None):
+    return np.sqrt(np.mean((y_true - y_pred) ** 2, axis=axis))
 
 
 # Normalized RMSE
-def nrmse(y_true, y_pred):
-    return rmse(y_true, y_pred) / (np.max(y_true) - np.min(y_true))
+def nrmse(y_true, y_pred, axis=None):
+    return rmse(y_true, y_pred, axis=axis) / (
+        np.max(y_true, axis=axis) - np.min(y_true, axis=axis)
+    )
 
 
 # Fractional Bias (common in air quality modeling)
-def fractional_bias(y_true, y_pred):
-    return 2 * np.mean(y_pred - y_true) / (np.mean(y_pred) + np.mean(y_true))
+def fractional_bias(y_true, y_pred, axis=None):
+    return (
+        2
+        * np.mean(y_pred - y_true, axis=axis)
+        / (np.mean(y_pred, axis=axis) + np.mean(y_true, axis=axis))
+    )
 
 
 # Fractional Gross Error
-def fractional_gross_error(y_true, y_pred):
-    return 2 * np.mean(np.abs(y_pred - y_true)) / (np.mean(y_pred) + np.mean(y_true))
+def fractional_gross_error(y_true, y_pred, axis=None):
+    return (
+        2
+        * np.mean(np.abs(y_pred - y_true), axis=axis)
+        / (np.mean(y_pred, axis=axis) + np.mean(y_true, axis=axis))
+    )
 
 
 # Factor of 2 (FAC2) - fraction of predictions within factor of 2
-def factor_of_2(y_true, y_pred, epsilon=1e-8):
+def factor_of_2(y_true, y_pred, epsilon=1e-8, axis=None):
     ratio = y_pred / (y_true + epsilon)
-    return np.mean((ratio >= 0.5) & (ratio <= 2.0)) * 100
+    return np.mean((ratio >= 0.5) & (ratio <= 2.0), axis=axis) * 100
 
 
 METRIC_FUNCTIONS = {
     "RMSE": rmse,
     "NRMSE": nrmse,
-    "MAE": mean_absolute_error,
+    "MAE": mean_abs_bias_error,
     "R2": r2_score,
     "Pearson": pearson_value,
     "Spearman": spearman_value,
@@ -96,37 +139,41 @@ METRIC_FUNCTIONS = {
 
 
 def evaluate_iaqi_predictions(y_true, y_pred, prediction_window_size, num_of_predictions):
-    split_data = _split_by_iaqi(
-        y_true, y_pred, prediction_window_size, num_of_predictions
-    )
+    y_true = _stack_iaqi(y_true, prediction_window_size * num_of_predictions)
+    y_pred = _stack_iaqi(y_pred, prediction_window_size * num_of_predictions)
 
-    return {
-        metric_name: {
-            iaqi: [
-                # 4 decimal points is enough for comparison
-                round(metric_function(y_true_day, y_pred_day), 4)
-                for y_true_day, y_pred_day in zip(y_true_by_day, y_pred_by_day)
-            ]
-            for iaqi, (y_true_by_day, y_pred_by_day) in split_data.items()
-        }
-        for metric_name, metric_function in METRIC_FUNCTIONS.items()
-    }
+    return evaluate_iaqi_arrays(y_true, y_pred)
 
 
-def _split_by_iaqi(y_true, y_pred, prediction_window_size, num_of_predictions):
-    return {
-        iaqi_feature: (
-            [
-                np.array([true_value[iaqi_feature].iloc[day] for true_value in y_true])
-                for day in range(prediction_window_size * num_of_predictions)
-            ],
-            [
-                np.array([prediction[iaqi_feature].iloc[day] for prediction in y_pred])
-                for day in range(prediction_window_size * num_of_predictions)
-            ],
-        )
-        for iaqi_feature in IAQI_FEATURES
-    }
+def evaluate_iaqi_arrays(y_true, y_pred):
+    """Score stacked (origins x days x iaqi) arrays, IAQI columns ordered as IAQI_FEATURES.
+
+    Every metric is computed for all (day, iaqi) pairs at once along the origin axis.
+    """
+    # Metrics are accumulated in float64 whatever the feature dtype
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    metrics = {}
+    # Constant or zero series give NaN/inf same as the scalar metrics would
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for metric_name, metric_function in METRIC_FUNCTIONS.items():
+            # 4 decimal points is enough for comparison
+            values = np.round(metric_function(y_true, y_pred, axis=0), 4)
+            metrics[metric_name] = {
+                iaqi: values[:, column_index].tolist()
+                for column_index, iaqi in enumerate(IAQI_FEATURES)
+            }
+
+    return metrics
+
+
+def _stack_iaqi(windows, num_of_days):
+    if isinstance(windows, np.ndarray):
+        return windows[:, :num_of_days]
+
+    return np.stack(
+        [window[IAQI_FEATURES].to_numpy()[:num_of_days] for window in windows]
+    )
 
 
 def create_metrics_dataframe(prediction_metrics):
@@ -160,4 +207,30 @@ def get_day_n_metrics(all_day_metrics_result, day_number):
             for iaqi, values in iaqi_data.items()
         }
         for metric_name, iaqi_data in all_day_metrics_result.items()
-    }
\ No newline at end of file
+    }
+
+def aggregate_fold_metrics(fold_metrics):
+    """Mean, std, min and max of every metric over folds - same layout as create_metrics_dataframe plus Statistic level."""
+    data = []
+    for metric_name, iaqi_data in fold_metrics[0].items():
+        for iaqi in iaqi_data:
+            values = np.array(
+                [[np.nan if value is None else value for value in metrics[metric_name][iaqi]] for metrics in fold_metrics],
+                dtype=float,
+            )
+            # Undefined metric in some folds (e.g. constant series) shouldn't hide others
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                statistics = {
+                    "mean": np.nanmean(values, axis=0),
+                    "std": np.nanstd(values, axis=0),
+                    "min": np.nanmin(values, axis=0),
+                    "max": np.nanmax(values, axis=0),
+                }
+            for statistic, day_values in statistics.items():
+                row = {"Metric": metric_name, "IAQI_Feature": iaqi, "Statistic": statistic}
+                for day, value in enumerate(day_values, 1):
+                    row[f"Day_{day}"] = round(float(value), 4)
+                data.append(row)
+
+    return pd.DataFrame(data).set_index(["Metric", "IAQI_Feature", "Statistic"])
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ForecastCache:
+    """
+    Forecast results by key, kept for ttl_seconds - at most max_entries of them, least recently used are dropped.
+
+    Keys have to change whenever the forecast would (model version, data watermarks, request).
+    Concurrent requests of the same missing key are coalesced - the first one computes it and
+    the others wait for its result, so a burst of identical requests costs one computation.
+    Results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # Key -> (stored at, result), ordered from least to most recently used
+        self._entries = OrderedDict()
+        # Key -> Future of the computation in progress
+        self._in_flight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                self.stats["misses"] += 1
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not is_owner:
+            # Raises the exception of the computation too
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (self.clock(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
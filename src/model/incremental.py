@@ -0,0 +1,137 @@
+import copy
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+from sklearn.multioutput import MultiOutputRegressor
+
+from src.common import LOGGER_NAME, IAQI_FEATURES
+from src.data.features import dataset_windows
+from src.model.evaluation import get_day_n_metrics
+from src.model.training import split_data, evaluate_model
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Trees added to every booster by one update - small, so that a week of data nudges the model instead of replacing it
+INCREMENTAL_ESTIMATORS = 20
+# Periodic full retraining re-balances trees and refits the scaler
+MAX_INCREMENTAL_UPDATES = 8
+# Previous model scoring this much worse (mean last-day Willmott) than when it was registered means data changed
+DRIFT_TOLERANCE = 0.1
+# New rows of a feature averaging this many training standard deviations away from training mean
+DRIFT_Z = 3.0
+
+# Config values that have to match - model inputs and outputs depend on them
+SCHEMA_KEYS = ["columns", "freq", "historical_window_size", "prediction_window_size", "num_of_predictions", "backend", "model_params"]
+
+
+class FullRetrainRequired(Exception):
+    pass
+
+
+def update_model(model, feature_scaler, previous_config, registered_metrics, merged_df, model_config):
+    """
+    Continue boosting of previously trained model with rows that arrived after it was trained.
+
+    Validation uses the same test split (last rows) as full training, so scores stay comparable.
+    Returns (model, scaled test frame, prediction metrics, model config), None when there is nothing new to learn.
+    Raises FullRetrainRequired when schema changed, data drifted or update didn't help.
+    """
+    changed_keys = [key for key in SCHEMA_KEYS if previous_config.get(key) != model_config.get(key)]
+    if changed_keys:
+        raise FullRetrainRequired(f"model schema changed: {changed_keys}")
+    if "trained_until" not in previous_config:
+        raise FullRetrainRequired("previous model doesn't record its training data")
+    incremental_updates = previous_config.get("incremental_updates", 0)
+    if incremental_updates >= MAX_INCREMENTAL_UPDATES:
+        raise FullRetrainRequired(f"{incremental_updates} incremental updates since last full training")
+
+    historical_window_size = model_config["historical_window_size"]
+    prediction_window_size = model_config["prediction_window_size"]
+    num_of_predictions = model_config["num_of_predictions"]
+    horizon = prediction_window_size * num_of_predictions
+
+    # Scaler of the previous model has to be kept - its trees split on scaled values
+    _, _, test_df = split_data(merged_df)
+    test_start = len(merged_df) - len(test_df)
+    trained_until = pd.Timestamp(previous_config["trained_until"])
+    first_new_row = int(merged_df.index.searchsorted(trained_until, side="right"))
+    if first_new_row >= test_start:
+        return None
+
+    # Context rows before first new row - windows whose targets include new rows start there
+    window_size = historical_window_size + prediction_window_size
+    update_df = feature_scaler.transform(merged_df.iloc[max(first_new_row - window_size + 1, 0) : test_start].copy())
+    test_df = feature_scaler.transform(test_df.copy())
+
+    drifted_features = _drifted_features(update_df.iloc[-(test_start - first_new_row) :], feature_scaler)
+    if drifted_features:
+        raise FullRetrainRequired(f"features drifted: {drifted_features}")
+
+    previous_metrics = evaluate_model(model, test_df, feature_scaler, historical_window_size, prediction_window_size, num_of_predictions, freq=model_config["freq"])
+    previous_score = _mean_willmott(previous_metrics, horizon)
+    if previous_score is None:
+        raise FullRetrainRequired("previous model cannot be scored on fresh data")
+    registered_score = _mean_values(registered_metrics or {})
+    if registered_score is not None and previous_score < registered_score - DRIFT_TOLERANCE:
+        raise FullRetrainRequired(
+            f"previous model scores {previous_score:.3f} on fresh data, {registered_score:.3f} when registered"
+        )
+
+    X_flat_update, y_flat_update = dataset_windows(update_df, historical_window_size, prediction_window_size, update_df.columns)
+    if len(X_flat_update) == 0:
+        return None
+    LOGGER.info(f"Continuing boosting with {len(X_flat_update)} new windows...")
+    updated_model = continue_boosting(copy.deepcopy(model), X_flat_update, y_flat_update)
+
+    prediction_metrics = evaluate_model(updated_model, test_df, feature_scaler, historical_window_size, prediction_window_size, num_of_predictions, freq=model_config["freq"])
+    updated_score = _mean_willmott(prediction_metrics, horizon)
+    if updated_score is None:
+        raise FullRetrainRequired("updated model cannot be scored on fresh data")
+    LOGGER.info(f"Holdout Willmott {previous_score:.3f} before update, {updated_score:.3f} after")
+    if updated_score < previous_score:
+        raise FullRetrainRequired("update made holdout score worse")
+
+    model_config = {
+        **model_config,
+        "trained_until": str(merged_df.index[test_start - 1]),
+        "incremental_updates": incremental_updates + 1,
+    }
+    return updated_model, test_df, prediction_metrics, model_config
+
+
+def continue_boosting(model, X, y, n_estimators=INCREMENTAL_ESTIMATORS):
+    """Add n_estimators trees fitted on (X, y) to every booster of the model - existing trees stay unchanged."""
+    if isinstance(model, MultiOutputRegressor):
+        for column, estimator in enumerate(model.estimators_):
+            _continue_booster(estimator, X, y[:, column], n_estimators)
+    else:
+        _continue_booster(model, X, y, n_estimators)
+    return model
+
+
+def _continue_booster(estimator, X, y, n_estimators):
+    booster = estimator.get_booster()
+    # Only this fit adds n_estimators trees - later refits (or clones) train the configured number again
+    configured_estimators = estimator.get_params()["n_estimators"]
+    estimator.set_params(n_estimators=n_estimators)
+    try:
+        estimator.fit(X, y, xgb_model=booster)
+    finally:
+        estimator.set_params(n_estimators=configured_estimators)
+
+
+def _drifted_features(new_df, feature_scaler):
+    # New rows are already scaled with training mean and std
+    means = new_df[feature_scaler.numerical_features].mean()
+    return list(means[means.abs() > DRIFT_Z].index)
+
+
+def _mean_willmott(prediction_metrics, horizon):
+    return _mean_values(get_day_n_metrics(prediction_metrics, horizon)["Willmott"])
+
+
+def _mean_values(metrics):
+    values = [metrics[iaqi] for iaqi in IAQI_FEATURES if metrics.get(iaqi) is not None and not math.isnan(metrics[iaqi])]
+    return float(np.mean(values)) if values else None
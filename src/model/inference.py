@@ -1,55 +1,101 @@
+import importlib.util
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
 
-try:
-    import torch
-    HAS_TORCH = True
-except:
-    HAS_TORCH = False
+# torch is imported only when torch path is used - importing it is slow
+HAS_TORCH = importlib.util.find_spec("torch") is not None
 
-from src.data.features import _flatten_windows, _split_to_windows
+from src.common import DAILY
+from src.data.calendar import calendar_columns
+from src.data.features import Windows, _flatten_windows, _split_to_windows
 
 # TODO: support case of forecasting into the future (for real world predictions)
-def recursive_forecasting(model, input: DataFrame, historical_window_size, prediction_window_size, num_of_predictions, torch=False):
-    true_values = []
-    predictions = []
+def recursive_forecasting(model, input: DataFrame, historical_window_size, prediction_window_size, num_of_predictions, torch=False, freq=DAILY):
+    true_values, forecasts, future_dates = recursive_forecast_arrays(
+        model, input, historical_window_size, prediction_window_size, num_of_predictions, torch=torch, freq=freq
+    )
+
+    predictions = [
+        DataFrame(forecasts[origin], index=pd.DatetimeIndex(future_dates[origin]), columns=input.columns)
+        for origin in range(len(forecasts))
+    ]
+    true_values = [
+        DataFrame(true_values[origin], index=pd.DatetimeIndex(future_dates[origin]), columns=input.columns)
+        for origin in range(len(forecasts))
+    ]
+
+    return true_values, predictions
+
+def recursive_forecast_arrays(model, input: DataFrame, historical_window_size, prediction_window_size, num_of_predictions, torch=False, freq=DAILY):
+    """Same as recursive_forecasting - (origins x horizon x columns) true values and forecasts, (origins x horizon) dates."""
     # With recursive forecasting input and target need to have same columns
     target_columns = input.columns
     input_windows, _ = _split_to_windows(input, historical_window_size, prediction_window_size, target_columns)
-    for input_window in input_windows:
-        if (input_window.index.max() >= (input.index.max() - pd.Timedelta(days=prediction_window_size*num_of_predictions-1))):
-            # Prediction window doesn't take into account number of predictions - so we need to stop early
-            break
 
-        target_window = input.iloc[:0].copy()
-        for day_index in range(num_of_predictions):
-            # Model expects multiple windows
-            if HAS_TORCH and torch:
-                y_pred = torch_predict(model, [input_window])
-            else:
-                y_pred = predict(model, [input_window])
+    # Prediction window doesn't take into account number of predictions - so we need to stop early
+    step = pd.Timedelta(1, unit=freq)
+    last_allowed_date = input.index.max() - step*(prediction_window_size*num_of_predictions-1)
+    num_of_origins = int(np.searchsorted(input_windows.end_index, last_allowed_date, side="left"))
+
+    # Forecasted days of every origin follow the last day of its input window
+    last_input_dates = input.index.values[np.arange(num_of_origins) + historical_window_size - 1]
+    forecast_days = pd.to_timedelta(np.arange(1, prediction_window_size*num_of_predictions + 1), unit=freq).values
+    future_dates = last_input_dates[:, np.newaxis] + forecast_days
 
-            # Split y_pred into 3 arrays, one for each prediction day
-            y_pred_split = np.split(y_pred.flatten(), prediction_window_size)
+    target_positions = input.index.get_indexer(future_dates.ravel())
+    if (target_positions < 0).any():
+        raise KeyError(f"Forecasted dates missing in input: {future_dates.ravel()[target_positions < 0]}")
+    target_values = input.to_numpy()[target_positions].reshape(num_of_origins, future_dates.shape[1], len(target_columns))
 
-            # Create DataFrame for predictions, each row is a prediction day
-            predictions_df = pd.DataFrame(y_pred_split, columns=target_columns)
+    # Calendar of forecasted days is known - same as in the Predictor, so metrics describe the served model
+    known_positions = target_columns.get_indexer(calendar_columns(freq))
+    known_positions = known_positions[known_positions >= 0]
+    future_features = (known_positions, target_values[:, :, known_positions]) if len(known_positions) else None
 
-            # Set the index to continue from the last date in merged_df
-            last_date = input_window.index[-1]
-            future_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=prediction_window_size, freq="D")
-            predictions_df.index = future_dates
+    # All forecast origins are advanced together - one predict call per recursive step
+    forecasts = forecast_windows(
+        model, input_windows.values[:num_of_origins], prediction_window_size, num_of_predictions,
+        torch=torch, future_features=future_features,
+    )
 
-            # Add predictions to the end so that we can use them as input (don't forget to remove the same number of items as we added - model expects certain size)
-            input_window = pd.concat([input_window[prediction_window_size:], predictions_df], axis=0)
+    return target_values, forecasts, future_dates
 
-            target_window = pd.concat([target_window, input.loc[future_dates]], axis=0)
+def forecast_windows(model, input_windows, prediction_window_size, num_of_predictions, torch=False, future_features=None):
+    """Recursively forecast from a stack of (origins x historical_window_size x columns) windows.
 
-        predictions.append(input_window)
-        true_values.append(target_window)
+    `future_features` are columns known in advance (e.g. calendar) as a tuple of column positions
+    and (origins x prediction_window_size*num_of_predictions x known columns) values - they replace
+    predicted values before rows are used as input for the next step. NaN values are not known
+    (e.g. weather given for some origins only) - predicted values are kept there.
+    Returns (origins x prediction_window_size*num_of_predictions x columns) forecasted rows.
+    """
+    num_of_origins, _, num_of_columns = input_windows.shape
+    input_windows = np.array(input_windows)
+    forecasts = []
+    if num_of_origins == 0:
+        return np.empty((0, prediction_window_size*num_of_predictions, num_of_columns), dtype=input_windows.dtype)
 
-    return true_values, predictions
+    for day_index in range(num_of_predictions):
+        if HAS_TORCH and torch:
+            y_pred = torch_predict(model, input_windows)
+        else:
+            y_pred = predict(model, input_windows)
+
+        # Split y_pred into one row per prediction day
+        y_pred = y_pred.reshape(num_of_origins, prediction_window_size, num_of_columns).astype(input_windows.dtype)
+
+        if future_features is not None:
+            column_positions, future_values = future_features
+            step_values = future_values[:, day_index*prediction_window_size:(day_index + 1)*prediction_window_size]
+            y_pred[:, :, column_positions] = np.where(np.isnan(step_values), y_pred[:, :, column_positions], step_values)
+
+        # Add predictions to the end so that we can use them as input (don't forget to remove the same number of items as we added - model expects certain size)
+        input_windows = np.concatenate([input_windows[:, prediction_window_size:], y_pred], axis=1)
+        # Input window can be shorter than the horizon - keep predictions separately
+        forecasts.append(y_pred)
+
+    return np.concatenate(forecasts, axis=1)
 
 def predict(model, input_windows):
     X_flat = _flatten_windows(input_windows)
@@ -57,6 +103,8 @@ def predict(model, input_windows):
     return y_pred
 
 def torch_predict(model, input_windows):
+    import torch
+
     X_lstm_test = windows_to_tensor(input_windows)
 
     model.eval()
@@ -66,7 +114,9 @@ def torch_predict(model, input_windows):
     return y_pred
 
 def windows_to_tensor(windows):
-    tensor = torch.tensor(
-        np.stack([window.values for window in windows]), dtype=torch.float32
-    )
-    return tensor
\ No newline at end of file
+    import torch
+
+    # Accepts (windows x window_size x columns) array as well as Windows or list of DataFrames
+    values = windows.values if isinstance(windows, Windows) else np.asarray(windows)
+    tensor = torch.tensor(values, dtype=torch.float32)
+    return tensor
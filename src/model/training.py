@@ -1,3 +1,70 @@
+import logging
+
+import pandas as pd
+
+from src.common import LOGGER_NAME, DAILY, HOURLY, IAQI_FEATURES
+from src.data import aqi, meteo
+from src.data.calendar import add_calendar_features
+from src.data.features import FeatureScaler, split_to_windows, flatten_windows
+from src.instrumentation import span
+from src.model.evaluation import evaluate_iaqi_arrays
+from src.model.inference import recursive_forecast_arrays
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Window sizes are in units of the resolution (days or hours)
+RESOLUTIONS = {
+    "daily": {
+        "freq": DAILY,
+        "historical_window_size": 3,
+        "prediction_window_size": 3,
+        "num_of_predictions": 1,
+    },
+    # Day ahead in 4 recursive steps - keeps number of model outputs (and training time) reasonable
+    "hourly": {
+        "freq": HOURLY,
+        "historical_window_size": 24,
+        "prediction_window_size": 6,
+        "num_of_predictions": 4,
+    },
+}
+
+
+def merge_features(aqi_df, fetch_weather, freq=DAILY, dtype="float64"):
+    """
+    Clean loaded AQI data, add calendar features and merge them with weather - model features of train_model.py.
+
+    `fetch_weather(start_date, end_date)` returns raw weather rows of the periods between the dates.
+    """
+    with span("clean") as stage:
+        LOGGER.info("Cleaning missing dates...")
+        aqi_df = aqi.clean_missing_dates(aqi_df, freq=freq)
+
+        LOGGER.info("Cleaning missing values...")
+        aqi_df = aqi.clean_missing_values(aqi_df)
+        stage.set(aqi=aqi_df)
+
+    LOGGER.info("Adding calendar features...")
+    with span("calendar"):
+        aqi_df = add_calendar_features(aqi_df, freq)
+    LOGGER.debug(aqi_df.head())
+
+    LOGGER.info("Fetching meteo features...")
+    with span("fetch_weather") as stage:
+        weather_df = meteo.clean_missing_values(fetch_weather(aqi_df.index.min(), aqi_df.index.max()))
+        stage.set(weather=weather_df)
+    LOGGER.debug(weather_df.head())
+
+    LOGGER.info("Merging AQI and METEO data...")
+    with span("merge") as stage:
+        merged_df = pd.merge_asof(aqi_df, weather_df, left_index=True, right_index=True)
+        # Keep same format - ML models work best with Float values (float32 by default, see FEATURE_DTYPE)
+        merged_df = merged_df.astype(dtype)
+        stage.set(merged=merged_df)
+    LOGGER.debug(merged_df.head())
+    return merged_df
+
+
 def split_data(merged_df):
     train_size = int(len(merged_df) * 0.8)
     val_size = int(len(merged_df) * 0.1)
@@ -6,4 +73,40 @@ def split_data(merged_df):
     val_df = merged_df.iloc[train_size : train_size + val_size]
     test_df = merged_df.iloc[train_size + val_size :]
 
-    return train_df, val_df, test_df
\ No newline at end of file
+    return train_df, val_df, test_df
+
+
+def prepare_datasets(merged_df, historical_window_size, prediction_window_size):
+    """
+    Split, scale and window merged features - used by train_model.py and experiment scripts alike.
+
+    Returns fitted scaler, scaled (train, val, test) frames and flat (X_train, X_val, X_test, y_train, y_val, y_test).
+    """
+    target_columns = merged_df.columns
+    train_df, val_df, test_df = split_data(merged_df)
+
+    feature_scaler = FeatureScaler()
+    feature_scaler.fit(train_df)
+
+    train_df = feature_scaler.transform(train_df)
+    val_df = feature_scaler.transform(val_df)
+    test_df = feature_scaler.transform(test_df)
+
+    windows = split_to_windows(
+        train_df, val_df, test_df, historical_window_size, prediction_window_size, target_columns=target_columns
+    )
+    return feature_scaler, (train_df, val_df, test_df), flatten_windows(*windows)
+
+
+def evaluate_model(model, test_df, feature_scaler, historical_window_size, prediction_window_size, num_of_predictions, freq=DAILY):
+    """
+    Recursive forecasting over scaled test data, evaluated in original units.
+    """
+    actual, predictions, _ = recursive_forecast_arrays(model, test_df, historical_window_size, prediction_window_size, num_of_predictions, freq=freq)
+
+    # All origins at once - forecasts are new arrays, true values are a copy, so both are unscaled in place
+    feature_scaler.inverse_transform_array(predictions, test_df.columns, out=predictions)
+    feature_scaler.inverse_transform_array(actual, test_df.columns, out=actual)
+
+    iaqi_positions = test_df.columns.get_indexer(IAQI_FEATURES)
+    return evaluate_iaqi_arrays(y_true=actual[:, :, iaqi_positions], y_pred=predictions[:, :, iaqi_positions])
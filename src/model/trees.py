@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# File layout: magic, format version, header length, JSON header, then arrays aligned to ALIGNMENT bytes
+MAGIC = b"AQITREES"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARRAYS = {
+    # Per node - children are positions in these arrays, -1 for leaves
+    "feature": np.int32,
+    "threshold": np.float32,
+    "left": np.int32,
+    "right": np.int32,
+    "default_left": np.bool_,
+    "value": np.float32,
+    # Per tree
+    "root": np.int32,
+    "target": np.int32,
+    # Per target
+    "base_score": np.float32,
+}
+
+
+class TreeEnsemble:
+    """
+    All boosters of a model as flat node arrays - scores every target in one vectorized pass.
+
+    Needs neither xgboost nor scikit-learn. Prediction follows XGBoost: inputs are float32,
+    `x < threshold` goes left, missing values follow the default direction and leaf values are
+    added to the base score tree by tree in float32, so results are bit-for-bit the same.
+    """
+
+    def __init__(self, arrays, num_features, max_depth, fingerprint=None):
+        self.arrays = arrays
+        # Same names as scikit-learn estimators - validated by the predictor
+        self.n_features_in_ = num_features
+        self.n_targets = len(arrays["base_score"])
+        self.max_depth = max_depth
+        self.fingerprint = fingerprint
+
+        # Trees of every target in boosting order - leaves are summed in this order
+        self._target_trees = [np.flatnonzero(arrays["target"] == target) for target in range(self.n_targets)]
+
+    @classmethod
+    def from_model(cls, model):
+        """Pack an XGBoost model - MultiOutputRegressor of regressors or a single (one output per tree) regressor."""
+        boosters = [estimator.get_booster() for estimator in getattr(model, "estimators_", [model])]
+        nodes = {name: [] for name in ["feature", "threshold", "left", "right", "default_left", "value"]}
+        roots, targets, base_scores = [], [], []
+        num_nodes = 0
+        max_depth = 0
+        num_features = None
+
+        for booster in boosters:
+            learner = json.loads(booster.save_raw("json"))["learner"]
+            if learner["objective"]["name"] != "reg:squarederror":
+                raise ValueError(f"Objective '{learner['objective']['name']}' is not supported")
+            booster_model = learner["gradient_booster"]["model"]
+            model_param = learner["learner_model_param"]
+            num_features = int(model_param["num_feature"])
+
+            booster_base_scores = json.loads(model_param["base_score"])
+            if not isinstance(booster_base_scores, list):
+                booster_base_scores = [booster_base_scores]
+            target_offset = len(base_scores)
+            base_scores.extend(booster_base_scores)
+
+            for tree, tree_target in zip(booster_model["trees"], booster_model["tree_info"]):
+                if int(tree["tree_param"]["size_leaf_vector"]) > 1:
+                    raise ValueError("Trees with vector leaves (multi_output_tree) are not supported")
+                if any(tree["split_type"]):
+                    raise ValueError("Categorical splits are not supported")
+
+                left = np.asarray(tree["left_children"], dtype=np.int32)
+                right = np.asarray(tree["right_children"], dtype=np.int32)
+                is_leaf = left == -1
+                split_conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+
+                nodes["feature"].append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+                nodes["threshold"].append(np.where(is_leaf, np.float32(0), split_conditions))
+                # Leaves keep their value in split condition
+                nodes["value"].append(np.where(is_leaf, split_conditions, np.float32(0)))
+                nodes["left"].append(np.where(is_leaf, -1, left + num_nodes).astype(np.int32))
+                nodes["right"].append(np.where(is_leaf, -1, right + num_nodes).astype(np.int32))
+                nodes["default_left"].append(np.asarray(tree["default_left"], dtype=np.bool_))
+
+                roots.append(num_nodes)
+                targets.append(target_offset + tree_target)
+                num_nodes += len(left)
+                max_depth = max(max_depth, _tree_depth(left, right))
+
+        arrays = {name: np.concatenate(values).astype(ARRAYS[name]) for name, values in nodes.items()}
+        arrays["root"] = np.asarray(roots, dtype=np.int32)
+        arrays["target"] = np.asarray(targets, dtype=np.int32)
+        arrays["base_score"] = np.asarray(base_scores, dtype=np.float32)
+        return cls(arrays, num_features, max_depth, _fingerprint(arrays))
+
+    def save(self, path):
+        header = {
+            "format_version": FORMAT_VERSION,
+            "num_features": self.n_features_in_,
+            "max_depth": self.max_depth,
+            "fingerprint": self.fingerprint,
+            "arrays": {},
+        }
+        offset = 0
+        for name in ARRAYS:
+            array = self.arrays[name]
+            header["arrays"][name] = {"offset": offset, "length": len(array)}
+            offset += _aligned(array.nbytes)
+        header_bytes = json.dumps(header).encode()
+
+        with open(path, "wb") as model_file:
+            preamble = MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_bytes)) + header_bytes
+            model_file.write(preamble + b"\0" * (_aligned(len(preamble)) - len(preamble)))
+            for name in ARRAYS:
+                data = np.ascontiguousarray(self.arrays[name]).tobytes()
+                model_file.write(data + b"\0" * (_aligned(len(data)) - len(data)))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Arrays are views of the memory-mapped file - nothing is copied or parsed besides the header."""
+        with open(path, "rb") as model_file:
+            magic, (format_version, header_length) = model_file.read(8), struct.unpack("<II", model_file.read(8))
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' is not a tree ensemble")
+            if format_version != FORMAT_VERSION:
+                raise ValueError(f"'{path}' has format version {format_version}, supported is {FORMAT_VERSION}")
+            header = json.loads(model_file.read(header_length))
+
+        data = np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+        data_start = _aligned(16 + header_length)
+        arrays = {}
+        for name, dtype in ARRAYS.items():
+            location = header["arrays"][name]
+            start = data_start + location["offset"]
+            arrays[name] = data[start : start + location["length"] * np.dtype(dtype).itemsize].view(dtype)
+        return cls(arrays, header["num_features"], header["max_depth"], header["fingerprint"])
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis]
+        arrays = self.arrays
+        feature, threshold, left, right, default_left = (
+            arrays[name] for name in ["feature", "threshold", "left", "right", "default_left"]
+        )
+
+        # All trees of all rows descend together - one gather per level
+        nodes = np.broadcast_to(arrays["root"], (len(X), len(arrays["root"]))).copy()
+        rows = np.arange(len(X))[:, np.newaxis]
+        for _ in range(self.max_depth):
+            values = X[rows, feature[nodes]]
+            go_left = np.where(np.isnan(values), default_left[nodes], values < threshold[nodes])
+            next_nodes = np.where(go_left, left[nodes], right[nodes])
+            nodes = np.where(next_nodes == -1, nodes, next_nodes)
+
+        leaf_values = arrays["value"][nodes]
+        predictions = np.empty((len(X), self.n_targets), dtype=np.float32)
+        for target, trees in enumerate(self._target_trees):
+            # Sequential float32 sum (cumsum, not pairwise sum) - same rounding as XGBoost
+            target_values = np.concatenate(
+                [np.full((len(X), 1), arrays["base_score"][target], dtype=np.float32), leaf_values[:, trees]], axis=1
+            )
+            predictions[:, target] = np.cumsum(target_values, axis=1, dtype=np.float32)[:, -1]
+        return predictions
+
+
+def export_model(model, path, X_check):
+    """Save model as tree ensemble file, after checking it predicts exactly the same as the model on X_check."""
+    tree_ensemble = TreeEnsemble.from_model(model)
+    # Checked before it replaces path - a differing file is never left where the predictor would load it
+    temporary_path = f"{path}.tmp"
+    tree_ensemble.save(temporary_path)
+    try:
+        expected = np.asarray(model.predict(X_check), dtype=np.float32)
+        actual = TreeEnsemble.load(temporary_path, mmap=False).predict(X_check)
+        if not np.array_equal(expected, actual):
+            raise ValueError(f"Exported model differs from original by up to {np.abs(expected - actual).max()}")
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    os.replace(temporary_path, path)
+    return tree_ensemble
+
+
+def _tree_depth(left, right):
+    max_depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        max_depth = max(max_depth, depth)
+        if left[node] != -1:
+            stack.extend([(left[node], depth + 1), (right[node], depth + 1)])
+    return max_depth
+
+
+def _fingerprint(arrays):
+    digest = hashlib.sha1()
+    for name in ARRAYS:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -1,16 +1,50 @@
+import os
+
 from sklearn.multioutput import MultiOutputRegressor
 import xgboost as xgb
 
-def create_regressor() -> MultiOutputRegressor:
-    base_regressor = xgb.XGBRegressor(
-        n_estimators=100,
-        max_depth=6,
-        learning_rate=0.1,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42,
-        n_jobs=-1
-    )
+# How the model learns all output columns (every merged column for every predicted day/hour):
+# - "per_target" - one booster per output, trained one after another, each using all cores
+# - "parallel" - one booster per output, single-threaded boosters trained side by side within thread budget
+# - "native" - single booster for all outputs (one tree per output each round), X is binned only once
+# - "multi_output_tree" - single booster whose trees have vector leaves shared by all outputs
+BACKENDS = ("per_target", "parallel", "native", "multi_output_tree")
+
+XGB_PARAMS = {
+    "n_estimators": 100,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "random_state": 42,
+}
+
+
+def create_regressor(backend="per_target", n_jobs=None, **params):
+    """
+    n_jobs is the total thread budget for training (all cores by default).
+    params override default XGBoost hyperparameters (XGB_PARAMS).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown regressor backend '{backend}', expected one of {BACKENDS}")
 
-    multi_regressor = MultiOutputRegressor(base_regressor)
-    return multi_regressor
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    params = {**XGB_PARAMS, **params}
+
+    if backend == "per_target":
+        base_regressor = xgb.XGBRegressor(**params, n_jobs=n_jobs)
+        return MultiOutputRegressor(base_regressor)
+
+    if backend == "parallel":
+        # Boosters on small data scale poorly with threads - running more of them at once uses cores better
+        base_regressor = xgb.XGBRegressor(**params, n_jobs=1)
+        return MultiOutputRegressor(base_regressor, n_jobs=n_jobs)
+
+    # Native multi-target training (XGBoost >= 2.0) - predict returns all outputs like MultiOutputRegressor
+    return xgb.XGBRegressor(
+        **params,
+        tree_method="hist",
+        multi_strategy="one_output_per_tree" if backend == "native" else "multi_output_tree",
+        n_jobs=n_jobs,
+    )
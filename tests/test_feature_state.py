@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.common import IAQI_FEATURES
+from src.data.feature_state import FILL_MARGIN, FeatureState
+from src.data.synthetic import synthetic_iaqi, synthetic_weather
+
+
+class IncrementalSource:
+    """Hourly feature group rows published up to `available_until` - records what every read returned."""
+
+    def __init__(self, iaqi_df, available_until):
+        self.iaqi_df = iaqi_df
+        self.available_until = pd.Timestamp(available_until, tz="UTC")
+        self.read_rows = []
+        self.weather_days = []
+
+    def read_hourly_data(self, since):
+        rows = self.iaqi_df["event_timestamp"] <= self.available_until
+        if since is not None:
+            rows &= self.iaqi_df["event_timestamp"] >= since
+        self.read_rows.append(int(rows.sum()))
+        return self.iaqi_df[rows]
+
+    def fetch_weather(self, start_date, end_date):
+        self.weather_days.append((pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1)
+        return synthetic_weather(start_date, end_date)
+
+
+class IdentityScaler:
+
+    def transform(self, dataframe):
+        return dataframe
+
+
+@pytest.fixture
+def source():
+    return IncrementalSource(synthetic_iaqi("2022-01-01", 24 * 365 * 2), "2023-06-30 23:00")
+
+
+def test_state_is_trimmed_to_history(source):
+    feature_state = FeatureState(IdentityScaler(), 3, source.read_hourly_data, source.fetch_weather, history_size=10)
+
+    assert feature_state.refresh()
+
+    history = feature_state.history
+    assert len(history) == 10
+    assert history.index[-1] == pd.Timestamp("2023-06-30")
+    assert not history[IAQI_FEATURES].isna().any().any()
+    # Whole feature group was read once, but weather and state cover only the tail
+    assert source.weather_days[0] <= 10 + FILL_MARGIN.days
+    assert len(feature_state._daily_sums) <= 10 + FILL_MARGIN.days
+    assert feature_state._weather_df.index[0] <= history.index[0]
+
+
+def test_state_stays_bounded_while_refreshing(source):
+    feature_state = FeatureState(IdentityScaler(), 3, source.read_hourly_data, source.fetch_weather, history_size=10)
+    feature_state.refresh()
+
+    for day in pd.date_range("2023-07-01", periods=60, freq="D"):
+        source.available_until = day.tz_localize("UTC") + pd.Timedelta(hours=23)
+        assert feature_state.refresh()
+
+    assert feature_state.history.index[-1] == pd.Timestamp("2023-08-29")
+    assert len(feature_state._daily_sums) <= 10 + FILL_MARGIN.days
+    assert len(feature_state._weather_df) <= 10 + FILL_MARGIN.days + 1
+    # Only new rows are read - at most one day (plus the row at the watermark)
+    assert max(source.read_rows[1:]) <= 25
+
+
+def test_window_is_unchanged_without_new_data(source):
+    feature_state = FeatureState(IdentityScaler(), 3, source.read_hourly_data, source.fetch_weather, history_size=10)
+    feature_state.refresh()
+    window = feature_state.window
+
+    assert not feature_state.refresh()
+    assert feature_state.window is window
+    np.testing.assert_array_equal(feature_state.window.to_numpy(), window.to_numpy())
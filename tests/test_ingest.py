@@ -0,0 +1,194 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data import aqi
+from src.data.locations import get_location
+from src.hopsworks import ingest
+from src.hopsworks.ingest import IngestionBuffer, insert_with_retry
+from src.hopsworks.local import LocalFeatureGroup, LocalFeatureStore
+from src.hopsworks.sync import FeatureGroupSync, local_copy_path
+
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+import fetch_data  # noqa: E402
+
+
+def readings(start, periods, pm25=10.0):
+    return pd.DataFrame(
+        {
+            "event_timestamp": pd.date_range(start, periods=periods, freq="h", tz="UTC"),
+            "pm25": np.arange(periods, dtype=float) + pm25,
+            "no2": np.nan,
+        }
+    )
+
+
+def local_feature_group(path):
+    return LocalFeatureStore(path).get_or_create_feature_group(
+        "iaqi", primary_key=["event_timestamp"], event_time="event_timestamp"
+    )
+
+
+class FlakyFeatureGroup:
+    """Feature group whose inserts fail on the given calls (counted from 1) - rows inserted by other calls stay."""
+
+    def __init__(self, feature_group, failing_calls):
+        self.feature_group = feature_group
+        self.name = feature_group.name
+        self.failing_calls = failing_calls
+        self.inserted_rows = []
+
+    def insert(self, dataframe):
+        self.inserted_rows.append(len(dataframe))
+        if len(self.inserted_rows) in self.failing_calls:
+            raise ConnectionError("feature store unavailable")
+        return self.feature_group.insert(dataframe)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ingest.time, "sleep", delays.append)
+    return delays
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    return IngestionBuffer(str(tmp_path / "ingest" / "station.jsonl"), flush_rows=3)
+
+
+def test_append_deduplicates_on_event_timestamp(buffer):
+    buffer.append(readings("2024-01-01", 2, pm25=10))
+    buffer.append(readings("2024-01-01 01:00", 2, pm25=20))
+
+    pending_df = buffer.pending()
+
+    assert list(pending_df["event_timestamp"]) == list(pd.date_range("2024-01-01", periods=3, freq="h", tz="UTC"))
+    # Latest logged reading wins
+    assert list(pending_df["pm25"]) == [10, 20, 21]
+    assert pending_df["pm25"].dtype == np.float32
+    assert pending_df["no2"].isna().all()
+
+
+def test_append_skips_flushed_readings(buffer, tmp_path):
+    buffer.append(readings("2024-01-01", 3))
+    buffer.flush(local_feature_group(tmp_path / "store"))
+
+    # Feed repeats its latest reading until a new one is published
+    assert buffer.append(readings("2024-01-01 02:00", 1)) == 0
+    assert buffer.append(readings("2024-01-01 02:00", 2)) == 1
+    # Backfills load older rows
+    assert buffer.append(readings("2024-01-01", 2), skip_flushed=False) == 2
+
+
+def test_should_flush_by_rows(buffer):
+    assert not buffer.should_flush()
+
+    buffer.append(readings("2024-01-01", 2))
+    assert not buffer.should_flush()
+
+    buffer.append(readings("2024-01-01 02:00", 1))
+    assert buffer.should_flush()
+
+
+def test_should_flush_by_age(buffer):
+    buffer.append(readings("2024-01-01", 1))
+    logged_at = buffer.oldest_logged_at()
+
+    assert not buffer.should_flush(now=logged_at + buffer.flush_age - pd.Timedelta(minutes=1))
+    assert buffer.should_flush(now=logged_at + buffer.flush_age)
+
+
+def test_interrupted_flush_is_repeated_without_loss(buffer, tmp_path):
+    feature_group = local_feature_group(tmp_path / "store")
+    buffer.append(readings("2024-01-01", 5))
+
+    # Second batch fails - first one is already in the feature group
+    with pytest.raises(ConnectionError):
+        buffer.flush(FlakyFeatureGroup(feature_group, failing_calls=range(2, 100)), insert_rows=2)
+    assert len(feature_group.read()) == 2
+    assert len(buffer.pending()) == 5
+    assert buffer.flushed_until is None
+
+    assert buffer.flush(feature_group, insert_rows=2) == 5
+
+    stored_df = local_feature_group(tmp_path / "store").read()
+    # First batch was inserted twice and upserted on event time
+    assert list(stored_df["event_timestamp"]) == list(readings("2024-01-01", 5)["event_timestamp"])
+    assert list(stored_df["pm25"]) == [10, 11, 12, 13, 14]
+    assert buffer.pending().empty
+    assert buffer.flushed_until == pd.Timestamp("2024-01-01 04:00", tz="UTC")
+
+
+def test_torn_log_line_is_skipped(buffer):
+    buffer.append(readings("2024-01-01", 1))
+    with open(buffer.wal_path, "a") as wal_file:
+        wal_file.write('{"logged_at": "2024-01-01T00:00:00+00:00", "rows": [')
+
+    buffer.append(readings("2024-01-01 01:00", 1))
+
+    assert len(buffer.pending()) == 2
+
+
+def test_insert_with_retry_backs_off(tmp_path, no_sleep):
+    feature_group = FlakyFeatureGroup(local_feature_group(tmp_path / "store"), failing_calls={1, 2})
+
+    insert_with_retry(feature_group, readings("2024-01-01", 2), attempts=4, retry_delay_seconds=5)
+
+    assert feature_group.inserted_rows == [2, 2, 2]
+    assert no_sleep == [5, 10]
+    assert len(feature_group.feature_group.read()) == 2
+
+
+def test_insert_with_retry_gives_up(tmp_path, no_sleep):
+    feature_group = FlakyFeatureGroup(local_feature_group(tmp_path / "store"), failing_calls=range(1, 100))
+
+    with pytest.raises(ConnectionError):
+        insert_with_retry(feature_group, readings("2024-01-01", 2), attempts=3, retry_delay_seconds=1)
+
+    assert len(feature_group.inserted_rows) == 3
+    assert no_sleep == [1, 2]
+
+
+def test_backfill_inserts_in_batches_through_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_data, "PROJECT_ROOT", str(tmp_path))
+    inserted_batches = []
+    local_insert = LocalFeatureGroup.insert
+
+    def insert(feature_group, dataframe):
+        inserted_batches.append(len(dataframe))
+        return local_insert(feature_group, dataframe)
+
+    monkeypatch.setattr(LocalFeatureGroup, "insert", insert)
+
+    backfill_path = tmp_path / "backfill.csv"
+    backfill_df = readings("2024-01-01", 5)
+    # Duplicated row and a column the feature group doesn't have
+    pd.concat([backfill_df, backfill_df.iloc[[0]]]).assign(wg=1.0).to_csv(backfill_path, index=False)
+
+    location = get_location()
+    # Local training copy synced before the backfill
+    copy_path = local_copy_path(aqi.current_data_cache_dir(str(tmp_path)), location.feature_group)
+    synced_feature_group = local_feature_group(tmp_path / "synced")
+    synced_feature_group.insert(readings("2024-02-01", 2))
+    FeatureGroupSync(synced_feature_group, ["event_timestamp", "pm25", "no2"], copy_path).sync()
+    assert FeatureGroupSync(None, [], copy_path).watermark is not None
+    inserted_batches.clear()
+    args = argparse.Namespace(flush_rows=24, flush_age_hours=1.0, insert_rows=2)
+    fetch_data.backfill(location, str(backfill_path), fetch_data.FeatureStoreConnection(str(tmp_path / "store")), args)
+
+    assert inserted_batches == [2, 2, 1]
+    stored_df = LocalFeatureStore(str(tmp_path / "store")).get_or_create_feature_group(location.feature_group).read()
+    assert list(stored_df.columns) == ["event_timestamp", "pm25", "no2"]
+    assert list(stored_df["pm25"]) == [10, 11, 12, 13, 14]
+
+    # Backfilled rows are older than its watermark - next sync reads everything
+    assert FeatureGroupSync(None, [], copy_path).watermark is None
+
+    buffer = fetch_data.ingestion_buffer(location, args)
+    assert buffer.pending().empty
+    assert buffer.flushed_until == pd.Timestamp("2024-01-01 04:00", tz="UTC")
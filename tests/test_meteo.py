@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from src.data.meteo import WeatherCache
+from src.data.synthetic import synthetic_weather
+
+STATION = (48.1, 17.1, 140)
+
+
+class FixtureSource:
+    """Weather source serving rows of a fixed frame up to `available_until` - records every request."""
+
+    def __init__(self, available_until):
+        self.available_until = pd.Timestamp(available_until)
+        self.requests = []
+
+    def __call__(self, station, start_date, end_date):
+        self.requests.append((pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        return synthetic_weather(start_date, min(pd.Timestamp(end_date), self.available_until))
+
+
+@pytest.fixture
+def today():
+    return pd.Timestamp.now().normalize()
+
+
+def test_cached_range_is_not_fetched_again(tmp_path):
+    source = FixtureSource("2020-12-31")
+    cache = WeatherCache(tmp_path, source=source)
+
+    first = cache.fetch(STATION, "2020-01-01", "2020-03-31")
+    second = cache.fetch(STATION, "2020-02-01", "2020-02-29")
+
+    assert len(source.requests) == 1
+    assert len(first) == 91
+    pd.testing.assert_frame_equal(second, first.loc["2020-02-01":"2020-02-29"], check_freq=False)
+
+
+def test_only_missing_ranges_are_fetched(tmp_path):
+    source = FixtureSource("2020-12-31")
+    cache = WeatherCache(tmp_path, source=source)
+
+    cache.fetch(STATION, "2020-03-01", "2020-03-31")
+    weather_df = cache.fetch(STATION, "2020-02-01", "2020-04-30")
+
+    assert source.requests[1:] == [
+        (pd.Timestamp("2020-02-01"), pd.Timestamp("2020-02-29")),
+        (pd.Timestamp("2020-04-01"), pd.Timestamp("2020-04-30")),
+    ]
+    expected = synthetic_weather("2020-02-01", "2020-04-30")
+    pd.testing.assert_frame_equal(weather_df, expected, check_freq=False)
+
+
+def test_empty_fetch_does_not_cover_days(tmp_path, today):
+    source = FixtureSource(today - pd.Timedelta(days=30))
+    cache = WeatherCache(tmp_path, source=source)
+
+    cache.fetch(STATION, today - pd.Timedelta(days=60), today - pd.Timedelta(days=40))
+    # Nothing published yet for these days
+    assert cache.fetch(STATION, today - pd.Timedelta(days=20), today - pd.Timedelta(days=10)).empty
+    assert cache.fetch(STATION, today - pd.Timedelta(days=20), today - pd.Timedelta(days=10)).empty
+    assert len(source.requests) == 3
+
+    source.available_until = today
+    weather_df = cache.fetch(STATION, today - pd.Timedelta(days=20), today - pd.Timedelta(days=10))
+    assert len(weather_df) == 11
+
+
+def test_coverage_ends_with_last_returned_row(tmp_path, today):
+    # Source lags behind - the last days of the range are not published yet
+    source = FixtureSource(today - pd.Timedelta(days=2))
+    cache = WeatherCache(tmp_path, source=source)
+
+    weather_df = cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+    assert weather_df.index.max() == today - pd.Timedelta(days=2)
+
+    source.available_until = today
+    weather_df = cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+    assert source.requests[-1] == (today - pd.Timedelta(days=1), today)
+    assert weather_df.index.max() == today
+
+
+def test_recent_days_are_refreshed_once_stale(tmp_path, today):
+    source = FixtureSource(today)
+    cache = WeatherCache(tmp_path, source=source, refresh_days=3, refresh_ttl=pd.Timedelta(0))
+
+    cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+    cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+
+    assert source.requests[-1] == (today - pd.Timedelta(days=3), today)
+
+
+def test_fresh_recent_days_are_not_refreshed(tmp_path, today):
+    source = FixtureSource(today)
+    cache = WeatherCache(tmp_path, source=source, refresh_days=3)
+
+    cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+    cache.fetch(STATION, today - pd.Timedelta(days=10), today)
+
+    assert len(source.requests) == 1
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from src.hopsworks.local import LocalFeatureGroup
+from src.hopsworks.sync import FeatureGroupSync, invalidate_local_copy, read_since
+
+FEATURES = ["event_timestamp", "pm25"]
+
+
+def readings(start, periods, pm25=10.0):
+    return pd.DataFrame(
+        {
+            "event_timestamp": pd.date_range(start, periods=periods, freq="h", tz="UTC"),
+            "pm25": [pm25 + offset for offset in range(periods)],
+        }
+    )
+
+
+@pytest.fixture
+def feature_group():
+    return LocalFeatureGroup(
+        "iaqi", primary_key=["event_timestamp"], event_time="event_timestamp", dataframe=readings("2024-01-10", 48)
+    )
+
+
+@pytest.fixture
+def local_path(tmp_path):
+    return str(tmp_path / "iaqi_v1.parquet")
+
+
+def test_sync_reads_new_rows(feature_group, local_path):
+    iaqi_sync = FeatureGroupSync(feature_group, FEATURES, local_path)
+    assert len(iaqi_sync.sync()) == 48
+
+    feature_group.insert(readings("2024-01-12", 5, pm25=100))
+    synced_df = FeatureGroupSync(feature_group, FEATURES, local_path).sync()
+
+    assert len(synced_df) == 53
+    assert iaqi_sync.watermark == pd.Timestamp("2024-01-12 04:00", tz="UTC")
+    pd.testing.assert_frame_equal(synced_df, read_since(feature_group, FEATURES).sort_values("event_timestamp").reset_index(drop=True))
+
+
+def test_older_row_inserted_after_sync_is_picked_up(feature_group, local_path):
+    FeatureGroupSync(feature_group, FEATURES, local_path).sync()
+
+    # Late materialization of an hour before the watermark and a corrected reading
+    late_df = pd.concat([readings("2024-01-09 12:00", 1, pm25=7), readings("2024-01-11 20:00", 1, pm25=99)])
+    feature_group.insert(late_df)
+    synced_df = FeatureGroupSync(feature_group, FEATURES, local_path).sync().set_index("event_timestamp")
+
+    assert len(synced_df) == 49
+    assert synced_df.loc[pd.Timestamp("2024-01-09 12:00", tz="UTC"), "pm25"] == 7
+    assert synced_df.loc[pd.Timestamp("2024-01-11 20:00", tz="UTC"), "pm25"] == 99
+
+
+def test_row_older_than_lookback_needs_invalidation(feature_group, local_path):
+    FeatureGroupSync(feature_group, FEATURES, local_path, lookback=pd.Timedelta(hours=1)).sync()
+    # Backfill of old history
+    feature_group.insert(readings("2023-06-01", 3))
+
+    assert len(FeatureGroupSync(feature_group, FEATURES, local_path, lookback=pd.Timedelta(hours=1)).sync()) == 48
+
+    invalidate_local_copy(local_path)
+    assert len(FeatureGroupSync(feature_group, FEATURES, local_path, lookback=pd.Timedelta(hours=1)).sync()) == 51
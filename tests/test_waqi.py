@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data import waqi
+from src.data.waqi import fetch_feeds_async
+
+COLUMNS = ["pm25", "no2", "t"]
+
+
+def feed_body(feed, pm25=42.0):
+    return {
+        "status": "ok",
+        "data": {
+            "time": {"iso": "2024-01-01T10:00:00+01:00"},
+            # Unknown readings are ignored, missing ones stay NaN
+            "iaqi": {"pm25": {"v": pm25}, "t": {"v": -1.5}, "wg": {"v": 3}},
+            "city": {"name": feed},
+        },
+    }
+
+
+class MockWaqi:
+    """Local WAQI API - `responses` are served per feed in order, then feed_body for every further request."""
+
+    def __init__(self, responses=None, delay_seconds=0.0):
+        self.responses = responses or {}
+        self.delay_seconds = delay_seconds
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/feed/{feed}/", self.handle)
+        return app
+
+    async def handle(self, request):
+        feed = request.match_info["feed"]
+        self.requests.append((feed, request.query.get("token")))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay_seconds)
+            responses = self.responses.get(feed, [])
+            if responses:
+                return responses.pop(0)
+            return web.json_response(feed_body(feed))
+        finally:
+            self.in_flight -= 1
+
+
+def fetch(mock, feeds, **kwargs):
+    async def run():
+        async with TestServer(mock.app()) as server:
+            return await fetch_feeds_async(feeds, "token", COLUMNS, api_url=str(server.make_url("/")), **kwargs)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(waqi, "BACKOFF_SECONDS", 0.001)
+
+
+def test_readings_are_parsed_to_float32_columns():
+    mock = MockWaqi()
+
+    readings, errors = fetch(mock, ["a", "b"])
+
+    assert errors == {}
+    assert list(readings["feed"]) == ["a", "b"]
+    assert list(readings.columns) == ["feed", "event_timestamp", *COLUMNS]
+    assert (readings[COLUMNS].dtypes == np.float32).all()
+    assert readings["event_timestamp"].iloc[0] == pd.Timestamp("2024-01-01 09:00", tz="UTC")
+    assert readings["pm25"].iloc[0] == 42.0
+    assert readings["no2"].isna().all()
+    assert sorted(mock.requests) == [("a", "token"), ("b", "token")]
+
+
+def test_api_url_from_environment(monkeypatch):
+    mock = MockWaqi()
+
+    async def run():
+        async with TestServer(mock.app()) as server:
+            monkeypatch.setattr(waqi, "WAQI_API_URL", str(server.make_url("/")))
+            return await fetch_feeds_async(["a"], "token", COLUMNS)
+
+    readings, errors = asyncio.run(run())
+    assert errors == {}
+    assert len(readings) == 1
+
+
+def test_rate_limited_request_waits_for_retry_after():
+    mock = MockWaqi({"a": [web.Response(status=429, headers={"Retry-After": "0.2"})]})
+
+    started_at = time.perf_counter()
+    readings, errors = fetch(mock, ["a"])
+
+    assert errors == {}
+    assert len(readings) == 1
+    assert len(mock.requests) == 2
+    assert time.perf_counter() - started_at >= 0.2
+
+
+def test_retry_after_is_capped(monkeypatch):
+    monkeypatch.setattr(waqi, "MAX_RETRY_AFTER_SECONDS", 0.01)
+    mock = MockWaqi({"a": [web.Response(status=429, headers={"Retry-After": "3600"})]})
+
+    started_at = time.perf_counter()
+    readings, errors = fetch(mock, ["a"])
+
+    assert errors == {}
+    assert time.perf_counter() - started_at < 5
+
+
+def test_server_error_is_retried():
+    mock = MockWaqi({"a": [web.Response(status=503), web.Response(status=502)]})
+
+    readings, errors = fetch(mock, ["a", "b"])
+
+    assert errors == {}
+    assert list(readings["feed"]) == ["a", "b"]
+    assert [feed for feed, _ in mock.requests].count("a") == 3
+
+
+def test_server_errors_exhaust_attempts():
+    mock = MockWaqi({"a": [web.Response(status=500) for _ in range(3)]})
+
+    readings, errors = fetch(mock, ["a", "b"], attempts=3)
+
+    assert list(readings["feed"]) == ["b"]
+    assert "failed after 3 attempts" in errors["a"]
+    assert "HTTP 500" in errors["a"]
+
+
+def test_over_quota_body_is_retried():
+    mock = MockWaqi({"a": [web.json_response({"status": "error", "data": "Over quota"})]})
+
+    readings, errors = fetch(mock, ["a"])
+
+    assert errors == {}
+    assert len(mock.requests) == 2
+
+
+def test_request_error_is_not_retried():
+    mock = MockWaqi({"a": [web.json_response({"status": "error", "data": "Invalid key"})]})
+
+    readings, errors = fetch(mock, ["a"])
+
+    assert readings.empty
+    assert errors == {"a": "Request error: Invalid key"}
+    assert len(mock.requests) == 1
+
+
+def test_slow_request_times_out():
+    mock = MockWaqi(delay_seconds=2.0)
+
+    started_at = time.perf_counter()
+    readings, errors = fetch(mock, ["a", "b"], timeout_seconds=0.1, attempts=2)
+
+    assert readings.empty
+    assert set(errors) == {"a", "b"}
+    assert "TimeoutError" in errors["a"]
+    assert time.perf_counter() - started_at < 2.0
+
+
+def test_concurrency_is_bounded():
+    mock = MockWaqi(delay_seconds=0.05)
+
+    readings, errors = fetch(mock, [f"feed{number}" for number in range(12)], concurrency=3)
+
+    assert errors == {}
+    assert len(readings) == 12
+    assert mock.max_in_flight == 3